@@ -0,0 +1,53 @@
+"""
+Helpers shared by the benchmark scripts.
+
+The scripts are run directly (``python benchmarks/bench_x.py``), so this
+module is imported as a sibling, like ``make_corpus``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+from typing import Callable, Sequence
+
+from make_corpus import CORPUS_PATH
+
+
+def make_parser(doc: str, number: int) -> argparse.ArgumentParser:
+    """Argument parser described by the first line of *doc*, with ``--number``."""
+    parser = argparse.ArgumentParser(description=doc.splitlines()[1])
+    parser.add_argument("--number", type=int, default=number,
+                        help=f"calls per timing run (default {number})")
+    return parser
+
+
+def best_time(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best-of-*repeat* seconds per call of *fn*."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list[dict]:
+    """Frames of the golden corpus, with ``request`` and ``response`` as bytes."""
+    with open(path, encoding="utf-8") as fh:
+        frames = json.load(fh)["frames"]
+    for frame in frames:
+        frame["request"] = frame["request"].encode("ASCII")
+        frame["response"] = frame["response"].encode("ASCII")
+    return frames
+
+
+def print_speedups(
+    label: str,
+    cases: Sequence[tuple[str, Callable[[], object], Callable[[], object]]],
+    number: int,
+    digits: int = 1,
+) -> None:
+    """Time ``(name, current, reference)`` cases and print a speed-up table."""
+    width = max([len(label)] + [len(name) for name, _, _ in cases]) + 2
+    print(f"{label:<{width}} {'current µs':>11} {'reference µs':>13} {'speed-up':>9}")
+    for name, current, reference in cases:
+        us_cur = best_time(current, number) * 1e6
+        us_ref = best_time(reference, number) * 1e6
+        print(f"{name:<{width}} {us_cur:>11.{digits}f} {us_ref:>13.{digits}f} "
+              f"{us_ref / us_cur:>8.1f}x")
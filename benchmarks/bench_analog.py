@@ -0,0 +1,116 @@
+"""
+Benchmark for the analog data (CID2 0x42) INFO decoder.
+
+Compares ``bms._decode_analog_data`` with the previous slice-and-parse
+implementation (kept below as a reference) on the analog frames of the
+golden corpus (``corpus.json``), checking that both decode identical
+``PackAnalogData`` first.
+
+Usage::
+
+    python benchmarks/bench_analog.py [--number N]
+"""
+from __future__ import annotations
+
+from _bench import load_corpus, make_parser, print_speedups
+
+from bmspace.bms import PackAnalogData, _decode_analog_data
+from bmspace.protocol import (
+    CAPACITY_SCALE,
+    CURRENT_SCALE,
+    CURRENT_SIGN_THRESHOLD,
+    CURRENT_UINT16_MAX,
+    TEMP_OFFSET_DECIDEGREES,
+    VOLTAGE_SCALE,
+    parse_response,
+)
+
+
+def reference_decode_analog_data(info: bytes) -> list[PackAnalogData]:
+    byte_index = 2
+    num_packs = int(info[byte_index : byte_index + 2], 16)
+    byte_index += 2
+    result: list[PackAnalogData] = []
+    prev_cells = 0
+    for p in range(1, num_packs + 1):
+        pack = PackAnalogData(pack_number=p)
+        num_cells = int(info[byte_index : byte_index + 2], 16)
+        if p > 1 and num_cells != prev_cells:
+            byte_index += 2
+            num_cells = int(info[byte_index : byte_index + 2], 16)
+            if num_cells != prev_cells:
+                raise RuntimeError("Cannot parse multi-pack response: cell count mismatch")
+        prev_cells = num_cells
+        byte_index += 2
+        cell_min = cell_max = 0
+        for i in range(num_cells):
+            mv = int(info[byte_index : byte_index + 4], 16)
+            byte_index += 4
+            pack.cells.append(mv)
+            if i == 0:
+                cell_min = cell_max = mv
+            else:
+                cell_min = min(cell_min, mv)
+                cell_max = max(cell_max, mv)
+        pack.cells_max_diff = cell_max - cell_min
+        num_temps = int(info[byte_index : byte_index + 2], 16)
+        byte_index += 2
+        for _ in range(num_temps):
+            raw_temp = int(info[byte_index : byte_index + 4], 16)
+            byte_index += 4
+            pack.temps.append(round((raw_temp - TEMP_OFFSET_DECIDEGREES) / 10, 1))
+        raw_current = int(info[byte_index : byte_index + 4], 16)
+        byte_index += 4
+        if raw_current >= CURRENT_SIGN_THRESHOLD:
+            raw_current = -1 * (CURRENT_UINT16_MAX - raw_current)
+        pack.i_pack = raw_current / CURRENT_SCALE
+        pack.v_pack = int(info[byte_index : byte_index + 4], 16) / VOLTAGE_SCALE
+        byte_index += 4
+        pack.i_remain_cap = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
+        byte_index += 4
+        byte_index += 2
+        pack.i_full_cap = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
+        byte_index += 4
+        pack.soc = round(pack.i_remain_cap / pack.i_full_cap * 100, 2) if pack.i_full_cap else 0.0
+        pack.cycles = int(info[byte_index : byte_index + 4], 16)
+        byte_index += 4
+        pack.i_design_cap = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
+        byte_index += 4
+        pack.soh = round(pack.i_full_cap / pack.i_design_cap * 100, 2) if pack.i_design_cap else 0.0
+        byte_index += 2
+        if byte_index < len(info) and num_cells != int(info[byte_index : byte_index + 2], 16):
+            byte_index += 2
+        result.append(pack)
+    return result
+
+
+def analog_infos() -> dict[str, bytes]:
+    """Corpus frame name -> INFO field, for every analog frame."""
+    return {
+        frame["name"]: parse_response(frame["response"])[1]
+        for frame in load_corpus() if frame["kind"] == "analog"
+    }
+
+
+def check_parity(infos: dict[str, bytes]) -> None:
+    for name, info in infos.items():
+        assert _decode_analog_data(info) == reference_decode_analog_data(info), name
+
+
+def main() -> None:
+    args = make_parser(__doc__, number=500).parse_args()
+
+    infos = analog_infos()
+    check_parity(infos)
+    print(f"parity: OK ({len(infos)} corpus frames)")
+
+    cases = [
+        (name, lambda info=info: _decode_analog_data(info),
+         lambda info=info: reference_decode_analog_data(info))
+        for name, info in infos.items()
+    ]
+    print_speedups("frame", cases, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark for the protocol checksum routines.
+
+Compares ``protocol.chksum_calc`` / ``lchksum_calc`` with the previous
+string-based implementations (kept below as references), first checking
+that both produce identical results, then timing them.
+
+Usage::
+
+    python benchmarks/bench_checksum.py [--number N]
+"""
+from __future__ import annotations
+
+import random
+
+from _bench import make_parser, print_speedups
+
+from bmspace.protocol import build_request, chksum_calc, lchksum_calc
+
+
+def reference_chksum_calc(data: bytes) -> str:
+    total = sum(data[1:]) % 65536
+    bits = format(total, "016b")
+    flipped = bits.translate(str.maketrans("01", "10"))
+    result = int(flipped, 2) + 1
+    return format(result, "X")
+
+
+def reference_lchksum_calc(lenid: bytes) -> str:
+    total = sum(int(chr(b), 16) for b in lenid) % 16
+    bits = format(total, "04b")
+    flipped = bits.translate(str.maketrans("01", "10"))
+    result = int(flipped, 2) + 1
+    if result > 15:
+        result = 0
+    return format(result, "X")
+
+
+def check_parity(samples: int = 20000, seed: int = 1) -> None:
+    """Assert that the current and reference implementations agree."""
+    for value in range(0x1000):
+        lenid = format(value, "03X").encode("ASCII")
+        assert lchksum_calc(lenid) == reference_lchksum_calc(lenid), lenid
+        assert lchksum_calc(lenid.lower()) == reference_lchksum_calc(lenid.lower()), lenid
+
+    rng = random.Random(seed)
+    for _ in range(samples):
+        data = b"~" + bytes(rng.randrange(0x30, 0x47) for _ in range(rng.randrange(0, 2000)))
+        assert chksum_calc(data) == reference_chksum_calc(data), data
+    # Sums that wrap to zero and to the top of the 16-bit range
+    for data in (b"~", b"~" + b"\xff" * 257, b"~" + b"\x01" * 65535):
+        assert chksum_calc(data) == reference_chksum_calc(data), len(data)
+
+
+def main() -> None:
+    args = make_parser(__doc__, number=20000).parse_args()
+
+    check_parity()
+    print("parity: OK")
+
+    request = build_request(cid2=b"42", info=b"FF")
+    response_16_packs = b"~25014600" + b"0" * 2000
+    cases = [
+        ("lchksum_calc",
+         lambda: lchksum_calc(b"0DC"), lambda: reference_lchksum_calc(b"0DC")),
+        ("chksum_calc (request)",
+         lambda: chksum_calc(request), lambda: reference_chksum_calc(request)),
+        ("chksum_calc (2 kB response)",
+         lambda: chksum_calc(response_16_packs), lambda: reference_chksum_calc(response_16_packs)),
+    ]
+    print_speedups("case", cases, args.number, digits=3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Codec benchmark suite driven by the golden frame corpus.
+
+Times ``build_request``, ``parse_response``, ``chksum_calc``,
+``lchksum_calc`` and the analog / warning INFO decoders on every frame of
+``corpus.json`` (1, 4, 8 and 16 packs; plain, INFOFLAG and extra-byte
+layouts), reporting operations per second and the peak memory allocated
+by one call (``tracemalloc``).
+
+Before timing, every corpus frame is decoded and compared with its golden
+digest, so a decoder change that alters results fails fast.
+
+Throughput depends on the machine, so baselines are per machine: record
+one with ``--save-baseline`` on the target gateway, then ``--check``
+against it.  ``--check`` exits with status 1 if any case is slower, or
+allocates more, than the baseline by more than ``--threshold``.
+
+Usage::
+
+    python benchmarks/bench_codec.py [--number N] [--filter TEXT]
+                                     [--save-baseline | --check] [--baseline PATH]
+                                     [--threshold 0.2]
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from typing import Callable
+
+from _bench import best_time, load_corpus, make_parser
+from make_corpus import decoded_digest
+
+from bmspace.bms import _decode_analog_data, _decode_warn_info
+from bmspace.protocol import build_request, chksum_calc, lchksum_calc, parse_response
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allocation growth below this many bytes is measurement noise
+_ALLOC_SLACK = 256
+
+
+def check_golden(corpus: list[dict]) -> None:
+    """Assert that every corpus frame still parses and decodes to its golden digest."""
+    for frame in corpus:
+        ok, info = parse_response(frame["response"])
+        assert ok, (frame["name"], info)
+        digest = decoded_digest(frame["kind"], info, frame["packs"])
+        assert digest == frame["digest"], f"{frame['name']}: decoder output changed"
+
+
+def build_cases(corpus: list[dict]) -> dict[str, Callable[[], object]]:
+    """Benchmark name -> zero-argument callable."""
+    cases: dict[str, Callable[[], object]] = {}
+    cases["build_request/version"] = lambda: build_request(cid2=b"C1")
+    cases["build_request/analog"] = lambda: build_request(cid2=b"42", info=b"FF")
+    for frame in corpus:
+        response = frame["response"]
+        name = frame["name"]
+        if frame["kind"] == "analog" and name.endswith("-plain"):
+            body, lenid = response[:-5], response[10:13]
+            cases[f"chksum_calc/{name}"] = lambda body=body: chksum_calc(body)
+            cases[f"lchksum_calc/{name}"] = lambda lenid=lenid: lchksum_calc(lenid)
+        cases[f"parse_response/{name}"] = lambda response=response: parse_response(response)
+        info = parse_response(response)[1]
+        if frame["kind"] == "analog":
+            cases[f"decode/{name}"] = lambda info=info: _decode_analog_data(info)
+        elif frame["kind"] == "warn":
+            packs = frame["packs"]
+            cases[f"decode/{name}"] = lambda info=info, packs=packs: _decode_warn_info(info, packs)
+    return cases
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int = 5) -> dict[str, float]:
+    """Best-of-*repeat* throughput and the peak bytes allocated by one call."""
+    best = best_time(fn, number, repeat)
+    fn()
+    tracemalloc.start()
+    try:
+        fn()   # first traced call may populate caches
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return {"ops": 1 / best, "peak_bytes": peak}
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Human-readable regressions of *results* against *baseline*."""
+    regressions: list[str] = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops"] < base["ops"] * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['ops']:,.0f} ops/s vs baseline {base['ops']:,.0f}"
+            )
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + threshold) + _ALLOC_SLACK:
+            regressions.append(
+                f"{name}: {result['peak_bytes']:,.0f} B/call vs baseline {base['peak_bytes']:,.0f}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = make_parser(__doc__, number=2000)
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save-baseline", action="store_true")
+    mode.add_argument("--check", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="tolerated relative regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    check_golden(corpus)
+    print(f"golden corpus: {len(corpus)} frames OK")
+
+    results: dict[str, dict[str, float]] = {}
+    print(f"{'case':<42} {'ops/s':>12} {'peak B/call':>12}")
+    for name, fn in build_cases(corpus).items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(fn, args.number)
+        print(f"{name:<42} {results[name]['ops']:>12,.0f} {results[name]['peak_bytes']:>12,.0f}")
+
+    machine = {"python": platform.python_version(), "machine": platform.machine()}
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump({**machine, "results": results}, fh, indent=1, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline saved to {args.baseline}")
+    elif args.check:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if {k: baseline.get(k) for k in machine} != machine:
+            print(f"warning: baseline recorded on {baseline.get('machine')} / "
+                  f"Python {baseline.get('python')}", file=sys.stderr)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
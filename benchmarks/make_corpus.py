@@ -0,0 +1,102 @@
+"""
+Generate the golden frame corpus used by ``bench_codec.py`` and ``bench_analog.py``.
+
+Every frame is produced by the bundled ``SimulatedBms`` with a fixed seed
+and a frozen clock, so the corpus is reproducible byte for byte.  Each
+entry records the request, the response and a digest of what the current
+decoders make of it; ``bench_codec.py`` refuses to time decoders whose
+output no longer matches.
+
+Usage::
+
+    python benchmarks/make_corpus.py [--output benchmarks/corpus.json]
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import hashlib
+import json
+import os
+
+from bmspace import constants
+from bmspace.bms import _decode_analog_data, _decode_warn_info
+from bmspace.protocol import build_request, parse_response
+from bmspace.simulator import SimulatedBms
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.json")
+
+PACK_COUNTS = (1, 4, 8, 16)
+
+# name -> SimulatedBms quirk flags
+VARIANTS = {
+    "plain": {},
+    "infoflag": {"infoflag": True},
+    "extra_byte": {"extra_byte": True},
+}
+
+
+def decoded_digest(kind: str, info: bytes, packs: int) -> str:
+    """Short, stable digest of the decoder output for one INFO field."""
+    if kind == "analog":
+        decoded = _decode_analog_data(info)
+    elif kind == "warn":
+        decoded = _decode_warn_info(info, packs)
+    else:
+        decoded = info.decode("ASCII")
+    if isinstance(decoded, list):
+        decoded = [dataclasses.asdict(d) for d in decoded]
+    blob = json.dumps(decoded, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def _entry(bms: SimulatedBms, name: str, kind: str, cid2: bytes, info: bytes, packs: int) -> dict:
+    request = build_request(cid2=cid2, info=info)
+    response = bms.handle(request)
+    ok, payload = parse_response(response)
+    assert ok, payload
+    return {
+        "name": name,
+        "kind": kind,
+        "packs": packs,
+        "request": request.decode("ASCII"),
+        "response": response.decode("ASCII"),
+        "digest": decoded_digest(kind, payload, packs),
+    }
+
+
+def build_corpus(seed: int = 2024) -> list[dict]:
+    corpus: list[dict] = []
+    for packs in PACK_COUNTS:
+        for variant, quirks in VARIANTS.items():
+            if variant == "extra_byte" and packs == 1:
+                continue   # the quirk only appears between pack records
+            bms = SimulatedBms(packs=packs, cells=16, temps=6, seed=seed + packs,
+                               clock=lambda: 0.0, **quirks)
+            corpus.append(_entry(bms, f"analog-{packs}p-{variant}", "analog",
+                                 constants.cid2PackAnalogData, b"FF", packs))
+            if variant != "extra_byte":
+                corpus.append(_entry(bms, f"warn-{packs}p-{variant}", "warn",
+                                     constants.cid2WarnInfo, b"FF", packs))
+    bms = SimulatedBms(seed=seed, clock=lambda: 0.0)
+    corpus.append(_entry(bms, "version", "raw", constants.cid2SoftwareVersion, b"", 1))
+    corpus.append(_entry(bms, "serial", "raw", constants.cid2SerialNumber, b"", 1))
+    corpus.append(_entry(bms, "capacity", "raw", constants.cid2PackCapacity, b"", 1))
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default=CORPUS_PATH)
+    parser.add_argument("--seed", type=int, default=2024)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.seed)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump({"seed": args.seed, "frames": corpus}, fh, indent=1)
+        fh.write("\n")
+    print(f"wrote {len(corpus)} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,24 @@ BMS command layer.
 Each function communicates with the BMS over a transport, parses the
 response, and returns a structured dataclass.  No MQTT publishing occurs
 here – callers decide what to do with the data.
+
+Every command has an ``async_`` counterpart for use with the asyncio
+transports; both share the same INFO decoders.  The ``_batch`` variants
+read several bus addresses in one pipelined exchange (see
+``TcpTransport.exchange_batch``).
+
+If the transport carries a ``StageTimings`` (``transport.timings``), the
+synchronous commands record the time spent in ``parse_response`` and in
+the INFO decoders.
 """
 from __future__ import annotations
 
+import functools
 import logging
+import struct
+import time
 from dataclasses import dataclass, field
+from typing import Callable, Iterator, Sequence, TypeVar
 
 from . import constants
 from .protocol import (
@@ -16,21 +29,26 @@ from .protocol import (
     CURRENT_SCALE,
     CURRENT_SIGN_THRESHOLD,
     CURRENT_UINT16_MAX,
+    DEFAULT_ADR,
     TEMP_OFFSET_DECIDEGREES,
     VOLTAGE_SCALE,
     build_request,
     parse_response,
 )
+from .timing import StageTimings
+from .transport import TransportTimeout
 
 logger = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 
 # ---------------------------------------------------------------------------
 # Data structures
 # ---------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass(slots=True)
 class PackAnalogData:
     """Analog measurements for a single battery pack."""
 
@@ -85,19 +103,52 @@ class PackWarnInfo:
 # ---------------------------------------------------------------------------
 
 
-def _exchange(transport, cid2: bytes, info: bytes = b"") -> bytes:
+def _check_response(raw: bytes, timings: StageTimings | None = None) -> bytes:
+    """Validate a raw response frame and return its INFO bytes."""
+    start = time.perf_counter()
+    success, result = parse_response(raw)
+    if timings is not None:
+        timings.parse.observe(time.perf_counter() - start)
+    if not success:
+        raise RuntimeError(str(result))
+    return result  # type: ignore[return-value]
+
+
+def _exchange(
+    transport, cid2: bytes, info: bytes = b"", adr: bytes = DEFAULT_ADR
+) -> bytes:
     """
-    Send a request and return the parsed INFO bytes.
+    Send a request to bus address *adr* and return the parsed INFO bytes.
 
     Raises ``RuntimeError`` on protocol-level failures.
     """
-    request = build_request(cid2=cid2, info=info)
+    request = build_request(cid2=cid2, info=info, adr=adr)
     transport.send(request)
-    raw = transport.receive()
-    success, result = parse_response(raw)
-    if not success:
-        raise RuntimeError(str(result))
-    return result  # type: ignore[return-value]
+    return _check_response(transport.receive(), getattr(transport, "timings", None))
+
+
+def _decode(transport, decode: Callable[..., _T], info: bytes, *args) -> _T:
+    """``decode(info, *args)``, timed into the transport's ``timings``."""
+    start = time.perf_counter()
+    result = decode(info, *args)
+    timings = getattr(transport, "timings", None)
+    if timings is not None:
+        timings.decode.observe(time.perf_counter() - start)
+    return result
+
+
+async def _async_exchange(
+    transport, cid2: bytes, info: bytes = b"", adr: bytes = DEFAULT_ADR
+) -> bytes:
+    """Async counterpart of ``_exchange`` for an ``AsyncTransport``."""
+    request = build_request(cid2=cid2, info=info, adr=adr)
+    await transport.send(request)
+    return _check_response(await transport.receive())
+
+
+def _hex_arg(value: int) -> bytes:
+    """Encode a single byte value as two ASCII hex characters (ADR, battery number)."""
+    return bytes(format(value, "02X"), "ASCII")
 
 
 def _parse_flag_byte(raw_hex: bytes, table: dict[int, str]) -> tuple[int, list[str]]:
@@ -108,129 +159,123 @@ def _parse_flag_byte(raw_hex: bytes, table: dict[int, str]) -> tuple[int, list[s
 
 
 # ---------------------------------------------------------------------------
-# Public BMS commands
+# INFO decoders
 # ---------------------------------------------------------------------------
 
 
-def get_version(transport) -> str:
-    """Return the BMS software version string."""
-    info = _exchange(transport, constants.cid2SoftwareVersion)
+def _decode_version(info: bytes) -> str:
     return bytes.fromhex(info.decode("ascii")).decode("ASCII")
 
 
-def get_serial(transport) -> tuple[str, str]:
-    """Return ``(bms_serial_number, pack_serial_number)``."""
-    info = _exchange(transport, constants.cid2SerialNumber)
+def _decode_serial(info: bytes) -> tuple[str, str]:
     bms_sn  = bytes.fromhex(info[0:30].decode("ascii")).decode("ASCII").replace(" ", "")
     pack_sn = bytes.fromhex(info[40:68].decode("ascii")).decode("ASCII").replace(" ", "")
     return bms_sn, pack_sn
 
 
-def get_analog_data(transport, bat_number: int = 255) -> list[PackAnalogData]:
+@functools.lru_cache(maxsize=None)
+def _analog_pack_struct(num_cells: int, num_temps: int) -> struct.Struct:
     """
-    Retrieve analog measurements for all packs.
+    Binary layout of one pack record following its cell-count byte.
 
-    ``bat_number=255`` requests data for all packs simultaneously.
-    Returns one ``PackAnalogData`` per pack detected in the response.
+    cells (u16 each) | temp count | temps (u16 each) | current | voltage |
+    remaining cap | P flag | full cap | cycles | design cap | reserved
     """
-    battery_arg = bytes(format(bat_number, "02X"), "ASCII")
-    info = _exchange(transport, constants.cid2PackAnalogData, info=battery_arg)
+    return struct.Struct(f">{num_cells}HB{num_temps}HHHHxHHHx")
 
-    byte_index = 2
-    num_packs = int(info[byte_index : byte_index + 2], 16)
-    byte_index += 2
 
-    result: list[PackAnalogData] = []
+def _decode_analog_data(info: bytes) -> list[PackAnalogData]:
+    try:
+        raw = bytes.fromhex(info.decode("ascii"))
+    except (UnicodeDecodeError, ValueError):
+        raise RuntimeError("Analog data INFO is not valid hex") from None
+    try:
+        return _unpack_analog_data(raw)
+    except (IndexError, struct.error):
+        raise RuntimeError(
+            f"Truncated analog data response ({len(raw)} bytes)"
+        ) from None
+
+
+def _iter_analog_records(raw: bytes) -> Iterator[tuple[int, int, int, int, struct.Struct]]:
+    """
+    Walk the pack records of a binary analog INFO field.
+
+    Yields ``(pack_number, offset, num_cells, num_temps, layout)`` where
+    *layout* unpacks the record at *offset*.
+    """
+    num_packs = raw[1]   # raw[0] is DATAFLAG
+    offset = 2
     prev_cells = 0
 
     for p in range(1, num_packs + 1):
-        pack = PackAnalogData(pack_number=p)
-
-        num_cells = int(info[byte_index : byte_index + 2], 16)
+        num_cells = raw[offset]
 
         # Some multi-pack responses insert an extra byte between packs
         if p > 1 and num_cells != prev_cells:
-            byte_index += 2
-            num_cells = int(info[byte_index : byte_index + 2], 16)
+            offset += 1
+            num_cells = raw[offset]
             if num_cells != prev_cells:
                 raise RuntimeError(
                     "Cannot parse multi-pack response: cell count mismatch"
                 )
         prev_cells = num_cells
-        byte_index += 2
-
-        cell_min = cell_max = 0
-        for i in range(num_cells):
-            mv = int(info[byte_index : byte_index + 4], 16)
-            byte_index += 4
-            pack.cells.append(mv)
-            if i == 0:
-                cell_min = cell_max = mv
-            else:
-                cell_min = min(cell_min, mv)
-                cell_max = max(cell_max, mv)
-        pack.cells_max_diff = cell_max - cell_min
-
-        num_temps = int(info[byte_index : byte_index + 2], 16)
-        byte_index += 2
-        for _ in range(num_temps):
-            raw_temp = int(info[byte_index : byte_index + 4], 16)
-            byte_index += 4
-            pack.temps.append(round((raw_temp - TEMP_OFFSET_DECIDEGREES) / 10, 1))
-
-        raw_current = int(info[byte_index : byte_index + 4], 16)
-        byte_index += 4
-        if raw_current >= CURRENT_SIGN_THRESHOLD:
-            raw_current = -1 * (CURRENT_UINT16_MAX - raw_current)
-        pack.i_pack = raw_current / CURRENT_SCALE
-
-        pack.v_pack = int(info[byte_index : byte_index + 4], 16) / VOLTAGE_SCALE
-        byte_index += 4
-
-        pack.i_remain_cap = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
-        byte_index += 4
-
-        byte_index += 2  # skip "P" flag byte (always 03 per protocol manual)
-
-        pack.i_full_cap = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
-        byte_index += 4
-
-        pack.soc = (
-            round(pack.i_remain_cap / pack.i_full_cap * 100, 2)
-            if pack.i_full_cap
-            else 0.0
-        )
-
-        pack.cycles = int(info[byte_index : byte_index + 4], 16)
-        byte_index += 4
+        offset += 1
 
-        pack.i_design_cap = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
-        byte_index += 4
-
-        pack.soh = (
-            round(pack.i_full_cap / pack.i_design_cap * 100, 2)
-            if pack.i_design_cap
-            else 0.0
-        )
-
-        byte_index += 2  # reserved
+        num_temps = raw[offset + 2 * num_cells]
+        layout = _analog_pack_struct(num_cells, num_temps)
+        if offset + layout.size > len(raw):
+            raise struct.error("pack record runs past end of buffer")
+        yield p, offset, num_cells, num_temps, layout
+        offset += layout.size
 
         # Skip optional INFOFLAG if present (value differs from cell count)
-        if (
-            byte_index < len(info)
-            and num_cells != int(info[byte_index : byte_index + 2], 16)
-        ):
-            byte_index += 2
-
-        result.append(pack)
+        if offset < len(raw) and raw[offset] != num_cells:
+            offset += 1
+
+
+def _pack_from_values(
+    pack_number: int, values: tuple[int, ...], num_cells: int, num_temps: int
+) -> PackAnalogData:
+    """Scale one unpacked pack record into a ``PackAnalogData``."""
+    tail = num_cells + 1 + num_temps
+    cells = list(values[:num_cells])
+    temps = [
+        round((t - TEMP_OFFSET_DECIDEGREES) / 10, 1)
+        for t in values[num_cells + 1 : tail]
+    ]
+    raw_current, raw_voltage, remain, full, cycles, design = values[tail:]
+
+    if raw_current >= CURRENT_SIGN_THRESHOLD:
+        raw_current = -1 * (CURRENT_UINT16_MAX - raw_current)
+    remain *= CAPACITY_SCALE
+    full *= CAPACITY_SCALE
+    design *= CAPACITY_SCALE
+
+    return PackAnalogData(
+        pack_number=pack_number,
+        cells=cells,
+        temps=temps,
+        i_pack=raw_current / CURRENT_SCALE,
+        v_pack=raw_voltage / VOLTAGE_SCALE,
+        i_remain_cap=remain,
+        i_full_cap=full,
+        i_design_cap=design,
+        soc=round(remain / full * 100, 2) if full else 0.0,
+        soh=round(full / design * 100, 2) if design else 0.0,
+        cycles=cycles,
+        cells_max_diff=max(cells) - min(cells) if cells else 0,
+    )
 
-    return result
 
+def _unpack_analog_data(raw: bytes) -> list[PackAnalogData]:
+    return [
+        _pack_from_values(p, layout.unpack_from(raw, offset), num_cells, num_temps)
+        for p, offset, num_cells, num_temps, layout in _iter_analog_records(raw)
+    ]
 
-def get_pack_capacity(transport) -> PackCapacity:
-    """Retrieve overall pack capacity data."""
-    info = _exchange(transport, constants.cid2PackCapacity)
 
+def _decode_pack_capacity(info: bytes) -> PackCapacity:
     byte_index = 0
     remain = int(info[byte_index : byte_index + 4], 16) * CAPACITY_SCALE
     byte_index += 4
@@ -246,15 +291,7 @@ def get_pack_capacity(transport) -> PackCapacity:
     )
 
 
-def get_warn_info(transport, packs: int) -> list[PackWarnInfo]:
-    """
-    Retrieve warning and protection states for all packs.
-
-    ``packs`` must match the pack count from a prior ``get_analog_data``
-    call so the parser can iterate the correct number of packs.
-    """
-    info = _exchange(transport, constants.cid2WarnInfo, info=b"FF")
-
+def _decode_warn_info(info: bytes, packs: int) -> list[PackWarnInfo]:
     byte_index = 2
     byte_index += 2  # skip pack count echo
 
@@ -368,3 +405,151 @@ def get_warn_info(transport, packs: int) -> list[PackWarnInfo]:
         )
 
     return result
+
+
+# ---------------------------------------------------------------------------
+# Public BMS commands
+#
+# ``adr`` selects the pack on an RS485 bus; the default of 1 addresses the
+# master pack, which answers for the whole stack on most Pace firmware.
+# ---------------------------------------------------------------------------
+
+
+def get_version(transport, adr: int = 1) -> str:
+    """Return the BMS software version string."""
+    info = _exchange(transport, constants.cid2SoftwareVersion, adr=_hex_arg(adr))
+    return _decode(transport, _decode_version, info)
+
+
+def get_serial(transport, adr: int = 1) -> tuple[str, str]:
+    """Return ``(bms_serial_number, pack_serial_number)``."""
+    info = _exchange(transport, constants.cid2SerialNumber, adr=_hex_arg(adr))
+    return _decode(transport, _decode_serial, info)
+
+
+def get_analog_data(
+    transport, bat_number: int = 255, adr: int = 1
+) -> list[PackAnalogData]:
+    """
+    Retrieve analog measurements for all packs.
+
+    ``bat_number=255`` requests data for all packs simultaneously.
+    Returns one ``PackAnalogData`` per pack detected in the response.
+    """
+    info = _exchange(
+        transport, constants.cid2PackAnalogData,
+        info=_hex_arg(bat_number), adr=_hex_arg(adr),
+    )
+    return _decode(transport, _decode_analog_data, info)
+
+
+def get_pack_capacity(transport, adr: int = 1) -> PackCapacity:
+    """Retrieve overall pack capacity data."""
+    info = _exchange(transport, constants.cid2PackCapacity, adr=_hex_arg(adr))
+    return _decode(transport, _decode_pack_capacity, info)
+
+
+def get_warn_info(transport, packs: int, adr: int = 1) -> list[PackWarnInfo]:
+    """
+    Retrieve warning and protection states for all packs.
+
+    ``packs`` must match the pack count from a prior ``get_analog_data``
+    call so the parser can iterate the correct number of packs.
+    """
+    info = _exchange(transport, constants.cid2WarnInfo, info=b"FF", adr=_hex_arg(adr))
+    return _decode(transport, _decode_warn_info, info, packs)
+
+
+# ---------------------------------------------------------------------------
+# Pipelined BMS commands
+#
+# Each returns ``(adr, result)`` per address in *adrs*, where *result* is
+# the decoded value or the exception that address failed with.
+# ---------------------------------------------------------------------------
+
+
+def _exchange_batch(
+    transport,
+    cid2: bytes,
+    info: bytes,
+    adrs: Sequence[int],
+    decode: Callable[[bytes], _T],
+) -> list[tuple[int, _T | Exception]]:
+    requests = [build_request(cid2=cid2, info=info, adr=_hex_arg(adr)) for adr in adrs]
+    timings = getattr(transport, "timings", None)
+    results: list[tuple[int, _T | Exception]] = []
+    for adr, frame in zip(adrs, transport.exchange_batch(requests)):
+        if frame is None:
+            results.append((adr, TransportTimeout(f"No response from ADR {adr}")))
+            continue
+        try:
+            results.append((adr, _decode(transport, decode, _check_response(frame, timings))))
+        except (RuntimeError, ValueError) as exc:
+            results.append((adr, exc))
+    return results
+
+
+def get_analog_data_batch(
+    transport, adrs: Sequence[int], bat_number: int = 255
+) -> list[tuple[int, list[PackAnalogData] | Exception]]:
+    """Pipelined ``get_analog_data`` for every address in *adrs*."""
+    return _exchange_batch(
+        transport, constants.cid2PackAnalogData, _hex_arg(bat_number), adrs,
+        _decode_analog_data,
+    )
+
+
+def get_warn_info_batch(
+    transport, adrs: Sequence[int], packs: int
+) -> list[tuple[int, list[PackWarnInfo] | Exception]]:
+    """Pipelined ``get_warn_info`` for every address in *adrs*."""
+    return _exchange_batch(
+        transport, constants.cid2WarnInfo, b"FF", adrs,
+        lambda info: _decode_warn_info(info, packs),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Async BMS commands
+# ---------------------------------------------------------------------------
+
+
+async def async_get_version(transport, adr: int = 1) -> str:
+    """Async counterpart of ``get_version``."""
+    info = await _async_exchange(
+        transport, constants.cid2SoftwareVersion, adr=_hex_arg(adr)
+    )
+    return _decode_version(info)
+
+
+async def async_get_serial(transport, adr: int = 1) -> tuple[str, str]:
+    """Async counterpart of ``get_serial``."""
+    info = await _async_exchange(transport, constants.cid2SerialNumber, adr=_hex_arg(adr))
+    return _decode_serial(info)
+
+
+async def async_get_analog_data(
+    transport, bat_number: int = 255, adr: int = 1
+) -> list[PackAnalogData]:
+    """Async counterpart of ``get_analog_data``."""
+    info = await _async_exchange(
+        transport, constants.cid2PackAnalogData,
+        info=_hex_arg(bat_number), adr=_hex_arg(adr),
+    )
+    return _decode_analog_data(info)
+
+
+async def async_get_pack_capacity(transport, adr: int = 1) -> PackCapacity:
+    """Async counterpart of ``get_pack_capacity``."""
+    info = await _async_exchange(transport, constants.cid2PackCapacity, adr=_hex_arg(adr))
+    return _decode_pack_capacity(info)
+
+
+async def async_get_warn_info(
+    transport, packs: int, adr: int = 1
+) -> list[PackWarnInfo]:
+    """Async counterpart of ``get_warn_info``."""
+    info = await _async_exchange(
+        transport, constants.cid2WarnInfo, info=b"FF", adr=_hex_arg(adr)
+    )
+    return _decode_warn_info(info, packs)
@@ -0,0 +1,105 @@
+"""
+RS485 bus scheduling.
+
+Volta and some Pace stacks only report per-pack data when each pack is
+addressed individually by its ADR.  ``BusScheduler`` serialises requests
+to the addresses sharing one physical link and walks them back-to-back,
+rotating the starting address each cycle so that no pack is
+systematically read last.
+
+If the transport is ``pipelined``, ``poll`` can instead send the requests
+for all addresses at once through a ``_batch`` command from ``bms``.  The
+addresses that fail in the batch are read again one by one through the
+per-address command, so a lost frame still gets the session's retries.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Sequence
+
+from .transport import TransportError
+
+logger = logging.getLogger(__name__)
+
+# Failures of one address that must not stall the rest of the bus
+_ADR_ERRORS = (RuntimeError, ValueError, TransportError)
+
+
+class BusScheduler:
+    """Serialised, round-robin access to several BMS addresses on one link."""
+
+    def __init__(self, transport, addresses: Sequence[int]) -> None:
+        if not addresses:
+            raise ValueError("BusScheduler needs at least one address")
+        self._transport = transport
+        self._addresses = list(addresses)
+        self._lock = threading.Lock()
+        self._start = 0
+
+    @property
+    def addresses(self) -> list[int]:
+        return list(self._addresses)
+
+    def call(self, command: Callable[..., Any], adr: int, *args: Any) -> Any:
+        """Run one BMS *command* against *adr* with exclusive use of the link."""
+        with self._lock:
+            return command(self._transport, *args, adr=adr)
+
+    @property
+    def pipelined(self) -> bool:
+        return getattr(self._transport, "pipelined", False) is True
+
+    def poll(
+        self,
+        command: Callable[..., Any],
+        *args: Any,
+        batch: Callable[..., list[tuple[int, Any]]] | None = None,
+    ) -> list[tuple[int, Any]]:
+        """
+        Run *command* against every address and return ``(adr, result)`` pairs.
+
+        Results are ordered by address.  An address that fails is logged and
+        left out so that one silent pack does not stall the rest of the bus;
+        only when every address fails is the last error re-raised.
+
+        On a pipelined transport *batch* (e.g. ``get_analog_data_batch``),
+        if given, reads all addresses in one exchange instead; the addresses
+        it fails for fall back to *command*.
+        """
+        n = len(self._addresses)
+        order = self._addresses[self._start:] + self._addresses[: self._start]
+        self._start = (self._start + 1) % n
+
+        outcomes: list[tuple[int, Any]] = []
+        if batch is not None and self.pipelined:
+            with self._lock:
+                batched = batch(self._transport, order, *args)
+            retry = []
+            for adr, outcome in batched:
+                if isinstance(outcome, _ADR_ERRORS):
+                    logger.debug("ADR %d: %s in batch – reading it alone", adr, outcome)
+                    retry.append(adr)
+                else:
+                    outcomes.append((adr, outcome))
+            order = retry
+
+        for adr in order:
+            try:
+                outcomes.append((adr, self.call(command, adr, *args)))
+            except _ADR_ERRORS as exc:
+                outcomes.append((adr, exc))
+
+        results: list[tuple[int, Any]] = []
+        last_exc: Exception | None = None
+        for adr, outcome in outcomes:
+            if isinstance(outcome, _ADR_ERRORS):
+                logger.warning("ADR %d: %s", adr, outcome)
+                last_exc = outcome
+            else:
+                results.append((adr, outcome))
+
+        if not results and last_exc is not None:
+            raise last_exc
+        results.sort(key=lambda item: item[0])
+        return results
@@ -0,0 +1,350 @@
+"""
+Record and replay BMS traffic.
+
+``RecordingTransport`` wraps any ``Transport`` and appends every request,
+response, timeout and link error to a capture file, stamped with the
+monotonic time since the capture started.  ``ReplayTransport`` satisfies
+the ``Transport`` protocol by serving a capture back: each response is
+released at its recorded time, scaled by ``speed`` (``speed=100`` replays
+a day in under 15 minutes; ``speed=0`` replays as fast as possible), and
+recorded timeouts and link errors are raised again, so intermittent
+failures reproduce offline.
+
+A replay exposes its capture-time ``clock`` and ``sleep`` so that the
+poller's scheduler, retries and pacing run on the same accelerated time.
+Responses are served in recorded order; a request that differs from the
+recorded one is counted in ``mismatches``.
+
+File layout (``.gz`` paths are gzip-compressed)::
+
+    header   magic "BMSC" | version (u8) | flags (u8) | wall-clock start (f64)
+    records  kind (u8) | offset (f64, s) | length (u16) | frame or error text
+"""
+from __future__ import annotations
+
+import collections
+import gzip
+import logging
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, Sequence
+
+from .config import BmsEndpoint
+from .transport import TransportError, TransportTimeout, create_transport
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"BMSC"
+_VERSION = 1
+_HEADER = struct.Struct(">4sBBd")
+_RECORD = struct.Struct(">BdH")
+
+_FLAG_PIPELINED = 0x01
+
+# Record kinds
+TX = 0        # request written to the link
+RX = 1        # response frame received
+TIMEOUT = 2   # no response before the deadline
+ERROR = 3     # link error (payload: message)
+
+# Buffered records are pushed to disk at least this often (s)
+_FLUSH_INTERVAL = 1.0
+
+
+class ReplayFinished(Exception):
+    """Raised by a ``ReplayTransport`` once its capture is exhausted."""
+
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    kind: int
+    offset: float   # seconds since the start of the capture
+    data: bytes
+
+
+def _open(path: str, mode: str) -> BinaryIO:
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def read_capture(path: str) -> tuple[float, int, Iterator[CaptureRecord]]:
+    """
+    Open a capture file; return its wall-clock start, flags and records.
+
+    A record cut short at the end of the file (e.g. by a power loss
+    while recording, or a ``.gz`` capture that was never closed) ends
+    the iteration silently.
+    """
+    fh = _open(path, "rb")
+    try:
+        header = fh.read(_HEADER.size)
+    except (EOFError, zlib.error):
+        header = b""
+    if len(header) < _HEADER.size:
+        fh.close()
+        raise ValueError(f"{path!r} is not a capture file")
+    magic, version, flags, started = _HEADER.unpack(header)
+    if magic != _MAGIC or version != _VERSION:
+        fh.close()
+        raise ValueError(f"{path!r} is not a version {_VERSION} capture file")
+
+    def _records() -> Iterator[CaptureRecord]:
+        with fh:
+            while True:
+                try:
+                    head = fh.read(_RECORD.size)
+                    if len(head) < _RECORD.size:
+                        return
+                    kind, offset, length = _RECORD.unpack(head)
+                    data = fh.read(length)
+                except (EOFError, zlib.error):
+                    return   # gzip stream without its end marker
+                if len(data) < length:
+                    return
+                yield CaptureRecord(kind, offset, data)
+
+    return started, flags, _records()
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+
+class RecordingTransport:
+    """Pass-through ``Transport`` that logs all traffic to a capture file."""
+
+    def __init__(
+        self,
+        inner,
+        path: str,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._inner = inner
+        self._clock = clock
+        self._fh = _open(path, "wb")
+        self._fh.write(_HEADER.pack(
+            _MAGIC, _VERSION, _FLAG_PIPELINED if self.pipelined else 0, time.time()
+        ))
+        self._start = clock()
+        self._last_flush = self._start
+        self.records = 0
+
+    def __getattr__(self, name: str):
+        # Transport-specific extras (``stale_frames`` …) come from the wrapped transport
+        if name == "_inner":
+            raise AttributeError(name)
+        return getattr(self._inner, name)
+
+    @property
+    def pipelined(self) -> bool:
+        return getattr(self._inner, "pipelined", False) is True
+
+    @property
+    def timings(self):
+        return getattr(self._inner, "timings", None)
+
+    @timings.setter
+    def timings(self, value) -> None:
+        # Stage timing is measured by the wrapped transport
+        self._inner.timings = value
+
+    def _write(self, kind: int, data: bytes) -> None:
+        now = self._clock()
+        self._fh.write(_RECORD.pack(kind, now - self._start, len(data)) + data)
+        self.records += 1
+        if now - self._last_flush >= _FLUSH_INTERVAL:
+            self._fh.flush()
+            self._last_flush = now
+
+    def _write_error(self, exc: Exception) -> None:
+        if isinstance(exc, TransportTimeout):
+            self._write(TIMEOUT, b"")
+        else:
+            self._write(ERROR, str(exc).encode("utf-8", "replace")[:0xFFFF])
+
+    def connect(self) -> None:
+        self._inner.connect()
+
+    def disconnect(self) -> None:
+        self._inner.disconnect()
+        self._fh.flush()
+
+    def send(self, data: bytes) -> None:
+        self._write(TX, data)
+        try:
+            self._inner.send(data)
+        except OSError as exc:
+            self._write_error(exc)
+            raise
+
+    def receive(self) -> bytes:
+        try:
+            frame = self._inner.receive()
+        except OSError as exc:
+            self._write_error(exc)
+            raise
+        self._write(RX, frame)
+        return frame
+
+    def exchange_batch(self, requests: Sequence[bytes]) -> list[bytes | None]:
+        for request in requests:
+            self._write(TX, request)
+        try:
+            responses = self._inner.exchange_batch(requests)
+        except OSError as exc:
+            self._write_error(exc)
+            raise
+        for response in responses:
+            if response is None:
+                self._write(TIMEOUT, b"")
+            else:
+                self._write(RX, response)
+        return responses
+
+    @property
+    def is_connected(self) -> bool:
+        return self._inner.is_connected
+
+    def close(self) -> None:
+        """Close the capture file (the wrapped transport is left alone)."""
+        self._fh.close()
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+
+class ReplayTransport:
+    """``Transport`` serving the responses of a capture file at its recorded pace."""
+
+    def __init__(
+        self,
+        path: str,
+        speed: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if speed < 0:
+            raise ValueError(f"Replay speed must not be negative, got {speed}")
+        self.started, flags, self._records = read_capture(path)
+        self._pipelined = bool(flags & _FLAG_PIPELINED)
+        self._speed = speed
+        self._real_clock = clock
+        self._real_sleep = sleep
+        self._origin = clock()
+        self._virtual = 0.0   # capture time reached when unthrottled
+        self._requests: collections.deque[CaptureRecord] = collections.deque()
+        self._outcomes: collections.deque[CaptureRecord] = collections.deque()
+        self._connected = False
+        self._finished = False
+        self.replayed = 0
+        self.mismatches = 0
+        self.timings = None   # parse / decode timing only; nothing is on the wire
+
+    @property
+    def pipelined(self) -> bool:
+        return self._pipelined
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    # ------------------------------------------------------------------
+    # Capture time
+    # ------------------------------------------------------------------
+
+    def clock(self) -> float:
+        """Current capture time (seconds since the start of the capture)."""
+        if not self._speed:
+            return self._virtual
+        return (self._real_clock() - self._origin) * self._speed
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep for *seconds* of capture time."""
+        if seconds <= 0:
+            return
+        if not self._speed:
+            self._virtual += seconds
+        else:
+            self._real_sleep(seconds / self._speed)
+
+    def _wait_until(self, offset: float) -> None:
+        if not self._speed:
+            self._virtual = max(self._virtual, offset)
+        else:
+            self.sleep(offset - self.clock())
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+
+    def _pull(self, queue: collections.deque[CaptureRecord]) -> CaptureRecord:
+        """Next record destined for *queue*, reading ahead as needed."""
+        while not queue:
+            record = next(self._records, None)
+            if record is None:
+                self._finished = True
+                raise ReplayFinished(f"capture exhausted after {self.replayed} responses")
+            (self._requests if record.kind == TX else self._outcomes).append(record)
+        return queue.popleft()
+
+    def connect(self) -> None:
+        if self._finished:
+            raise ReplayFinished("capture exhausted")
+        self._connected = True
+
+    def disconnect(self) -> None:
+        self._connected = False
+
+    def send(self, data: bytes) -> None:
+        if not self._connected:
+            raise TransportError("Replay transport not connected")
+        record = self._pull(self._requests)
+        if record.data != data:
+            self.mismatches += 1
+            logger.debug("Replay request mismatch: sent %r, recorded %r", data, record.data)
+
+    def receive(self) -> bytes:
+        if not self._connected:
+            raise TransportError("Replay transport not connected")
+        record = self._pull(self._outcomes)
+        self._wait_until(record.offset)
+        self.replayed += 1
+        if record.kind == TIMEOUT:
+            raise TransportTimeout("Timed out waiting for a response (replayed)")
+        if record.kind == ERROR:
+            raise TransportError(record.data.decode("utf-8", "replace"))
+        return record.data
+
+    def exchange_batch(self, requests: Sequence[bytes]) -> list[bytes | None]:
+        for request in requests:
+            self.send(request)
+        results: list[bytes | None] = []
+        for _ in requests:
+            try:
+                results.append(self.receive())
+            except TransportTimeout:
+                results.append(None)
+        return results
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+
+def open_transport(endpoint: BmsEndpoint, replay_speed: float = 1.0):
+    """
+    Transport for *endpoint*: a replay of ``replay_path`` if set, otherwise
+    the real link, recorded to ``capture_path`` if set.
+    """
+    if endpoint.replay_path:
+        logger.info("[%s] Replaying %s at %gx", endpoint.name, endpoint.replay_path, replay_speed)
+        return ReplayTransport(endpoint.replay_path, speed=replay_speed)
+    transport = create_transport(endpoint)
+    if endpoint.capture_path:
+        logger.info("[%s] Recording BMS traffic to %s", endpoint.name, endpoint.capture_path)
+        return RecordingTransport(transport, endpoint.capture_path)
+    return transport
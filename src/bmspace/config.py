@@ -3,10 +3,38 @@ from __future__ import annotations
 
 import json
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import yaml
 
+from .publish_cache import Deadband
+
+
+@dataclass
+class BmsEndpoint:
+    """One BMS link polled by the fleet poller."""
+
+    name: str
+    connection_type: str   # "Serial" | "IP"
+    bms_ip: str
+    bms_port: int
+    bms_serial: str
+    base_topic: str
+    response_timeout: float = 2.0
+    packs_to_read: int = 0   # >0: poll ADR 1..N individually on an RS485 bus
+    pipeline: bool = False   # TCP only: send a bus poll's requests back-to-back
+    capture_path: str = ""   # record all BMS traffic to this capture file
+    replay_path: str = ""    # serve a capture file instead of talking to the BMS
+
+
+@dataclass(frozen=True)
+class Retention:
+    """How long each recorder tier is kept, in seconds."""
+
+    raw: float = 2 * 86400.0
+    minute: float = 30 * 86400.0
+    hour: float = 365 * 86400.0
+
 
 @dataclass
 class Config:
@@ -23,6 +51,48 @@ class Config:
     bms_serial: str
     scan_interval: int
     debug_output: int
+    response_timeout: float = 2.0   # overall deadline for one response frame (s)
+    packs_to_read: int = 0
+    pipeline: bool = False
+    # Retries of a failed command before reconnecting
+    command_retries: int = 2
+    retry_backoff: float = 0.2   # first retry delay (s), doubled per attempt, with jitter
+    # AIMD gap between commands, adapted to each link's latency and error rate
+    adaptive_pacing: bool = True
+    command_gap_max: float = 2.0
+    # Per-command polling periods (s); each defaults to ``scan_interval``
+    analog_interval: float | None = None
+    warn_interval: float | None = None
+    capacity_interval: float | None = None
+    # Change-only publishing
+    publish_on_change: bool = False
+    publish_max_age: float = 300.0   # republish unchanged values after this many s
+    deadbands: dict[str, Deadband] = field(default_factory=dict)
+    publish_mode: str = "topics"   # "topics" | "json" (one document per pack)
+    history_size: int = 0   # analog samples kept in memory per pack (0: no history)
+    # Local SQLite recorder (disabled while ``recorder_path`` is empty)
+    recorder_path: str = ""
+    recorder_flush_interval: float = 10.0
+    recorder_retention: Retention = field(default_factory=Retention)
+    # Store-and-forward while the broker is down (disabled while ``outbox_dir`` is empty)
+    outbox_dir: str = ""
+    outbox_segment_size: int = 1 << 20   # bytes per memory-mapped segment file
+    outbox_max_segments: int = 16
+    outbox_replay_rate: float = 50.0     # messages/s replayed after reconnecting
+    # Publish worker thread (0: publish from the polling thread)
+    publish_queue_size: int = 0
+    publish_queue_policy: str = "drop_oldest"   # "drop_oldest" | "coalesce" | "block"
+    mqtt_enabled: bool = True   # off: no MQTT at all (e.g. Prometheus only)
+    # Prometheus endpoint on http://metrics_host:metrics_port/metrics (0: disabled)
+    metrics_port: int = 0
+    metrics_host: str = "0.0.0.0"
+    # Traffic capture / replay (see ``capture``)
+    capture_path: str = ""
+    replay_path: str = ""
+    replay_speed: float = 1.0   # 0: as fast as possible
+    # Hot-path timing summaries on <base topic>/diagnostics/<stage> every N s (0: off)
+    diagnostics_interval: float = 0.0
+    bms_endpoints: list[BmsEndpoint] = field(default_factory=list)
 
 
 def load_config(
@@ -50,6 +120,29 @@ def load_config(
             f"No config file found (tried {options_path!r} and {yaml_path!r})"
         )
 
+    base_topic = raw["mqtt_base_topic"]
+    response_timeout = float(raw.get("response_timeout", 2.0))
+    packs_to_read = int(raw.get("packs_to_read", 0))
+    pipeline = bool(raw.get("pipeline", False))
+    scan_interval = int(raw["scan_interval"])
+
+    endpoints = [
+        BmsEndpoint(
+            name=ep["name"],
+            connection_type=ep.get("connection_type", raw["connection_type"]),
+            bms_ip=ep.get("bms_ip", ""),
+            bms_port=int(ep.get("bms_port", 5000)),
+            bms_serial=ep.get("bms_serial", "/dev/ttyUSB0"),
+            base_topic=ep.get("base_topic", f"{base_topic}/{ep['name']}"),
+            response_timeout=float(ep.get("response_timeout", response_timeout)),
+            packs_to_read=int(ep.get("packs_to_read", packs_to_read)),
+            pipeline=bool(ep.get("pipeline", pipeline)),
+            capture_path=ep.get("capture_path", ""),
+            replay_path=ep.get("replay_path", ""),
+        )
+        for ep in raw.get("bms_endpoints") or []
+    ]
+
     return Config(
         mqtt_host=raw["mqtt_host"],
         mqtt_port=int(raw["mqtt_port"]),
@@ -57,11 +150,91 @@ def load_config(
         mqtt_password=raw["mqtt_password"],
         mqtt_ha_discovery=bool(raw["mqtt_ha_discovery"]),
         mqtt_ha_discovery_topic=raw["mqtt_ha_discovery_topic"],
-        mqtt_base_topic=raw["mqtt_base_topic"],
+        mqtt_base_topic=base_topic,
         connection_type=raw["connection_type"],
         bms_ip=raw.get("bms_ip", ""),
         bms_port=int(raw.get("bms_port", 5000)),
         bms_serial=raw.get("bms_serial", "/dev/ttyUSB0"),
-        scan_interval=int(raw["scan_interval"]),
+        scan_interval=scan_interval,
         debug_output=int(raw.get("debug_output", 0)),
+        response_timeout=response_timeout,
+        packs_to_read=packs_to_read,
+        pipeline=pipeline,
+        command_retries=int(raw.get("command_retries", 2)),
+        retry_backoff=float(raw.get("retry_backoff", 0.2)),
+        adaptive_pacing=bool(raw.get("adaptive_pacing", True)),
+        command_gap_max=float(raw.get("command_gap_max", 2.0)),
+        analog_interval=float(raw.get("analog_interval", scan_interval)),
+        warn_interval=float(raw.get("warn_interval", scan_interval)),
+        capacity_interval=float(raw.get("capacity_interval", scan_interval)),
+        publish_on_change=bool(raw.get("publish_on_change", False)),
+        publish_max_age=float(raw.get("publish_max_age", 300.0)),
+        deadbands={
+            metric: _parse_deadband(spec)
+            for metric, spec in (raw.get("deadbands") or {}).items()
+        },
+        publish_mode=raw.get("publish_mode", "topics"),
+        history_size=int(raw.get("history_size", 0)),
+        recorder_path=raw.get("recorder_path", ""),
+        recorder_flush_interval=float(raw.get("recorder_flush_interval", 10.0)),
+        recorder_retention=_parse_retention(raw.get("recorder_retention_days") or {}),
+        outbox_dir=raw.get("outbox_dir", ""),
+        outbox_segment_size=int(raw.get("outbox_segment_size", 1 << 20)),
+        outbox_max_segments=int(raw.get("outbox_max_segments", 16)),
+        outbox_replay_rate=float(raw.get("outbox_replay_rate", 50.0)),
+        publish_queue_size=int(raw.get("publish_queue_size", 0)),
+        publish_queue_policy=raw.get("publish_queue_policy", "drop_oldest"),
+        mqtt_enabled=bool(raw.get("mqtt_enabled", True)),
+        metrics_port=int(raw.get("metrics_port", 0)),
+        metrics_host=raw.get("metrics_host", "0.0.0.0"),
+        capture_path=raw.get("capture_path", ""),
+        replay_path=raw.get("replay_path", ""),
+        replay_speed=float(raw.get("replay_speed", 1.0)),
+        diagnostics_interval=float(raw.get("diagnostics_interval", 0.0)),
+        bms_endpoints=endpoints,
     )
+
+
+def _parse_deadband(spec: float | dict) -> Deadband:
+    """A bare number is an absolute deadband; a mapping may set ``absolute`` and ``relative``."""
+    if isinstance(spec, dict):
+        return Deadband(
+            absolute=float(spec.get("absolute", 0.0)),
+            relative=float(spec.get("relative", 0.0)),
+        )
+    return Deadband(absolute=float(spec))
+
+
+def _parse_retention(days: dict) -> Retention:
+    """Per-tier retention given in days (``raw``, ``minute``, ``hour``); missing tiers keep their default."""
+    defaults = Retention()
+    return Retention(**{
+        tier: float(days[tier]) * 86400.0 if tier in days else getattr(defaults, tier)
+        for tier in ("raw", "minute", "hour")
+    })
+
+
+def resolve_endpoints(config: Config) -> list[BmsEndpoint]:
+    """
+    Return the BMS endpoints to poll.
+
+    Without ``bms_endpoints`` the top-level connection settings describe a
+    single endpoint publishing under ``mqtt_base_topic``.
+    """
+    if config.bms_endpoints:
+        return list(config.bms_endpoints)
+    return [
+        BmsEndpoint(
+            name="bms",
+            connection_type=config.connection_type,
+            bms_ip=config.bms_ip,
+            bms_port=config.bms_port,
+            bms_serial=config.bms_serial,
+            base_topic=config.mqtt_base_topic,
+            response_timeout=config.response_timeout,
+            packs_to_read=config.packs_to_read,
+            pipeline=config.pipeline,
+            capture_path=config.capture_path,
+            replay_path=config.replay_path,
+        )
+    ]
@@ -0,0 +1,271 @@
+"""
+In-memory time-series history of analog samples.
+
+``History`` keeps one ``PackSeries`` per pack: a fixed-capacity ring of
+timestamps plus one preallocated typed array column per metric, so
+recording a poll is O(1) and never allocates once the series exists.
+Windowed queries (``window(pack, "v_pack", 60)``) binary-search the
+timestamp column and reduce over at most two array slices.
+
+Metric names follow the MQTT leaf names: the scalar ``PackAnalogData``
+fields plus ``cell_1`` … ``cell_N`` and ``temp_1`` … ``temp_N``.
+
+Scalar columns are ``array('d')``; cell voltages are kept as ``array('H')``
+in mV and temperatures as ``array('h')`` in tenths of a degree, so a
+16-cell pack costs about half the memory per sample and hours of 1 Hz
+data fit comfortably on a small gateway.  Queries return the values in
+their usual units.  Readings outside an integer column's range (e.g. the
+6280.5 °C of a faulted temperature sensor) are stored saturated at the
+range limit.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Iterable, Sequence
+
+from .bms import PackAnalogData
+
+SCALAR_METRICS = (
+    "i_pack",
+    "v_pack",
+    "i_remain_cap",
+    "i_full_cap",
+    "i_design_cap",
+    "soc",
+    "soh",
+    "cycles",
+    "cells_max_diff",
+)
+
+
+@dataclass(frozen=True)
+class WindowStats:
+    """Summary of one metric over a time window."""
+
+    count: int
+    min: float
+    max: float
+    mean: float
+
+
+def _column_format(metric: str) -> tuple[str, int | None]:
+    """``(array typecode, scale)`` of a metric's column; ``None``: stored as is."""
+    if metric.startswith("cell_"):
+        return "H", 1      # mV
+    if metric.startswith("temp_"):
+        return "h", 10     # tenths of °C
+    return "d", None
+
+
+# Value range of the integer column typecodes
+_INT_RANGES = {"H": (0, 0xFFFF), "h": (-0x8000, 0x7FFF)}
+
+
+def _saturate(value: float, lo: int, hi: int) -> int:
+    """Round *value* into ``lo..hi``; NaN is stored as *lo*."""
+    if value >= hi:
+        return hi
+    if value >= lo:
+        return round(value)
+    return lo
+
+
+def pack_metrics(num_cells: int, num_temps: int) -> tuple[str, ...]:
+    """Column names for a pack with *num_cells* cells and *num_temps* sensors."""
+    return (
+        SCALAR_METRICS
+        + tuple(f"cell_{i}" for i in range(1, num_cells + 1))
+        + tuple(f"temp_{i}" for i in range(1, num_temps + 1))
+    )
+
+
+def pack_row(pack: PackAnalogData) -> list[float]:
+    """Sample values in ``pack_metrics`` order."""
+    row = [getattr(pack, name) for name in SCALAR_METRICS]
+    row.extend(pack.cells)
+    row.extend(pack.temps)
+    return row
+
+
+class PackSeries:
+    """Fixed-capacity columnar ring buffer for one pack."""
+
+    def __init__(self, capacity: int, metrics: Sequence[str]) -> None:
+        if capacity <= 0:
+            raise ValueError(f"PackSeries needs a positive capacity, got {capacity}")
+        self._capacity = capacity
+        self._metrics = tuple(metrics)
+        formats = [_column_format(metric) for metric in self._metrics]
+        self._times = array("d", bytes(8 * capacity))
+        self._columns = [array(code, bytes(array(code).itemsize * capacity)) for code, _ in formats]
+        self._scales = [scale for _, scale in formats]
+        self._ranges = [_INT_RANGES.get(code, (0, 0)) for code, _ in formats]
+        self._by_name = dict(zip(self._metrics, zip(self._columns, self._scales)))
+        self._head = 0     # next slot to write
+        self._count = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def metrics(self) -> tuple[str, ...]:
+        return self._metrics
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, row: Sequence[float]) -> None:
+        """Record one sample; *row* holds a value per metric, in ``metrics`` order."""
+        if len(row) != len(self._columns):
+            raise ValueError(f"Expected {len(self._columns)} values, got {len(row)}")
+        head = self._head
+        if self._count:
+            # Keep the timestamp column sorted even if the wall clock steps back
+            timestamp = max(timestamp, self._times[(head - 1) % self._capacity])
+        self._times[head] = timestamp
+        for column, scale, (lo, hi), value in zip(self._columns, self._scales, self._ranges, row):
+            column[head] = value if scale is None else _saturate(value * scale, lo, hi)
+        self._head = (head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _start(self) -> int:
+        """Physical index of the oldest sample."""
+        return (self._head - self._count) % self._capacity
+
+    def _first_since(self, since: float) -> int:
+        """Logical index of the first sample with a timestamp >= *since*."""
+        times, start, cap = self._times, self._start(), self._capacity
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[(start + mid) % cap] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _slices(self, column: array, first: int) -> list[array]:
+        """Logical range ``first``..end of *column* as at most two physical slices."""
+        begin = (self._start() + first) % self._capacity
+        n = self._count - first
+        if n <= 0:
+            return []
+        end = begin + n
+        if end <= self._capacity:
+            return [column[begin:end]]
+        return [column[begin:], column[: end - self._capacity]]
+
+    def timestamps(self, since: float | None = None) -> list[float]:
+        first = 0 if since is None else self._first_since(since)
+        return [t for part in self._slices(self._times, first) for t in part]
+
+    def values(self, metric: str, since: float | None = None) -> list[float]:
+        first = 0 if since is None else self._first_since(since)
+        column, scale = self._by_name[metric]
+        values = [v for part in self._slices(column, first) for v in part]
+        return values if scale is None else [v / scale for v in values]
+
+    def latest(self, metric: str) -> tuple[float, float] | None:
+        """``(timestamp, value)`` of the newest sample, or ``None`` if empty."""
+        if not self._count:
+            return None
+        last = (self._head - 1) % self._capacity
+        column, scale = self._by_name[metric]
+        value = column[last]
+        return self._times[last], value if scale is None else value / scale
+
+    def stats(self, metric: str, since: float) -> WindowStats | None:
+        """Min / max / mean of *metric* over samples taken at or after *since*."""
+        column, scale = self._by_name[metric]
+        parts = self._slices(column, self._first_since(since))
+        count = sum(len(part) for part in parts)
+        if not count:
+            return None
+        scale = scale or 1
+        return WindowStats(
+            count=count,
+            min=min(min(part) for part in parts) / scale,
+            max=max(max(part) for part in parts) / scale,
+            mean=sum(sum(part) for part in parts) / count / scale,
+        )
+
+
+class History:
+    """Per-pack ``PackSeries`` of the most recent *capacity* analog polls."""
+
+    def __init__(
+        self,
+        capacity: int,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError(f"History needs a positive capacity, got {capacity}")
+        self._capacity = capacity
+        self._clock = clock
+        self._series: dict[int, PackSeries] = {}
+        self._layouts: dict[int, tuple[int, int]] = {}   # pack -> (cells, temps)
+        self._lock = threading.Lock()
+
+    @property
+    def packs(self) -> list[int]:
+        with self._lock:
+            return sorted(self._series)
+
+    def record(self, packs: Iterable[PackAnalogData], timestamp: float | None = None) -> None:
+        """
+        Append one sample per pack, all stamped with *timestamp* (default: now).
+
+        A pack whose cell or sensor count changes starts a fresh series.
+        """
+        if timestamp is None:
+            timestamp = self._clock()
+        with self._lock:
+            for pack in packs:
+                layout = (len(pack.cells), len(pack.temps))
+                series = self._series.get(pack.pack_number)
+                if series is None or self._layouts[pack.pack_number] != layout:
+                    series = PackSeries(self._capacity, pack_metrics(*layout))
+                    self._series[pack.pack_number] = series
+                    self._layouts[pack.pack_number] = layout
+                series.append(timestamp, pack_row(pack))
+
+    def series(self, pack_number: int) -> PackSeries | None:
+        return self._series.get(pack_number)
+
+    def latest(self, pack_number: int, metric: str) -> tuple[float, float] | None:
+        with self._lock:
+            series = self._series.get(pack_number)
+            return series.latest(metric) if series else None
+
+    def window(
+        self, pack_number: int, metric: str, seconds: float, now: float | None = None
+    ) -> WindowStats | None:
+        """
+        Statistics of *metric* for *pack_number* over the last *seconds*.
+
+        Returns ``None`` when the pack is unknown or no sample falls in the
+        window; raises ``KeyError`` for an unknown metric.
+        """
+        if now is None:
+            now = self._clock()
+        with self._lock:
+            series = self._series.get(pack_number)
+            return series.stats(metric, now - seconds) if series else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._layouts.clear()
@@ -0,0 +1,307 @@
+"""
+Prometheus metrics endpoint.
+
+A ``MetricsStore`` keeps the most recent poll results of every endpoint
+and renders them into Prometheus text exposition format when they
+arrive, so a scrape only joins pre-rendered lines and never triggers a
+BMS read.  Internal counters (stale frames, retries, pacing, publish
+queue, outbox) come from collector callbacks that are evaluated at
+scrape time; they only read in-memory attributes.
+
+``MetricsServer`` serves the store on ``GET /metrics`` from a small
+embedded HTTP server thread.
+
+Values are exported in base units: volts, amperes, ampere-hours and
+degrees Celsius.  Every sample carries an ``endpoint`` label, and pack
+samples a ``pack`` label.  Hot-path stage timings are exported as the
+``bmspace_stage_duration_seconds`` histogram with a ``stage`` label.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable, Iterator
+
+from .bms import PackAnalogData, PackCapacity, PackWarnInfo
+from .timing import StageTimings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# One exported sample: family name, labels, value
+Sample = tuple[str, dict[str, str], float]
+
+# name -> (type, help); also the order of families in the output
+FAMILIES: dict[str, tuple[str, str]] = {
+    "bms_info": ("gauge", "BMS identity (always 1)"),
+    "bms_last_poll_timestamp_seconds": ("gauge", "Unix time of the last analog poll"),
+    "bms_cell_voltage_volts": ("gauge", "Cell voltage"),
+    "bms_temperature_celsius": ("gauge", "Temperature sensor reading"),
+    "bms_pack_current_amperes": ("gauge", "Pack current (positive: charging)"),
+    "bms_pack_voltage_volts": ("gauge", "Pack voltage"),
+    "bms_pack_remaining_capacity_ampere_hours": ("gauge", "Remaining pack capacity"),
+    "bms_pack_full_capacity_ampere_hours": ("gauge", "Full-charge pack capacity"),
+    "bms_pack_design_capacity_ampere_hours": ("gauge", "Design pack capacity"),
+    "bms_pack_soc_percent": ("gauge", "Pack state of charge"),
+    "bms_pack_soh_percent": ("gauge", "Pack state of health"),
+    "bms_pack_cycles": ("gauge", "Pack charge cycles"),
+    "bms_pack_cell_voltage_spread_volts": ("gauge", "Highest minus lowest cell voltage"),
+    "bms_capacity_remaining_ampere_hours": ("gauge", "Remaining capacity of the stack"),
+    "bms_capacity_full_ampere_hours": ("gauge", "Full-charge capacity of the stack"),
+    "bms_capacity_design_ampere_hours": ("gauge", "Design capacity of the stack"),
+    "bms_capacity_soc_percent": ("gauge", "Stack state of charge"),
+    "bms_capacity_soh_percent": ("gauge", "Stack state of health"),
+    "bms_pack_warnings": ("gauge", "Number of active warnings"),
+    "bms_pack_balancing": ("gauge", "Cell balancing bitmask per bank"),
+    "bms_pack_state": ("gauge", "Protection and instruction state flags (0/1)"),
+    "bmspace_transport_stale_frames_total": ("counter", "Stale response frames discarded"),
+    "bmspace_session_retries_total": ("counter", "BMS commands retried"),
+    "bmspace_pacer_gap_seconds": ("gauge", "Current inter-command gap"),
+    "bmspace_pacer_latency_seconds": ("gauge", "Smoothed command latency"),
+    "bmspace_pacer_error_rate": ("gauge", "Smoothed command error rate"),
+    "bmspace_pacer_commands_total": ("counter", "BMS commands sent"),
+    "bmspace_pacer_errors_total": ("counter", "BMS commands failed"),
+    "bmspace_publish_queue_depth": ("gauge", "Messages waiting in the publish queue"),
+    "bmspace_publish_queue_high_watermark": ("gauge", "Highest publish queue depth seen"),
+    "bmspace_publish_queue_dropped_total": ("counter", "Messages dropped by the publish queue"),
+    "bmspace_publish_queue_coalesced_total": ("counter", "Messages replaced by a newer value"),
+    "bmspace_outbox_messages": ("gauge", "Messages buffered in the outbox"),
+    "bmspace_outbox_dropped_total": ("counter", "Messages dropped from a full outbox"),
+    "bmspace_stage_duration_seconds": ("histogram", "Time spent per hot-path stage"),
+}
+
+_HISTOGRAM_SERIES = ("_bucket", "_sum", "_count")
+
+_STATE_FLAGS = (
+    "prot_short_circuit", "prot_discharge_current", "prot_charge_current", "fully",
+    "current_limit", "charge_fet", "discharge_fet", "pack_indicate", "reverse",
+    "ac_in", "heart",
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _format(family: str, labels: dict[str, str], value: float) -> str:
+    text = _format_value(value)
+    if not labels:
+        return f"{family} {text}"
+    label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return f"{family}{{{label_text}}} {text}"
+
+
+def _group(samples: Iterable[Sample]) -> dict[str, list[str]]:
+    grouped: dict[str, list[str]] = {}
+    for family, labels, value in samples:
+        grouped.setdefault(family, []).append(_format(family, labels, float(value)))
+    return grouped
+
+
+# ---------------------------------------------------------------------------
+# Sample builders
+# ---------------------------------------------------------------------------
+
+
+def analog_samples(endpoint: str, packs: Iterable[PackAnalogData]) -> Iterator[Sample]:
+    for pack in packs:
+        base = {"endpoint": endpoint, "pack": str(pack.pack_number)}
+        for i, mv in enumerate(pack.cells, 1):
+            yield "bms_cell_voltage_volts", {**base, "cell": str(i)}, mv / 1000
+        for i, temp in enumerate(pack.temps, 1):
+            yield "bms_temperature_celsius", {**base, "sensor": str(i)}, temp
+        yield "bms_pack_current_amperes", base, pack.i_pack
+        yield "bms_pack_voltage_volts", base, pack.v_pack
+        yield "bms_pack_remaining_capacity_ampere_hours", base, pack.i_remain_cap / 1000
+        yield "bms_pack_full_capacity_ampere_hours", base, pack.i_full_cap / 1000
+        yield "bms_pack_design_capacity_ampere_hours", base, pack.i_design_cap / 1000
+        yield "bms_pack_soc_percent", base, pack.soc
+        yield "bms_pack_soh_percent", base, pack.soh
+        yield "bms_pack_cycles", base, pack.cycles
+        yield "bms_pack_cell_voltage_spread_volts", base, pack.cells_max_diff / 1000
+
+
+def capacity_samples(endpoint: str, cap: PackCapacity) -> Iterator[Sample]:
+    base = {"endpoint": endpoint}
+    yield "bms_capacity_remaining_ampere_hours", base, cap.remain_cap / 1000
+    yield "bms_capacity_full_ampere_hours", base, cap.full_cap / 1000
+    yield "bms_capacity_design_ampere_hours", base, cap.design_cap / 1000
+    yield "bms_capacity_soc_percent", base, cap.soc
+    yield "bms_capacity_soh_percent", base, cap.soh
+
+
+def warn_samples(endpoint: str, warns: Iterable[PackWarnInfo]) -> Iterator[Sample]:
+    for warn in warns:
+        base = {"endpoint": endpoint, "pack": str(warn.pack_number)}
+        yield "bms_pack_warnings", base, len(warn.warnings.split(", ")) if warn.warnings else 0
+        yield "bms_pack_balancing", {**base, "bank": "1"}, int(warn.balancing1, 2)
+        yield "bms_pack_balancing", {**base, "bank": "2"}, int(warn.balancing2, 2)
+        for flag in _STATE_FLAGS:
+            yield "bms_pack_state", {**base, "flag": flag}, getattr(warn, flag)
+
+
+def timing_samples(endpoint: str, timings: StageTimings) -> Iterator[Sample]:
+    """``bmspace_stage_duration_seconds`` series of every stage observed so far."""
+    family = "bmspace_stage_duration_seconds"
+    for stage, histogram in timings.histograms():
+        counts = list(histogram.counts)   # one consistent reading of the buckets
+        if not any(counts):
+            continue
+        base = {"endpoint": endpoint, "stage": stage}
+        cumulative = 0
+        for bound, n in zip(histogram.bounds + (math.inf,), counts):
+            cumulative += n
+            yield f"{family}_bucket", {**base, "le": _format_value(bound)}, cumulative
+        yield f"{family}_sum", base, histogram.total
+        yield f"{family}_count", base, cumulative
+
+
+def publisher_samples(publisher) -> Iterator[Sample]:
+    """Publish queue and outbox counters of an ``MqttPublisher``."""
+    queue = getattr(publisher, "publish_queue", None)
+    if queue is not None:
+        yield "bmspace_publish_queue_depth", {}, queue.depth
+        yield "bmspace_publish_queue_high_watermark", {}, queue.high_watermark
+        yield "bmspace_publish_queue_dropped_total", {}, queue.dropped
+        yield "bmspace_publish_queue_coalesced_total", {}, queue.coalesced
+    outbox = getattr(publisher, "outbox", None)
+    if outbox is not None:
+        yield "bmspace_outbox_messages", {}, len(outbox)
+        yield "bmspace_outbox_dropped_total", {}, outbox.dropped
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+
+class MetricsStore:
+    """Latest poll results per endpoint, pre-rendered for scraping."""
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (endpoint, section) -> family -> rendered sample lines
+        self._sections: dict[tuple[str, str], dict[str, list[str]]] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        self._rendered: dict[str, list[str]] | None = None
+
+    def _store(self, endpoint: str, section: str, samples: Iterable[Sample]) -> None:
+        grouped = _group(samples)
+        with self._lock:
+            self._sections[(endpoint, section)] = grouped
+            self._rendered = None
+
+    def update_identity(self, endpoint: str, version: str, bms_sn: str, pack_sn: str) -> None:
+        labels = {"endpoint": endpoint, "version": version, "bms_sn": bms_sn, "pack_sn": pack_sn}
+        self._store(endpoint, "identity", [("bms_info", labels, 1)])
+
+    def update_analog(self, endpoint: str, packs: Iterable[PackAnalogData]) -> None:
+        samples = list(analog_samples(endpoint, packs))
+        samples.append(("bms_last_poll_timestamp_seconds", {"endpoint": endpoint}, self._clock()))
+        self._store(endpoint, "analog", samples)
+
+    def update_capacity(self, endpoint: str, cap: PackCapacity) -> None:
+        self._store(endpoint, "capacity", capacity_samples(endpoint, cap))
+
+    def update_warn(self, endpoint: str, warns: Iterable[PackWarnInfo]) -> None:
+        self._store(endpoint, "warn", warn_samples(endpoint, warns))
+
+    def add_collector(self, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Register a callback yielding samples that are read at scrape time."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> bytes:
+        """The full exposition document."""
+        with self._lock:
+            if self._rendered is None:
+                merged: dict[str, list[str]] = {}
+                for grouped in self._sections.values():
+                    for family, lines in grouped.items():
+                        merged.setdefault(family, []).extend(lines)
+                self._rendered = merged
+            families = {family: list(lines) for family, lines in self._rendered.items()}
+            collectors = list(self._collectors)
+        for collect in collectors:
+            try:
+                for family, lines in _group(collect()).items():
+                    families.setdefault(family, []).extend(lines)
+            except Exception:
+                logger.exception("Metrics collector failed")
+        out: list[str] = []
+        for family, (kind, help_text) in FAMILIES.items():
+            if kind == "histogram":
+                lines = [line for suffix in _HISTOGRAM_SERIES
+                         for line in families.get(family + suffix, ())]
+            else:
+                lines = families.get(family)
+            if lines:
+                out.append(f"# HELP {family} {help_text}")
+                out.append(f"# TYPE {family} {kind}")
+                out.extend(lines)
+        return ("\n".join(out) + "\n").encode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+
+class _Handler(BaseHTTPRequestHandler):
+    store: MetricsStore
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.store.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("metrics: " + format, *args)
+
+
+class MetricsServer:
+    """Serves a ``MetricsStore`` on ``http://host:port/metrics``."""
+
+    def __init__(self, store: MetricsStore, host: str = "0.0.0.0", port: int = 9464) -> None:
+        handler = type("MetricsHandler", (_Handler,), {"store": store})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._httpd.server_address[:2]
+
+    def start(self) -> MetricsServer:
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="metrics-http", daemon=True
+        )
+        self._thread.start()
+        logger.info("Serving metrics on http://%s:%d/metrics", *self.address)
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._httpd.server_close()
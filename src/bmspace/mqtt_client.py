@@ -2,69 +2,375 @@
 MQTT publishing and Home Assistant auto-discovery.
 
 Uses the paho-mqtt 2.x callback API (CallbackAPIVersion.VERSION2).
+
+One MQTT connection can serve several BMS endpoints: ``for_base_topic``
+returns a publisher bound to another base topic that shares the client.
+
+With ``publish_on_change`` enabled, state topics go through a
+``PublishCache`` and unchanged values (within their deadband) are skipped.
+
+With ``publish_mode: json`` each pack's analog and warning fields are
+merged into one JSON document on ``pack_N/state`` and discovery points
+every pack sensor at it through a ``value_template``.
+
+Topic strings are built once per pack layout (pack number, cell and
+temperature counts) and discovery payloads once per BMS layout, then
+reused until the layout changes.
+
+Discovery is diffed against what was last published: only new or changed
+entity configs are sent, entities that disappeared are deleted with an
+empty retained payload, and the full set is re-sent when Home Assistant
+announces itself on ``<discovery prefix>/status``.
+
+With ``outbox_dir`` set, sample data produced while the broker is
+unreachable goes to a disk-backed ``Outbox`` instead of being lost.  After
+reconnecting it is replayed in the background, at most ``outbox_replay_rate``
+messages per second, as ``{"ts": <production time>, "value": "<payload>"}`` on the
+same topic below ``<base topic>/replay/`` so that live state topics are
+never overwritten with old values.  Availability is not buffered, and
+retained messages (discovery configs and deletions) wait in the client's
+QoS 1 queue for the reconnect instead.
+
+With ``publish_queue_size`` set, publishing is decoupled from polling: all
+non-retained messages go through a bounded ``PublishQueue`` drained by one
+worker thread (see ``publish_queue`` for the full-queue policies).  Retained
+discovery configs and deletions bypass the queue so they are never dropped.
+
+``publish_diagnostics`` sends hot-path timing summaries to
+``<base topic>/diagnostics/<stage>``; with ``timings`` set, the time to
+hand each message to the queue or client is recorded.
+
+With ``mqtt_enabled`` off (e.g. when only the Prometheus endpoint is
+scraped) a ``NullPublisher`` takes the place of ``MqttPublisher``.
 """
 from __future__ import annotations
 
+import copy
 import json
 import logging
+import threading
+import time
 
 import paho.mqtt.client as mqtt
 
 from .bms import PackAnalogData, PackCapacity, PackWarnInfo
 from .config import Config
+from .outbox import Outbox, OutboxEntry
+from .publish_cache import PublishCache, metric_name
+from .publish_queue import PublishQueue, QueuedMessage
+from .timing import StageTimings
 
 logger = logging.getLogger(__name__)
 
+# (topic leaf / JSON key, dataclass attribute) for the scalar pack fields
+_ANALOG_FIELDS: tuple[tuple[str, str], ...] = (
+    ("i_pack",              "i_pack"),
+    ("v_pack",              "v_pack"),
+    ("i_remain_cap",        "i_remain_cap"),
+    ("i_full_cap",          "i_full_cap"),
+    ("i_design_cap",        "i_design_cap"),
+    ("soc",                 "soc"),
+    ("soh",                 "soh"),
+    ("cycles",              "cycles"),
+    ("cells_max_diff_calc", "cells_max_diff"),
+)
+
+_WARN_FIELDS: tuple[str, ...] = (
+    "warnings",
+    "balancing1",
+    "balancing2",
+    "prot_short_circuit",
+    "prot_discharge_current",
+    "prot_charge_current",
+    "fully",
+    "current_limit",
+    "charge_fet",
+    "discharge_fet",
+    "pack_indicate",
+    "reverse",
+    "ac_in",
+    "heart",
+)
+
+_STACK_FIELDS: tuple[str, ...] = (
+    "availability",
+    "bms_version",
+    "bms_sn",
+    "pack_sn",
+    "pack_remain_cap",
+    "pack_full_cap",
+    "pack_design_cap",
+    "pack_soc",
+    "pack_soh",
+)
+
+
+class _PackTopics:
+    """Precomputed state topics for one pack layout."""
+
+    __slots__ = ("cells", "temps", "fields", "state")
+
+    def __init__(self, base_topic: str, pack_number: int, cells: int, temps: int) -> None:
+        prefix = f"{base_topic}/pack_{pack_number}"
+        self.cells = [f"{prefix}/v_cells/cell_{i}" for i in range(1, cells + 1)]
+        self.temps = [f"{prefix}/temps/temp_{i}" for i in range(1, temps + 1)]
+        self.fields = {
+            leaf: f"{prefix}/{leaf}"
+            for leaf in (*(f for f, _ in _ANALOG_FIELDS), *_WARN_FIELDS)
+        }
+        self.state = f"{prefix}/state"
+
 
 class MqttPublisher:
     """Wraps a paho MQTT client with topic-specific publish helpers."""
 
     def __init__(self, config: Config) -> None:
         self._config = config
-        self._connected = False
+        self._base_topic = config.mqtt_base_topic
+        self._connected: bool | None = None   # None until the first connect
+        self._root = self
+        self._reconnect_lock = threading.Lock()
+        self._cache: PublishCache | None = None
+        if config.publish_on_change:
+            self._cache = PublishCache(config.deadbands, config.publish_max_age)
+        self._json_mode = config.publish_mode == "json"
+        self._reset_tables()
+        self._views: list[MqttPublisher] = [self]
+        self._ha_status_topic = f"{config.mqtt_ha_discovery_topic}/status"
+        if not config.mqtt_ha_discovery:
+            logger.info("HA discovery disabled")
+        self._outbox: Outbox | None = None
+        if config.outbox_dir:
+            self._outbox = Outbox(
+                config.outbox_dir, config.outbox_segment_size, config.outbox_max_segments
+            )
+        self._replay_thread: threading.Thread | None = None
+        self._queue: PublishQueue | None = None
+        self._worker: threading.Thread | None = None
+        if config.publish_queue_size > 0:
+            self._queue = PublishQueue(config.publish_queue_size, config.publish_queue_policy)
+        self.timings: StageTimings | None = None
 
         self._client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self._client.on_connect    = self._on_connect
         self._client.on_disconnect = self._on_disconnect
+        self._client.on_message    = self._on_message
         self._client.username_pw_set(config.mqtt_user, config.mqtt_password)
 
+    def for_base_topic(self, base_topic: str) -> MqttPublisher:
+        """Return a publisher for *base_topic* sharing this MQTT connection."""
+        if base_topic == self._base_topic:
+            return self
+        view = copy.copy(self)
+        view._base_topic = base_topic
+        view.timings = None
+        view._reset_tables()
+        self._root._views.append(view)
+        return view
+
+    def _reset_tables(self) -> None:
+        """(Re)initialise the per-base-topic state and topic tables."""
+        self._pack_state: dict[int, dict] = {}
+        self._pack_topics: dict[int, _PackTopics] = {}
+        self._topics = {name: f"{self._base_topic}/{name}" for name in _STACK_FIELDS}
+        self._discovery_key: tuple | None = None
+        self._published_discovery: dict[str, str] = {}
+
     # ------------------------------------------------------------------
     # Connection management
     # ------------------------------------------------------------------
 
     def _on_connect(self, client, userdata, connect_flags, reason_code, properties):
         logger.info("MQTT connected (rc=%s)", reason_code)
-        self._connected = True
+        reconnected = self._root._connected is not None
+        self._root._connected = True
+        if self._cache is not None:
+            # The broker may have lost state; send everything once more
+            self._cache.clear()
+        if self._config.mqtt_ha_discovery:
+            self._client.subscribe(self._ha_status_topic)
+            if reconnected:
+                self._republish_discovery()
+        self._start_replay()
+
+    def _on_message(self, client, userdata, message):
+        if message.topic == self._ha_status_topic and message.payload == b"online":
+            logger.info("Home Assistant came online – re-sending discovery")
+            self._republish_discovery()
 
     def _on_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
         logger.info("MQTT disconnected (rc=%s)", reason_code)
-        self._connected = False
+        self._root._connected = False
 
     def connect(self) -> None:
         self._client.connect(self._config.mqtt_host, self._config.mqtt_port, 60)
         self._client.loop_start()
+        if self._queue is not None and self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run_worker, name="mqtt-publish", daemon=True
+            )
+            self._worker.start()
 
     def disconnect(self) -> None:
         self.publish_availability(online=False)
+        if self._queue is not None:
+            # Let the worker deliver what is queued, including "offline"
+            self._queue.close()
+            if self._worker is not None:
+                self._worker.join(timeout=5)
         self._client.loop_stop()
         self._client.disconnect()
+        if self._outbox is not None:
+            self._outbox.close()
 
     def reconnect(self) -> None:
-        self._client.loop_stop()
-        self._client.connect(self._config.mqtt_host, self._config.mqtt_port, 60)
-        self._client.loop_start()
+        # Several pollers may share the connection; only the first one
+        # to notice the outage reconnects.
+        with self._reconnect_lock:
+            if self.is_connected:
+                return
+            self._client.loop_stop()
+            self._client.connect(self._config.mqtt_host, self._config.mqtt_port, 60)
+            self._client.loop_start()
 
     @property
     def is_connected(self) -> bool:
-        return self._connected
+        return bool(self._root._connected)
+
+    @property
+    def buffers_offline(self) -> bool:
+        """``True`` if messages are kept in an outbox while the broker is down."""
+        return self._outbox is not None
+
+    @property
+    def publish_queue(self) -> PublishQueue | None:
+        """The queue feeding the publish worker, for depth / drop metrics."""
+        return self._queue
+
+    @property
+    def outbox(self) -> Outbox | None:
+        return self._outbox
 
     # ------------------------------------------------------------------
-    # Generic publish helper
+    # Store and forward
     # ------------------------------------------------------------------
 
+    def _start_replay(self) -> None:
+        root = self._root
+        if not root._outbox or (root._replay_thread and root._replay_thread.is_alive()):
+            return
+        root._replay_thread = threading.Thread(
+            target=root._replay_outbox, name="outbox-replay", daemon=True
+        )
+        root._replay_thread.start()
+
+    def _replay_topic(self, topic: str) -> str:
+        base = self._config.mqtt_base_topic
+        if topic.startswith(base + "/"):
+            return f"{base}/replay/{topic[len(base) + 1:]}"
+        return f"{base}/replay/{topic}"
+
+    @staticmethod
+    def _replay_payload(entry: OutboxEntry) -> str:
+        # The value stays the exact string the live topic would have carried
+        return json.dumps({"ts": entry.timestamp, "value": entry.payload}, separators=(",", ":"))
+
+    def _replay_outbox(self) -> None:
+        """Drain the outbox at ``outbox_replay_rate`` messages per second."""
+        outbox = self._outbox
+        rate = self._config.outbox_replay_rate
+        logger.info("Replaying %d buffered message(s)", len(outbox))
+        while self.is_connected:
+            started = time.monotonic()
+            batch = outbox.peek(max(int(rate), 1))   # about one second's worth
+            if not batch:
+                break
+            for entry in batch:
+                self._client.publish(
+                    self._replay_topic(entry.topic), self._replay_payload(entry), qos=1
+                )
+            outbox.ack(batch[-1])
+            time.sleep(max(len(batch) / rate - (time.monotonic() - started), 0.0))
+        if outbox.dropped:
+            logger.warning("Outbox overflowed while offline: %d message(s) lost", outbox.dropped)
+
+    # ------------------------------------------------------------------
+    # Generic publish helpers
+    # ------------------------------------------------------------------
+
+    def _send(
+        self, topic: str, value: str | int | float, metric: str, retain: bool = False
+    ) -> None:
+        if self._cache is not None and not self._cache.should_publish(topic, value, metric):
+            return
+        self._publish(topic, str(value), retain)
+
+    def _publish(self, topic: str, payload: str, retain: bool = False) -> None:
+        """
+        Queue *payload* for the worker, or deliver it directly without a queue.
+
+        Retained messages (discovery configs and deletions) are always
+        delivered directly: the queue may drop them, and discovery is
+        recorded as published as soon as it has been handed over.
+        """
+        start = time.perf_counter()
+        if self._queue is not None and not retain and not self._queue.closed:
+            self._queue.put(QueuedMessage(topic, payload, retain=retain))
+        else:
+            self._deliver(topic, payload, retain)
+        timings = self.timings
+        if timings is not None:
+            timings.publish.observe(time.perf_counter() - start)
+
+    def _deliver(self, topic: str, payload: str, retain: bool) -> None:
+        if self._outbox is not None and not self.is_connected:
+            if retain:
+                # paho keeps QoS 1 messages queued until the connection is back
+                self._client.publish(topic, payload, qos=1, retain=True)
+            elif self._is_sample_topic(topic):
+                self._outbox.append(time.time(), topic, payload)
+            return
+        self._client.publish(topic, payload, qos=0, retain=retain)
+
+    def _is_sample_topic(self, topic: str) -> bool:
+        """Sample data below one of the connection's base topics (not availability)."""
+        if topic.endswith("/availability"):
+            return False
+        return any(topic.startswith(view._base_topic + "/") for view in self._root._views)
+
+    def _run_worker(self) -> None:
+        queue = self._queue
+        while True:
+            message = queue.get()
+            if message is None:
+                return
+            try:
+                self._deliver(message.topic, message.payload, message.retain)
+            except Exception:
+                logger.exception("Publishing to %s failed", message.topic)
+
     def _pub(self, subtopic: str, value: str | int | float, retain: bool = False) -> None:
-        topic = f"{self._config.mqtt_base_topic}/{subtopic}"
-        self._client.publish(topic, str(value), qos=0, retain=retain)
+        topic = self._topics.get(subtopic) or f"{self._base_topic}/{subtopic}"
+        self._send(topic, value, metric_name(subtopic), retain)
+
+    def _topics_for(
+        self, pack_number: int, cells: int | None = None, temps: int | None = None
+    ) -> _PackTopics:
+        """Return the topic table for a pack, rebuilding it if its layout changed."""
+        topics = self._pack_topics.get(pack_number)
+        if topics is None or (
+            cells is not None
+            and (len(topics.cells) != cells or len(topics.temps) != temps)
+        ):
+            topics = _PackTopics(self._base_topic, pack_number, cells or 0, temps or 0)
+            self._pack_topics[pack_number] = topics
+        return topics
+
+    def _pub_pack_state(self, topics: _PackTopics, pack_number: int, fields: dict) -> None:
+        """Merge *fields* into the pack's JSON document and publish it."""
+        state = self._pack_state.setdefault(pack_number, {})
+        state.update(fields)
+        self._send(topics.state, json.dumps(state, separators=(",", ":")), "state")
 
     # ------------------------------------------------------------------
     # Domain-specific publishers
@@ -80,19 +386,20 @@ class MqttPublisher:
 
     def publish_analog_data(self, pack: PackAnalogData) -> None:
         p = pack.pack_number
-        for i, mv in enumerate(pack.cells, 1):
-            self._pub(f"pack_{p}/v_cells/cell_{i}", mv)
-        for i, temp in enumerate(pack.temps, 1):
-            self._pub(f"pack_{p}/temps/temp_{i}", temp)
-        self._pub(f"pack_{p}/i_pack",             pack.i_pack)
-        self._pub(f"pack_{p}/v_pack",             pack.v_pack)
-        self._pub(f"pack_{p}/i_remain_cap",       pack.i_remain_cap)
-        self._pub(f"pack_{p}/i_full_cap",         pack.i_full_cap)
-        self._pub(f"pack_{p}/i_design_cap",       pack.i_design_cap)
-        self._pub(f"pack_{p}/soc",                pack.soc)
-        self._pub(f"pack_{p}/soh",                pack.soh)
-        self._pub(f"pack_{p}/cycles",             pack.cycles)
-        self._pub(f"pack_{p}/cells_max_diff_calc", pack.cells_max_diff)
+        topics = self._topics_for(p, len(pack.cells), len(pack.temps))
+        if self._json_mode:
+            fields = {leaf: getattr(pack, attr) for leaf, attr in _ANALOG_FIELDS}
+            fields["cells"] = pack.cells
+            fields["temps"] = pack.temps
+            self._pub_pack_state(topics, p, fields)
+            return
+        send = self._send
+        for topic, mv in zip(topics.cells, pack.cells):
+            send(topic, mv, "cell")
+        for topic, temp in zip(topics.temps, pack.temps):
+            send(topic, temp, "temp")
+        for leaf, attr in _ANALOG_FIELDS:
+            send(topics.fields[leaf], getattr(pack, attr), leaf)
 
     def publish_pack_capacity(self, cap: PackCapacity) -> None:
         self._pub("pack_remain_cap",  cap.remain_cap)
@@ -103,20 +410,23 @@ class MqttPublisher:
 
     def publish_warn_info(self, warn: PackWarnInfo) -> None:
         p = warn.pack_number
-        self._pub(f"pack_{p}/warnings",               warn.warnings)
-        self._pub(f"pack_{p}/balancing1",             warn.balancing1)
-        self._pub(f"pack_{p}/balancing2",             warn.balancing2)
-        self._pub(f"pack_{p}/prot_short_circuit",     warn.prot_short_circuit)
-        self._pub(f"pack_{p}/prot_discharge_current", warn.prot_discharge_current)
-        self._pub(f"pack_{p}/prot_charge_current",    warn.prot_charge_current)
-        self._pub(f"pack_{p}/fully",                  warn.fully)
-        self._pub(f"pack_{p}/current_limit",          warn.current_limit)
-        self._pub(f"pack_{p}/charge_fet",             warn.charge_fet)
-        self._pub(f"pack_{p}/discharge_fet",          warn.discharge_fet)
-        self._pub(f"pack_{p}/pack_indicate",          warn.pack_indicate)
-        self._pub(f"pack_{p}/reverse",                warn.reverse)
-        self._pub(f"pack_{p}/ac_in",                  warn.ac_in)
-        self._pub(f"pack_{p}/heart",                  warn.heart)
+        topics = self._topics_for(p)
+        if self._json_mode:
+            self._pub_pack_state(
+                topics, p, {leaf: getattr(warn, leaf) for leaf in _WARN_FIELDS}
+            )
+            return
+        send = self._send
+        for leaf in _WARN_FIELDS:
+            send(topics.fields[leaf], getattr(warn, leaf), leaf)
+
+    def publish_diagnostics(self, summaries: dict[str, dict[str, float]]) -> None:
+        """One JSON summary per stage on ``<base>/diagnostics/<stage>``."""
+        for stage, summary in summaries.items():
+            self._publish(
+                f"{self._base_topic}/diagnostics/{stage}",
+                json.dumps(summary, separators=(",", ":")),
+            )
 
     # ------------------------------------------------------------------
     # Home Assistant MQTT auto-discovery
@@ -131,12 +441,43 @@ class MqttPublisher:
         temps: int,
     ) -> None:
         if not self._config.mqtt_ha_discovery:
-            logger.info("HA discovery disabled")
             return
 
-        logger.info("Publishing HA discovery payloads …")
+        key = (bms_sn, bms_version, packs, cells, temps)
+        if key == self._discovery_key:
+            return
+        self._discovery_key = key
+
+        entries = dict(self._build_discovery(*key))
+        previous = self._published_discovery
+        changed = [(t, p) for t, p in entries.items() if previous.get(t) != p]
+        removed = previous.keys() - entries.keys()
+
+        logger.info("HA discovery: %d new/changed, %d removed", len(changed), len(removed))
+        for topic, payload in changed:
+            self._publish(topic, payload, retain=True)
+        for topic in removed:
+            self._publish(topic, "", retain=True)
+        self._published_discovery = entries
+
+    def _republish_discovery(self) -> None:
+        """Re-send every current discovery config of every view sharing the connection."""
+        for view in list(self._root._views):
+            for topic, payload in list(view._published_discovery.items()):
+                self._client.publish(topic, payload, qos=0, retain=True)
+
+    def _build_discovery(
+        self,
+        bms_sn: str,
+        bms_version: str,
+        packs: int,
+        cells: int,
+        temps: int,
+    ) -> list[tuple[str, str]]:
+        """Return ``(config_topic, serialized_payload)`` for every HA entity."""
+        entries: list[tuple[str, str]] = []
 
-        base_topic  = self._config.mqtt_base_topic
+        base_topic  = self._base_topic
         disc_prefix = self._config.mqtt_ha_discovery_topic
 
         device = {
@@ -147,14 +488,20 @@ class MqttPublisher:
             "sw_version": bms_version,
         }
 
-        def _pub_entity(
+        def _add_entity(
             component: str,
             name: str,
             unique_suffix: str,
             state_subtopic: str,
             unit: str | None = None,
             extra: dict | None = None,
+            json_field: str | None = None,
         ) -> None:
+            if json_field is not None and self._json_mode:
+                # Per-pack values live in the pack's JSON document
+                pack_prefix = state_subtopic.split("/", 1)[0]
+                state_subtopic = f"{pack_prefix}/state"
+                extra = dict(extra or {}, value_template=f"{{{{ value_json.{json_field} }}}}")
             payload: dict = {
                 "availability_topic": f"{base_topic}/availability",
                 "device": device,
@@ -167,48 +514,60 @@ class MqttPublisher:
             if extra:
                 payload.update(extra)
             slug = name.replace(" ", "_")
-            self._client.publish(
+            entries.append((
                 f"{disc_prefix}/{component}/BMS-{bms_sn}/{slug}/config",
                 json.dumps(payload),
-                qos=0,
-                retain=True,
-            )
+            ))
 
         binary_extra = {"payload_on": "1", "payload_off": "0"}
 
         for p in range(1, packs + 1):
             for i in range(1, cells + 1):
-                _pub_entity("sensor", f"Pack {p} Cell {i} Voltage",
-                            f"pack_{p}_v_cell_{i}", f"pack_{p}/v_cells/cell_{i}", "mV")
+                _add_entity("sensor", f"Pack {p} Cell {i} Voltage",
+                            f"pack_{p}_v_cell_{i}", f"pack_{p}/v_cells/cell_{i}", "mV",
+                            json_field=f"cells[{i - 1}]")
             for i in range(1, temps + 1):
-                _pub_entity("sensor", f"Pack {p} Temperature {i}",
-                            f"pack_{p}_temp_{i}", f"pack_{p}/temps/temp_{i}", "°C")
-
-            _pub_entity("sensor", f"Pack {p} Current",
-                        f"pack_{p}_i_pack",        f"pack_{p}/i_pack",        "A")
-            _pub_entity("sensor", f"Pack {p} Voltage",
-                        f"pack_{p}_v_pack",        f"pack_{p}/v_pack",        "V")
-            _pub_entity("sensor", f"Pack {p} Remaining Capacity",
-                        f"pack_{p}_i_remain_cap",  f"pack_{p}/i_remain_cap",  "mAh")
-            _pub_entity("sensor", f"Pack {p} State of Charge",
-                        f"pack_{p}_soc",            f"pack_{p}/soc",           "%")
-            _pub_entity("sensor", f"Pack {p} State of Health",
-                        f"pack_{p}_soh",            f"pack_{p}/soh",           "%")
-            _pub_entity("sensor", f"Pack {p} Cycles",
-                        f"pack_{p}_cycles",         f"pack_{p}/cycles",        "")
-            _pub_entity("sensor", f"Pack {p} Full Capacity",
-                        f"pack_{p}_i_full_cap",     f"pack_{p}/i_full_cap",    "mAh")
-            _pub_entity("sensor", f"Pack {p} Design Capacity",
-                        f"pack_{p}_i_design_cap",   f"pack_{p}/i_design_cap",  "mAh")
-            _pub_entity("sensor", f"Pack {p} Cell Max Volt Diff",
+                _add_entity("sensor", f"Pack {p} Temperature {i}",
+                            f"pack_{p}_temp_{i}", f"pack_{p}/temps/temp_{i}", "°C",
+                            json_field=f"temps[{i - 1}]")
+
+            _add_entity("sensor", f"Pack {p} Current",
+                        f"pack_{p}_i_pack",        f"pack_{p}/i_pack",        "A",
+                        json_field="i_pack")
+            _add_entity("sensor", f"Pack {p} Voltage",
+                        f"pack_{p}_v_pack",        f"pack_{p}/v_pack",        "V",
+                        json_field="v_pack")
+            _add_entity("sensor", f"Pack {p} Remaining Capacity",
+                        f"pack_{p}_i_remain_cap",  f"pack_{p}/i_remain_cap",  "mAh",
+                        json_field="i_remain_cap")
+            _add_entity("sensor", f"Pack {p} State of Charge",
+                        f"pack_{p}_soc",            f"pack_{p}/soc",           "%",
+                        json_field="soc")
+            _add_entity("sensor", f"Pack {p} State of Health",
+                        f"pack_{p}_soh",            f"pack_{p}/soh",           "%",
+                        json_field="soh")
+            _add_entity("sensor", f"Pack {p} Cycles",
+                        f"pack_{p}_cycles",         f"pack_{p}/cycles",        "",
+                        json_field="cycles")
+            _add_entity("sensor", f"Pack {p} Full Capacity",
+                        f"pack_{p}_i_full_cap",     f"pack_{p}/i_full_cap",    "mAh",
+                        json_field="i_full_cap")
+            _add_entity("sensor", f"Pack {p} Design Capacity",
+                        f"pack_{p}_i_design_cap",   f"pack_{p}/i_design_cap",  "mAh",
+                        json_field="i_design_cap")
+            _add_entity("sensor", f"Pack {p} Cell Max Volt Diff",
                         f"pack_{p}_cells_max_diff_calc",
-                        f"pack_{p}/cells_max_diff_calc", "mV")
-            _pub_entity("sensor", f"Pack {p} Warnings",
-                        f"pack_{p}_warnings",       f"pack_{p}/warnings")
-            _pub_entity("sensor", f"Pack {p} Balancing1",
-                        f"pack_{p}_balancing1",     f"pack_{p}/balancing1")
-            _pub_entity("sensor", f"Pack {p} Balancing2",
-                        f"pack_{p}_balancing2",     f"pack_{p}/balancing2")
+                        f"pack_{p}/cells_max_diff_calc", "mV",
+                        json_field="cells_max_diff_calc")
+            _add_entity("sensor", f"Pack {p} Warnings",
+                        f"pack_{p}_warnings",       f"pack_{p}/warnings",
+                        json_field="warnings")
+            _add_entity("sensor", f"Pack {p} Balancing1",
+                        f"pack_{p}_balancing1",     f"pack_{p}/balancing1",
+                        json_field="balancing1")
+            _add_entity("sensor", f"Pack {p} Balancing2",
+                        f"pack_{p}_balancing2",     f"pack_{p}/balancing2",
+                        json_field="balancing2")
 
             for name, suffix, subtopic in [
                 ("Protection Short Circuit",     "prot_short_circuit",     "prot_short_circuit"),
@@ -222,18 +581,65 @@ class MqttPublisher:
                 ("AC In",                        "ac_in",                  "ac_in"),
                 ("Heart",                        "heart",                  "heart"),
             ]:
-                _pub_entity("binary_sensor", f"Pack {p} {name}",
+                _add_entity("binary_sensor", f"Pack {p} {name}",
                             f"pack_{p}_{suffix}", f"pack_{p}/{subtopic}",
-                            extra=binary_extra)
+                            extra=binary_extra, json_field=subtopic)
 
         # Aggregate pack-level sensors
-        _pub_entity("sensor", "Pack Remaining Capacity",
+        _add_entity("sensor", "Pack Remaining Capacity",
                     "pack_i_remain_cap", "pack_remain_cap", "mAh")
-        _pub_entity("sensor", "Pack Full Capacity",
+        _add_entity("sensor", "Pack Full Capacity",
                     "pack_i_full_cap",   "pack_full_cap",   "mAh")
-        _pub_entity("sensor", "Pack Design Capacity",
+        _add_entity("sensor", "Pack Design Capacity",
                     "pack_i_design_cap", "pack_design_cap", "mAh")
-        _pub_entity("sensor", "Pack State of Charge",
+        _add_entity("sensor", "Pack State of Charge",
                     "pack_soc",          "pack_soc",         "%")
-        _pub_entity("sensor", "Pack State of Health",
+        _add_entity("sensor", "Pack State of Health",
                     "pack_soh",          "pack_soh",         "%")
+
+        return entries
+
+
+class NullPublisher:
+    """Stand-in for ``MqttPublisher`` that publishes nothing."""
+
+    is_connected = True
+    buffers_offline = False
+    publish_queue = None
+    outbox = None
+    timings = None
+
+    def for_base_topic(self, base_topic: str) -> NullPublisher:
+        return self
+
+    def connect(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+    def reconnect(self) -> None:
+        pass
+
+    def publish_availability(self, online: bool) -> None:
+        pass
+
+    def publish_bms_info(self, version: str, bms_sn: str, pack_sn: str) -> None:
+        pass
+
+    def publish_analog_data(self, pack: PackAnalogData) -> None:
+        pass
+
+    def publish_pack_capacity(self, cap: PackCapacity) -> None:
+        pass
+
+    def publish_warn_info(self, warn: PackWarnInfo) -> None:
+        pass
+
+    def publish_diagnostics(self, summaries: dict[str, dict[str, float]]) -> None:
+        pass
+
+    def publish_ha_discovery(
+        self, bms_sn: str, bms_version: str, packs: int, cells: int, temps: int
+    ) -> None:
+        pass
@@ -0,0 +1,232 @@
+"""
+Disk-backed store-and-forward outbox.
+
+While the MQTT broker is unreachable the publisher appends every message,
+stamped with the time it was produced, to an ``Outbox``.  Messages live in
+fixed-size, memory-mapped segment files so that appends are plain memory
+copies and survive a restart of the add-on.  Once the broker is back the
+publisher drains the outbox at a controlled rate.
+
+The outbox is bounded: when all ``max_segments`` segments are full the
+oldest segment is discarded (and counted in ``dropped``) to make room.
+Each entry returned by ``peek`` carries its position in the outbox, and
+``ack`` removes entries up to a given one, so a segment discarded between
+the two never makes ``ack`` remove entries that were not replayed.
+
+Segment layout::
+
+    header   magic "BMSO" | write end (u32) | read position (u32) | entries (u32)
+    records  timestamp (f64) | topic length (u16) | payload length (u32) | topic | payload
+"""
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+import threading
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"BMSO"
+_HEADER = struct.Struct(">4sIII")
+_RECORD = struct.Struct(">dHI")
+
+
+@dataclass(frozen=True)
+class OutboxEntry:
+    """One buffered message."""
+
+    timestamp: float   # Unix time the message was produced
+    topic: str
+    payload: str
+    # (segment id, offset after the record); what ``Outbox.ack`` goes by
+    position: tuple[int, int] = field(default=(-1, 0), compare=False, repr=False)
+
+
+class _Segment:
+    """One memory-mapped segment file."""
+
+    def __init__(self, path: str, size: int, segment_id: int) -> None:
+        self.path = path
+        self.id = segment_id
+        exists = os.path.exists(path)
+        self._fh = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self._fh.truncate(size)
+        self._mm = mmap.mmap(self._fh.fileno(), 0)
+        self.size = len(self._mm)
+        magic, self.write_end, self.read_pos, self.entries = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC:
+            self.reset()
+
+    def _store_header(self) -> None:
+        _HEADER.pack_into(self._mm, 0, _MAGIC, self.write_end, self.read_pos, self.entries)
+
+    @property
+    def pending(self) -> int:
+        """Number of records not yet acknowledged."""
+        return self.entries
+
+    def append(self, record: bytes) -> bool:
+        """Copy *record* into the segment; ``False`` if it does not fit."""
+        end = self.write_end + len(record)
+        if end > self.size:
+            return False
+        self._mm[self.write_end:end] = record
+        self.write_end = end
+        self.entries += 1
+        self._store_header()
+        return True
+
+    def read(self, limit: int) -> list[OutboxEntry]:
+        """Up to *limit* unread entries."""
+        result: list[OutboxEntry] = []
+        pos = self.read_pos
+        while pos < self.write_end and len(result) < limit:
+            timestamp, topic_len, payload_len = _RECORD.unpack_from(self._mm, pos)
+            pos += _RECORD.size
+            topic = self._mm[pos:pos + topic_len].decode("utf-8")
+            pos += topic_len
+            payload = self._mm[pos:pos + payload_len].decode("utf-8")
+            pos += payload_len
+            result.append(OutboxEntry(timestamp, topic, payload, (self.id, pos)))
+        return result
+
+    def advance(self, end: int) -> int:
+        """Mark the records before offset *end* as read; return how many were."""
+        end = min(end, self.write_end)
+        pos = self.read_pos
+        count = 0
+        while pos < end:
+            _, topic_len, payload_len = _RECORD.unpack_from(self._mm, pos)
+            pos += _RECORD.size + topic_len + payload_len
+            count += 1
+        if count:
+            self.read_pos = pos
+            self.entries -= count
+            self._store_header()
+        return count
+
+    def reset(self) -> None:
+        self.write_end = self.read_pos = _HEADER.size
+        self.entries = 0
+        self._store_header()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.read_pos >= self.write_end
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        self._mm.flush()
+        self._mm.close()
+        self._fh.close()
+
+    def delete(self) -> None:
+        self._mm.close()
+        self._fh.close()
+        os.remove(self.path)
+
+
+class Outbox:
+    """Bounded FIFO of ``OutboxEntry`` spread over memory-mapped segment files."""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 1 << 20,
+        max_segments: int = 16,
+    ) -> None:
+        if segment_size <= _HEADER.size + _RECORD.size:
+            raise ValueError(f"Outbox segment size {segment_size} is too small")
+        if max_segments < 1:
+            raise ValueError("Outbox needs at least one segment")
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._segment_size = segment_size
+        self._max_segments = max_segments
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+        names = sorted(n for n in os.listdir(directory) if n.startswith("seg-") and n.endswith(".bin"))
+        self._segments = [
+            _Segment(os.path.join(directory, n), segment_size, int(n[4:-4])) for n in names
+        ]
+        self._next_id = int(names[-1][4:-4]) + 1 if names else 0
+        self._pending = sum(s.pending for s in self._segments)
+        if self._pending:
+            logger.info("Outbox: %d buffered message(s) from a previous run", self._pending)
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def _new_segment(self) -> _Segment:
+        if len(self._segments) >= self._max_segments:
+            oldest = self._segments.pop(0)
+            self.dropped += oldest.pending
+            self._pending -= oldest.pending
+            logger.warning("Outbox full: dropped %d oldest message(s)", oldest.pending)
+            oldest.delete()
+        elif self._segments:
+            self._segments[-1].flush()   # sealed; push it to disk once
+        path = os.path.join(self._directory, f"seg-{self._next_id:08d}.bin")
+        segment = _Segment(path, self._segment_size, self._next_id)
+        self._next_id += 1
+        self._segments.append(segment)
+        return segment
+
+    def append(self, timestamp: float, topic: str, payload: str) -> None:
+        topic_bytes = topic.encode("utf-8")
+        payload_bytes = payload.encode("utf-8")
+        record = (
+            _RECORD.pack(timestamp, len(topic_bytes), len(payload_bytes))
+            + topic_bytes
+            + payload_bytes
+        )
+        if len(record) > self._segment_size - _HEADER.size:
+            raise ValueError(f"Message on {topic!r} does not fit in an outbox segment")
+        with self._lock:
+            if not self._segments or not self._segments[-1].append(record):
+                self._new_segment().append(record)
+            self._pending += 1
+
+    def peek(self, limit: int = 100) -> list[OutboxEntry]:
+        """The oldest *limit* entries, without removing them."""
+        with self._lock:
+            result: list[OutboxEntry] = []
+            for segment in self._segments:
+                result.extend(segment.read(limit - len(result)))
+                if len(result) >= limit:
+                    break
+            return result
+
+    def ack(self, through: OutboxEntry) -> None:
+        """
+        Remove the entries up to and including *through*, an entry from ``peek``.
+
+        Entries dropped for space since the ``peek`` are not counted again,
+        and nothing after *through* is removed.
+        """
+        segment_id, end = through.position
+        with self._lock:
+            while self._segments and self._segments[0].id <= segment_id:
+                segment = self._segments[0]
+                last = segment.id == segment_id
+                self._pending -= segment.advance(end if last else segment.size)
+                if not segment.exhausted:
+                    break
+                if len(self._segments) > 1:
+                    self._segments.pop(0).delete()
+                else:
+                    segment.reset()   # fully drained: reuse it from the start
+                    break
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
@@ -0,0 +1,116 @@
+"""
+Adaptive inter-command pacing.
+
+BMS firmware versions tolerate very different request rates.  An
+``AdaptivePacer`` keeps the gap between the end of one command and the
+start of the next on a link, and adapts it AIMD-style from what the device
+actually does:
+
+- every clean response shortens the gap by ``step`` (additive increase of
+  the request rate), down to ``min_gap``;
+- every checksum / RTN error, undecodable response or response timeout
+  multiplies the gap by ``factor`` (multiplicative decrease of the rate),
+  up to ``max_gap``.  The gap after an error is at least ``error_floor``
+  and at least half the device's smoothed response latency, so slow
+  devices get proportionally more recovery time.
+
+``latency`` and ``error_rate`` are exponentially weighted averages kept for
+diagnostics.
+"""
+from __future__ import annotations
+
+import contextlib
+import time
+from typing import Any, Callable, Iterator, Sequence
+
+from .transport import TransportTimeout
+
+# Outcomes that mean "too fast" rather than "link gone"
+_PACING_ERRORS = (RuntimeError, ValueError, TransportTimeout)
+
+
+class AdaptivePacer:
+    """AIMD-controlled gap between consecutive commands on one link."""
+
+    def __init__(
+        self,
+        min_gap: float = 0.0,
+        max_gap: float = 2.0,
+        step: float = 0.01,
+        factor: float = 2.0,
+        error_floor: float = 0.05,
+        alpha: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if not 0 <= min_gap <= max_gap:
+            raise ValueError(f"Invalid gap bounds {min_gap}..{max_gap}")
+        self._min_gap = min_gap
+        self._max_gap = max_gap
+        self._step = step
+        self._factor = factor
+        self._error_floor = error_floor
+        self._alpha = alpha
+        self._clock = clock
+        self._sleep = sleep
+        self._ready_at = 0.0
+        self.gap = min_gap
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.commands = 0
+        self.errors = 0
+
+    def wait(self) -> None:
+        """Sleep until the current gap since the previous command has passed."""
+        delay = self._ready_at - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Feed back one command's response *latency* and outcome."""
+        a = self._alpha
+        self.latency = latency if self.latency is None else (1 - a) * self.latency + a * latency
+        self.error_rate = (1 - a) * self.error_rate + a * (0.0 if ok else 1.0)
+        self.commands += 1
+        if ok:
+            self.gap = max(self._min_gap, self.gap - self._step)
+        else:
+            self.errors += 1
+            self.gap = min(
+                self._max_gap,
+                max(self.gap * self._factor, self._error_floor, self.latency / 2),
+            )
+        self._ready_at = self._clock() + self.gap
+
+    @contextlib.contextmanager
+    def pace(self) -> Iterator[None]:
+        """Wait for the gap, then time the enclosed command and record its outcome."""
+        self.wait()
+        started = self._clock()
+        try:
+            yield
+        except _PACING_ERRORS:
+            self.record(self._clock() - started, ok=False)
+            raise
+        self.record(self._clock() - started, ok=True)
+
+    def pace_batch(
+        self, run: Callable[[], Sequence[tuple[int, Any]]]
+    ) -> Sequence[tuple[int, Any]]:
+        """
+        Wait for the gap, then run a pipelined batch of ``(adr, outcome)``.
+
+        Every outcome is recorded on its own, with the batch's latency
+        spread evenly over its requests.
+        """
+        self.wait()
+        started = self._clock()
+        try:
+            outcomes = run()
+        except _PACING_ERRORS:
+            self.record(self._clock() - started, ok=False)
+            raise
+        latency = (self._clock() - started) / max(len(outcomes), 1)
+        for _, outcome in outcomes:
+            self.record(latency, ok=not isinstance(outcome, _PACING_ERRORS))
+        return outcomes
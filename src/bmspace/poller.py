@@ -0,0 +1,322 @@
+"""
+Polling loop for a single BMS endpoint.
+
+A ``BmsPoller`` owns one transport and publishes through an
+``MqttPublisher`` bound to the endpoint's base topic.  Transport failures
+trigger a reconnect and MQTT outages are waited out.  Several pollers
+may share one publisher connection, each running in its own thread (see
+``main.main``).
+
+With ``capture_path`` set, all BMS traffic is recorded; with
+``replay_path`` a capture is replayed instead of talking to the BMS, and
+the poller's scheduling, retries and pacing run on the replay's
+(possibly accelerated) capture time.  ``run`` returns once the replay has
+ended.
+
+Each command runs at its own rate (``analog_interval``, ``warn_interval``,
+``capacity_interval``).  Commands go through a ``BmsSession``: transient
+failures are retried with backoff before forcing a reconnect, version and
+serial number are read once and reused after reconnects, and with
+``adaptive_pacing`` the gap between commands adapts to the device.
+
+With ``history_size`` set, every analog poll is also recorded in an
+in-memory ``History`` (``BmsPoller.history``); with a ``SqliteRecorder``
+it is also written to the local database, and with a ``MetricsStore``
+the latest results and link counters are exposed to Prometheus.
+
+Hot-path stage timings (link write, first byte, frame, parse, decode,
+publish and sample age) are collected in ``BmsPoller.timings``, exported
+with the metrics and, with ``diagnostics_interval`` set, summarised on
+``<base topic>/diagnostics/<stage>``.
+
+If the publisher has an outbox, polling continues while the broker is
+unreachable and the data is buffered for later replay.
+
+With ``packs_to_read`` set, packs are addressed individually by ADR through
+a ``BusScheduler`` and each pack is published under its address; with
+``pipeline`` on a TCP endpoint all addresses are read in one batch.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Iterator
+
+from .bms import (
+    PackAnalogData,
+    PackWarnInfo,
+    get_analog_data,
+    get_analog_data_batch,
+    get_pack_capacity,
+    get_warn_info,
+    get_warn_info_batch,
+)
+from .bus import BusScheduler
+from .capture import ReplayFinished, RecordingTransport, ReplayTransport, open_transport
+from .config import BmsEndpoint, Config
+from .history import History
+from .metrics import MetricsStore, Sample, timing_samples
+from .mqtt_client import MqttPublisher
+from .pacing import AdaptivePacer
+from .recorder import SqliteRecorder
+from .scheduler import RateScheduler
+from .session import BmsSession
+from .timing import StageTimings
+from .transport import TransportError
+
+logger = logging.getLogger(__name__)
+
+_RETRY_DELAY_SECS = 5
+
+
+class BmsPoller:
+    """Reads one BMS endpoint and publishes its data."""
+
+    def __init__(
+        self,
+        endpoint: BmsEndpoint,
+        config: Config,
+        publisher: MqttPublisher,
+        recorder: SqliteRecorder | None = None,
+        metrics: MetricsStore | None = None,
+    ) -> None:
+        self._endpoint = endpoint
+        self._config = config
+        self._publisher = publisher
+        self._recorder = recorder
+        self._metrics = metrics
+        self._transport = open_transport(endpoint, config.replay_speed)
+        self.timings = StageTimings()
+        self._transport.timings = self.timings
+        publisher.timings = self.timings
+        self._clock = time.monotonic
+        self._sleep = time.sleep
+        if isinstance(self._transport, ReplayTransport):
+            self._clock = self._transport.clock
+            self._sleep = self._transport.sleep
+        self._session = BmsSession(
+            self._transport,
+            retries=config.command_retries,
+            backoff=config.retry_backoff,
+            sleep=self._sleep,
+            pacer=AdaptivePacer(max_gap=config.command_gap_max,
+                                clock=self._clock, sleep=self._sleep)
+            if config.adaptive_pacing else None,
+        )
+        self._bms_version = ""
+        self._bms_sn = ""
+        self._packs = 0
+        self._cells = 13
+        self._temps = 6
+        self._bus: BusScheduler | None = None
+        self.history: History | None = None
+        if config.history_size > 0:
+            self.history = History(config.history_size)
+        if endpoint.packs_to_read > 0:
+            self._bus = BusScheduler(
+                self._transport, range(1, endpoint.packs_to_read + 1)
+            )
+        if metrics is not None:
+            metrics.add_collector(self.collect_metrics)
+
+    @property
+    def name(self) -> str:
+        return self._endpoint.name
+
+    def collect_metrics(self) -> Iterator[Sample]:
+        """Link counters of this endpoint for the metrics endpoint."""
+        labels = {"endpoint": self.name}
+        stale = getattr(self._transport, "stale_frames", None)
+        if isinstance(stale, int):
+            yield "bmspace_transport_stale_frames_total", labels, stale
+        yield "bmspace_session_retries_total", labels, self._session.retried
+        pacer = self._session.pacer
+        if pacer is not None:
+            yield "bmspace_pacer_gap_seconds", labels, pacer.gap
+            if pacer.latency is not None:
+                yield "bmspace_pacer_latency_seconds", labels, pacer.latency
+            yield "bmspace_pacer_error_rate", labels, pacer.error_rate
+            yield "bmspace_pacer_commands_total", labels, pacer.commands
+            yield "bmspace_pacer_errors_total", labels, pacer.errors
+        yield from timing_samples(self.name, self.timings)
+
+    def _read_analog(self) -> list[PackAnalogData]:
+        session = self._session
+        if self._bus is None:
+            return session.call(get_analog_data)
+        result: list[PackAnalogData] = []
+        command = session.retrying(get_analog_data)
+        batch = session.paced_batch(get_analog_data_batch)
+        for adr, packs in self._bus.poll(command, batch=batch):
+            for pack in packs:
+                pack.pack_number = adr
+                result.append(pack)
+        return result
+
+    def _read_warn(self, packs: int) -> list[PackWarnInfo]:
+        session = self._session
+        if self._bus is None:
+            return session.call(get_warn_info, packs)
+        result: list[PackWarnInfo] = []
+        command = session.retrying(get_warn_info)
+        batch = session.paced_batch(get_warn_info_batch)
+        for adr, warns in self._bus.poll(command, 1, batch=batch):
+            for warn in warns:
+                warn.pack_number = adr
+                result.append(warn)
+        return result
+
+    # ------------------------------------------------------------------
+    # Scheduled tasks
+    # ------------------------------------------------------------------
+
+    def _read_identity(self) -> None:
+        """BMS metadata: software version and serial numbers (cached by the session)."""
+        cached = self._session.cached_identity is not None
+        identity = self._session.identity()
+        self._bms_version = identity.version
+        self._bms_sn = identity.bms_sn
+        if not cached:
+            logger.info("[%s] BMS version: %s", self.name, identity.version)
+            logger.info("[%s] BMS SN: %s  Pack SN: %s",
+                        self.name, identity.bms_sn, identity.pack_sn)
+
+        self._publisher.publish_bms_info(identity.version, identity.bms_sn, identity.pack_sn)
+        if self._metrics is not None:
+            self._metrics.update_identity(
+                self.name, identity.version, identity.bms_sn, identity.pack_sn
+            )
+
+    def _poll_analog(self) -> None:
+        """Analog data (cell voltages, temperatures, currents …)."""
+        analog_list = self._read_analog()
+        read_at = time.perf_counter()
+        if self.history is not None:
+            self.history.record(analog_list)
+        if self._recorder is not None:
+            self._recorder.record(self.name, analog_list)
+        if self._metrics is not None:
+            self._metrics.update_analog(self.name, analog_list)
+        if self._bus is None:
+            self._packs = max((p.pack_number for p in analog_list), default=0)
+        else:
+            # A missed poll of one ADR must not retract its entities
+            self._packs = self._endpoint.packs_to_read
+        for pack in analog_list:
+            self._cells = len(pack.cells)
+            self._temps = len(pack.temps)
+        # HA discovery – only sends something when the layout changed
+        self._publish_discovery()
+        for pack in analog_list:
+            self._publisher.publish_analog_data(pack)
+        self.timings.sample_age.observe(time.perf_counter() - read_at)
+
+    def _poll_capacity(self) -> None:
+        """Overall pack capacity."""
+        cap = self._session.call(get_pack_capacity)
+        if self._metrics is not None:
+            self._metrics.update_capacity(self.name, cap)
+        self._publisher.publish_pack_capacity(cap)
+
+    def _poll_warn(self) -> None:
+        """Warning / protection / balancing states."""
+        warns = self._read_warn(self._packs)
+        if self._metrics is not None:
+            self._metrics.update_warn(self.name, warns)
+        for warn in warns:
+            self._publisher.publish_warn_info(warn)
+
+    def _publish_diagnostics(self) -> None:
+        """Timing summaries of the samples since the previous report."""
+        summaries = self.timings.take_window()
+        if summaries:
+            self._publisher.publish_diagnostics(summaries)
+
+    def _publish_discovery(self) -> None:
+        self._publisher.publish_ha_discovery(
+            self._bms_sn, self._bms_version, self._packs, self._cells, self._temps
+        )
+
+    def _build_schedule(self) -> RateScheduler:
+        config = self._config
+        scheduler = RateScheduler(clock=self._clock, sleep=self._sleep)
+        scheduler.add("identity", None, self._read_identity)
+        default = config.scan_interval
+        scheduler.add("analog", config.analog_interval or default, self._poll_analog)
+        scheduler.add("capacity", config.capacity_interval or default, self._poll_capacity)
+        scheduler.add("warn", config.warn_interval or default, self._poll_warn)
+        if config.diagnostics_interval > 0:
+            scheduler.add("diagnostics", config.diagnostics_interval, self._publish_diagnostics)
+        return scheduler
+
+    # ------------------------------------------------------------------
+    # Main loop
+    # ------------------------------------------------------------------
+
+    def close(self) -> None:
+        """Finish the traffic capture, if one is being recorded."""
+        if isinstance(self._transport, RecordingTransport):
+            self._transport.close()
+
+    def run(self) -> None:
+        try:
+            self._run()
+        except ReplayFinished as exc:
+            logger.info("[%s] Replay finished: %s", self.name, exc)
+
+    def _run(self) -> None:
+        transport = self._transport
+        publisher = self._publisher
+
+        while True:
+            # ------------------------------------------------------------
+            # (Re)connect to BMS
+            # ------------------------------------------------------------
+            try:
+                transport.connect()
+            except (OSError, TransportError) as exc:
+                logger.error("[%s] BMS connect failed: %s – retrying in %d s",
+                             self.name, exc, _RETRY_DELAY_SECS)
+                publisher.publish_availability(online=False)
+                self._sleep(_RETRY_DELAY_SECS)
+                continue
+
+            self._packs = 0
+            self._cells = 13
+            self._temps = 6
+            scheduler = self._build_schedule()
+            last_mqtt_retry = 0.0
+
+            # ------------------------------------------------------------
+            # Polling loop – runs until a BMS read error forces a reconnect
+            # ------------------------------------------------------------
+            while True:
+                if not publisher.is_connected:
+                    if not publisher.buffers_offline:
+                        logger.warning("[%s] MQTT disconnected – reconnecting", self.name)
+                        publisher.reconnect()
+                        time.sleep(_RETRY_DELAY_SECS)
+                        continue
+                    # Keep polling into the outbox; retry the broker now and then
+                    now = time.monotonic()
+                    if now - last_mqtt_retry >= _RETRY_DELAY_SECS:
+                        last_mqtt_retry = now
+                        logger.warning("[%s] MQTT disconnected – buffering, reconnecting",
+                                       self.name)
+                        try:
+                            publisher.reconnect()
+                        except OSError as exc:
+                            logger.warning("[%s] MQTT reconnect failed: %s", self.name, exc)
+
+                try:
+                    if scheduler.run_pending():
+                        publisher.publish_availability(online=True)
+                except (RuntimeError, OSError, ValueError) as exc:
+                    # Link errors (incl. pyserial's SerialException) and garbled frames
+                    logger.error("[%s] BMS read error: %s – reconnecting", self.name, exc)
+                    transport.disconnect()
+                    publisher.publish_availability(online=False)
+                    self._sleep(_RETRY_DELAY_SECS)
+                    break  # back to outer loop to reconnect
+
+                scheduler.sleep_until_next()
@@ -20,6 +20,10 @@ DEFAULT_VER: bytes  = b"\x32\x35"   # "25"
 DEFAULT_ADR: bytes  = b"\x30\x31"   # "01"
 DEFAULT_CID1: bytes = b"\x34\x36"   # "46"
 
+# Fixed-size parts of a frame surrounding the INFO field
+HEADER_LEN: int  = 13   # SOI + VER + ADR + CID1 + CID2/RTN + LCHKSUM + LENID
+TRAILER_LEN: int = 5    # CHKSUM + EOI
+
 # Physical unit scaling constants
 CURRENT_SIGN_THRESHOLD: int = 32768   # values >= this are negative (two's complement)
 CURRENT_UINT16_MAX: int     = 65535
@@ -29,6 +33,14 @@ VOLTAGE_SCALE: int           = 1000  # raw / 1000 → Volts
 CAPACITY_SCALE: int          = 10    # raw × 10 → mAh
 
 
+# ASCII hex digit → nibble value; 0xFF marks bytes that are not hex digits
+_HEX_NIBBLE: bytes = bytes(
+    int(chr(b), 16) if chr(b) in "0123456789abcdefABCDEF" else 0xFF
+    for b in range(256)
+)
+_HEX_DIGITS = "0123456789ABCDEF"
+
+
 def chksum_calc(data: bytes) -> str:
     """
     Calculate the 16-bit packet checksum.
@@ -36,11 +48,8 @@ def chksum_calc(data: bytes) -> str:
     Algorithm: sum all bytes from index 1 onwards, modulo 65536,
     flip all bits, add 1, return as uppercase hex string.
     """
-    total = sum(data[1:]) % 65536
-    bits = format(total, "016b")
-    flipped = bits.translate(str.maketrans("01", "10"))
-    result = int(flipped, 2) + 1
-    return format(result, "X")
+    total = (sum(data) - data[0]) & 0xFFFF if data else 0
+    return format((total ^ 0xFFFF) + 1, "X")
 
 
 def lchksum_calc(lenid: bytes) -> str:
@@ -51,13 +60,13 @@ def lchksum_calc(lenid: bytes) -> str:
     modulo 16, flip 4 bits, add 1 (wraps to 0 if result > 15),
     return as uppercase hex character.
     """
-    total = sum(int(chr(b), 16) for b in lenid) % 16
-    bits = format(total, "04b")
-    flipped = bits.translate(str.maketrans("01", "10"))
-    result = int(flipped, 2) + 1
-    if result > 15:
-        result = 0
-    return format(result, "X")
+    total = 0
+    for b in lenid:
+        nibble = _HEX_NIBBLE[b]
+        if nibble == 0xFF:
+            raise ValueError(f"Invalid hex digit in LENID: {lenid!r}")
+        total += nibble
+    return _HEX_DIGITS[(((total & 0xF) ^ 0xF) + 1) & 0xF]
 
 
 def cid2_return_code(rtn: bytes) -> tuple[bool, str | None]:
@@ -154,3 +163,95 @@ def parse_response(data: bytes) -> tuple[bool, bytes | str]:
         )
 
     return True, info
+
+
+def frame_length(header: bytes) -> int:
+    """
+    Return the total length of a frame from its first ``HEADER_LEN`` bytes.
+
+    The LENID field is validated against its LCHKSUM so that a corrupted
+    header is rejected before any INFO bytes are waited for.
+    Raises ``ValueError`` if the header is malformed.
+    """
+    if len(header) < HEADER_LEN or header[0:1] != SOI:
+        raise ValueError("Incomplete or misaligned frame header")
+    raw_lenid = bytes(header[10:13])
+    try:
+        lenid = int(raw_lenid, 16)
+    except ValueError:
+        raise ValueError(f"Cannot parse LENID: {raw_lenid!r}") from None
+    if header[9] != ord(lchksum_calc(raw_lenid)):
+        raise ValueError(f"LCHKSUM mismatch for LENID {raw_lenid!r}")
+    return HEADER_LEN + lenid + TRAILER_LEN
+
+
+def frame_key(frame: bytes) -> bytes:
+    """
+    Return the ADR and CID1 bytes of a request or response frame.
+
+    Responses echo both fields of their request (CID2 is replaced by the
+    return code), so this key pairs a response with the request it answers.
+    """
+    return bytes(frame[3:7])
+
+
+class FrameAssembler:
+    """
+    Incremental SOI…EOI frame scanner.
+
+    Bytes are ``feed``-ed as they arrive; ``next_frame`` returns a complete
+    frame as soon as enough bytes are buffered.  Noise before SOI and frames
+    with an invalid header or a missing EOI are discarded so the scanner
+    resynchronises on the next SOI.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        self._buf += data
+
+    def clear(self) -> None:
+        self._buf.clear()
+
+    def bytes_needed(self) -> int:
+        """Return the minimum number of bytes required to progress."""
+        start = self._buf.find(SOI)
+        if start < 0:
+            return 1
+        available = len(self._buf) - start
+        if available < HEADER_LEN:
+            return HEADER_LEN - available
+        try:
+            total = frame_length(self._buf[start : start + HEADER_LEN])
+        except ValueError:
+            return 1
+        return max(total - available, 1)
+
+    def next_frame(self) -> bytes | None:
+        """Return the next complete frame, or ``None`` if more data is needed."""
+        while True:
+            start = self._buf.find(SOI)
+            if start < 0:
+                self._buf.clear()
+                return None
+            if start:
+                del self._buf[:start]
+            if len(self._buf) < HEADER_LEN:
+                return None
+            try:
+                total = frame_length(self._buf[:HEADER_LEN])
+            except ValueError:
+                del self._buf[:1]
+                continue
+            if len(self._buf) < total:
+                return None
+            if self._buf[total - 1 : total] != EOI:
+                del self._buf[:1]
+                continue
+            frame = bytes(self._buf[:total])
+            del self._buf[:total]
+            return frame
+
+    def __len__(self) -> int:
+        return len(self._buf)
@@ -0,0 +1,101 @@
+"""
+Change-only publishing.
+
+``PublishCache`` remembers the last value sent on every topic and tells the
+publisher whether a new value is worth sending: strings and flags are sent
+when they change, numbers when they move beyond the metric's deadband, and
+every topic is refreshed at least once per ``max_age`` seconds so that late
+subscribers and restarted brokers catch up.
+"""
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+_INDEX_SUFFIX = re.compile(r"_\d+$")
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """A numeric value is republished when it moves by more than either bound."""
+
+    absolute: float = 0.0
+    relative: float = 0.0   # fraction of the last published value
+
+    def exceeded(self, last: float, value: float) -> bool:
+        delta = abs(value - last)
+        if delta == 0:
+            return False
+        if self.absolute == 0 and self.relative == 0:
+            return True
+        return (
+            (self.absolute > 0 and delta > self.absolute)
+            or (self.relative > 0 and delta > self.relative * abs(last))
+        )
+
+
+def metric_name(subtopic: str) -> str:
+    """
+    Return the deadband key for *subtopic*.
+
+    ``pack_1/v_cells/cell_12`` → ``cell``, ``pack_2/temps/temp_3`` → ``temp``,
+    ``pack_1/i_pack`` → ``i_pack``.
+    """
+    leaf = subtopic.rsplit("/", 1)[-1]
+    return _INDEX_SUFFIX.sub("", leaf)
+
+
+class PublishCache:
+    """Last-value cache keyed by topic."""
+
+    def __init__(
+        self,
+        deadbands: dict[str, Deadband] | None = None,
+        max_age: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._deadbands = deadbands or {}
+        self._max_age = max_age
+        self._clock = clock
+        self._last: dict[str, tuple[str | int | float, float]] = {}
+        self.suppressed = 0
+
+    def should_publish(
+        self, topic: str, value: str | int | float, metric: str | None = None
+    ) -> bool:
+        """
+        Return ``True`` and record *value* if it should be sent on *topic*.
+
+        *metric* selects the deadband; without one only exact repeats are
+        suppressed.
+        """
+        now = self._clock()
+        last = self._last.get(topic)
+        if last is not None and now - last[1] < self._max_age:
+            last_value = last[0]
+            if isinstance(value, (int, float)) and isinstance(last_value, (int, float)):
+                deadband = self._deadbands.get(metric) if metric else None
+                changed = (
+                    deadband.exceeded(last_value, value)
+                    if deadband
+                    else value != last_value
+                )
+            else:
+                changed = value != last_value
+            if not changed:
+                self.suppressed += 1
+                return False
+        self._last[topic] = (value, now)
+        return True
+
+    def forget(self, topic: str) -> None:
+        self._last.pop(topic, None)
+
+    def clear(self) -> None:
+        """Drop all cached values, e.g. after the broker connection was re-established."""
+        self._last.clear()
+
+    def __len__(self) -> int:
+        return len(self._last)
@@ -0,0 +1,130 @@
+"""
+Bounded hand-off between the polling threads and the MQTT publisher.
+
+Pollers put messages into a ``PublishQueue`` and return immediately; a
+single worker thread takes them out and hands them to paho, so a slow
+broker never stalls BMS polling.  What happens when the queue is full is
+set by its policy:
+
+``drop_oldest``
+    The oldest queued message is discarded to make room.
+``coalesce``
+    A message replaces a still-queued one for the same topic in place
+    (only the latest value of a topic matters); when the queue is full of
+    distinct topics the oldest is discarded.
+``block``
+    The producer waits until the worker has made room.
+
+``depth``, ``high_watermark``, ``dropped`` and ``coalesced`` expose the
+queue's behaviour for diagnostics.
+"""
+from __future__ import annotations
+
+import collections
+import threading
+import time
+from dataclasses import dataclass
+
+POLICIES = ("drop_oldest", "coalesce", "block")
+
+
+@dataclass(frozen=True, slots=True)
+class QueuedMessage:
+    topic: str
+    payload: str
+    retain: bool = False
+
+
+class PublishQueue:
+    """Thread-safe bounded FIFO of ``QueuedMessage`` with a full-queue policy."""
+
+    def __init__(self, maxsize: int, policy: str = "drop_oldest") -> None:
+        if maxsize <= 0:
+            raise ValueError(f"PublishQueue needs a positive size, got {maxsize}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown publish queue policy {policy!r}; expected one of {POLICIES}")
+        self._maxsize = maxsize
+        self._policy = policy
+        self._cond = threading.Condition()
+        self._closed = False
+        # coalesce: topic -> message in arrival order; otherwise a plain deque
+        self._by_topic: dict[str, QueuedMessage] = {}
+        self._fifo: collections.deque[QueuedMessage] = collections.deque()
+        self.dropped = 0
+        self.coalesced = 0
+        self.high_watermark = 0
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def depth(self) -> int:
+        with self._cond:
+            return self._len()
+
+    def __len__(self) -> int:
+        return self.depth
+
+    def _len(self) -> int:
+        return len(self._by_topic) if self._policy == "coalesce" else len(self._fifo)
+
+    def put(self, message: QueuedMessage) -> None:
+        """Queue *message*, applying the policy if the queue is full."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("PublishQueue is closed")
+            if self._policy == "coalesce":
+                if message.topic in self._by_topic:
+                    self._by_topic[message.topic] = message
+                    self.coalesced += 1
+                    return
+                if len(self._by_topic) >= self._maxsize:
+                    del self._by_topic[next(iter(self._by_topic))]
+                    self.dropped += 1
+                self._by_topic[message.topic] = message
+            else:
+                if len(self._fifo) >= self._maxsize:
+                    if self._policy == "block":
+                        while len(self._fifo) >= self._maxsize and not self._closed:
+                            self._cond.wait()
+                        if self._closed:
+                            raise RuntimeError("PublishQueue is closed")
+                    else:
+                        self._fifo.popleft()
+                        self.dropped += 1
+                self._fifo.append(message)
+            self.high_watermark = max(self.high_watermark, self._len())
+            self._cond.notify_all()
+
+    def get(self, timeout: float | None = None) -> QueuedMessage | None:
+        """
+        Take the oldest message, waiting up to *timeout* seconds.
+
+        Returns ``None`` on timeout, or once the queue is closed and empty.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._len():
+                if self._closed:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._policy == "coalesce":
+                message = self._by_topic.pop(next(iter(self._by_topic)))
+            else:
+                message = self._fifo.popleft()
+            self._cond.notify_all()
+            return message
+
+    def close(self) -> None:
+        """Refuse new messages; ``get`` drains what is left, then returns ``None``."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,294 @@
+"""
+Local telemetry recorder.
+
+``SqliteRecorder`` stores every analog poll in a local SQLite database so
+that the add-on itself retains weeks of per-cell data, independent of the
+uplink and of Home Assistant's recorder.
+
+Write amplification is kept low for SD cards:
+
+- the database runs in WAL mode with ``synchronous=NORMAL``;
+- one row per pack and poll holds all metrics as a packed ``float32``
+  blob (column names are stored once in ``layouts``);
+- samples are buffered in memory and written with one ``executemany``
+  per ``flush_interval``.
+
+On every flush complete minutes of raw samples are rolled up into the
+``minute`` tier and complete hours of minutes into the ``hour`` tier
+(count, mean, min and max per metric), and each tier is trimmed to its
+retention.
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Callable, Iterable
+
+from .bms import PackAnalogData
+from .config import Retention
+from .history import pack_metrics, pack_row
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS layouts (
+    id      INTEGER PRIMARY KEY,
+    metrics TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS raw (
+    ts     REAL NOT NULL,
+    source TEXT NOT NULL,
+    pack   INTEGER NOT NULL,
+    layout INTEGER NOT NULL,
+    data   BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS raw_ts ON raw (ts);
+"""
+
+_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    ts     REAL NOT NULL,
+    source TEXT NOT NULL,
+    pack   INTEGER NOT NULL,
+    layout INTEGER NOT NULL,
+    count  INTEGER NOT NULL,
+    mean   BLOB NOT NULL,
+    min    BLOB NOT NULL,
+    max    BLOB NOT NULL,
+    PRIMARY KEY (source, pack, ts)
+);
+CREATE INDEX IF NOT EXISTS {table}_ts ON {table} (ts);
+"""
+
+# tier -> bucket width (s) and the tier it is rolled up from
+_ROLLUPS = {
+    "minute": (60.0, "raw"),
+    "hour": (3600.0, "minute"),
+}
+
+TIERS = ("raw", *_ROLLUPS)
+
+
+def _pack_blob(values: Iterable[float]) -> bytes:
+    return array("f", values).tobytes()
+
+
+def _unpack_blob(blob: bytes) -> array:
+    values = array("f")
+    values.frombytes(blob)
+    return values
+
+
+class SqliteRecorder:
+    """
+    Batched, downsampled analog telemetry in a local SQLite database.
+
+    Safe to share between poller threads.  Values are stored as
+    ``float32``, which is exact for mV, mAh and cycle counts and well
+    below the BMS resolution for everything else.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        retention: Retention = Retention(),
+        flush_interval: float = 10.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._retention = retention
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: list[tuple[float, str, int, int, bytes]] = []
+        self._layouts: dict[tuple[str, ...], int] = {}
+        self._metrics: dict[int, tuple[str, ...]] = {}
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        for table in _ROLLUPS:
+            self._db.executescript(_ROLLUP_SCHEMA.format(table=table))
+        for layout_id, metrics in self._db.execute("SELECT id, metrics FROM layouts"):
+            names = tuple(metrics.split(","))
+            self._layouts[names] = layout_id
+            self._metrics[layout_id] = names
+        self._last_flush = self._clock()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def _layout_id(self, metrics: tuple[str, ...]) -> int:
+        layout_id = self._layouts.get(metrics)
+        if layout_id is None:
+            cursor = self._db.execute(
+                "INSERT INTO layouts (metrics) VALUES (?)", (",".join(metrics),)
+            )
+            layout_id = cursor.lastrowid
+            self._layouts[metrics] = layout_id
+            self._metrics[layout_id] = metrics
+        return layout_id
+
+    def record(
+        self,
+        source: str,
+        packs: Iterable[PackAnalogData],
+        timestamp: float | None = None,
+    ) -> None:
+        """
+        Queue one analog sample per pack from endpoint *source*.
+
+        The queue is written out once ``flush_interval`` has passed since
+        the last flush.
+        """
+        now = self._clock()
+        if timestamp is None:
+            timestamp = now
+        with self._lock:
+            for pack in packs:
+                layout_id = self._layout_id(pack_metrics(len(pack.cells), len(pack.temps)))
+                self._pending.append(
+                    (timestamp, source, pack.pack_number, layout_id, _pack_blob(pack_row(pack)))
+                )
+            due = now - self._last_flush >= self._flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write queued samples, roll up completed buckets and apply retention."""
+        with self._lock:
+            now = self._clock()
+            pending, self._pending = self._pending, []
+            self._last_flush = now
+            try:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT INTO raw (ts, source, pack, layout, data) VALUES (?, ?, ?, ?, ?)",
+                    pending,
+                )
+                for table, (bucket, source_table) in _ROLLUPS.items():
+                    self._rollup(table, source_table, bucket, now)
+                self._trim(now)
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                logger.exception("Recorder flush failed; %d samples dropped", len(pending))
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------------
+    # Downsampling and retention
+    # ------------------------------------------------------------------
+
+    def _watermark(self, table: str) -> float | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (table,)).fetchone()
+        return row[0] if row else None
+
+    def _rollup(self, table: str, source_table: str, bucket: float, now: float) -> None:
+        """Aggregate every complete *bucket* of *source_table* not yet in *table*."""
+        start = self._watermark(table)
+        if start is None:
+            first = self._db.execute(f"SELECT MIN(ts) FROM {source_table}").fetchone()[0]
+            if first is None:
+                return
+            start = first // bucket * bucket
+        end = now // bucket * bucket
+        if end <= start:
+            return
+
+        if source_table == "raw":
+            rows = (
+                (ts, source, pack, layout, 1, data, data, data)
+                for ts, source, pack, layout, data in self._db.execute(
+                    "SELECT ts, source, pack, layout, data FROM raw WHERE ts >= ? AND ts < ?",
+                    (start, end),
+                )
+            )
+        else:
+            rows = self._db.execute(
+                f"SELECT ts, source, pack, layout, count, mean, min, max FROM {source_table}"
+                " WHERE ts >= ? AND ts < ?",
+                (start, end),
+            )
+
+        groups: dict[tuple[float, str, int, int], list] = {}
+        for ts, source, pack, layout, count, mean, low, high in rows:
+            key = (ts // bucket * bucket, source, pack, layout)
+            mean, low, high = _unpack_blob(mean), _unpack_blob(low), _unpack_blob(high)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [count, [m * count for m in mean], list(low), list(high)]
+                continue
+            group[0] += count
+            group[1] = [s + m * count for s, m in zip(group[1], mean)]
+            group[2] = [min(a, b) for a, b in zip(group[2], low)]
+            group[3] = [max(a, b) for a, b in zip(group[3], high)]
+
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO {table}"
+            " (ts, source, pack, layout, count, mean, min, max) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (*key, count, _pack_blob(s / count for s in sums), _pack_blob(low), _pack_blob(high))
+                for key, (count, sums, low, high) in groups.items()
+            ),
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (table, end)
+        )
+
+    def _trim(self, now: float) -> None:
+        for table in TIERS:
+            self._db.execute(
+                f"DELETE FROM {table} WHERE ts < ?", (now - getattr(self._retention, table),)
+            )
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(
+        self,
+        source: str,
+        pack: int,
+        metric: str,
+        start: float = 0.0,
+        end: float = float("inf"),
+        tier: str = "raw",
+        stat: str = "mean",
+    ) -> list[tuple[float, float]]:
+        """
+        ``(timestamp, value)`` pairs of *metric* from *tier* in ``[start, end)``.
+
+        Rollup tiers return the bucket start time and the *stat*
+        (``mean``, ``min`` or ``max``) of the bucket.  Unflushed samples
+        are not included.
+        """
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier {tier!r}; expected one of {TIERS}")
+        if stat not in ("mean", "min", "max"):
+            raise ValueError(f"Unknown stat {stat!r}")
+        column = "data" if tier == "raw" else stat
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT ts, layout, {column} FROM {tier}"
+                " WHERE source = ? AND pack = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (source, pack, start, end),
+            ).fetchall()
+            metrics = dict(self._metrics)
+        result: list[tuple[float, float]] = []
+        for ts, layout, blob in rows:
+            names = metrics[layout]
+            if metric in names:
+                result.append((ts, _unpack_blob(blob)[names.index(metric)]))
+        return result
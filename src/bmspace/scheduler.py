@@ -0,0 +1,91 @@
+"""
+Rate-based command scheduling.
+
+Each task runs at its own period; ``run_pending`` executes every task that
+is due and ``sleep_until_next`` sleeps only until the earliest next due
+time, so fast telemetry does not drag slow-changing reads along with it.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass
+class ScheduledTask:
+    """One periodic (or one-shot) task."""
+
+    name: str
+    period: float | None     # seconds; ``None`` runs the task once
+    callback: Callable[[], object]
+    next_due: float = 0.0
+    runs: int = 0
+
+
+class RateScheduler:
+    """Runs tasks at independent rates using a monotonic clock."""
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._clock = clock
+        self._sleep = sleep
+        self._tasks: list[ScheduledTask] = []
+
+    def add(self, name: str, period: float | None, callback: Callable[[], object]) -> None:
+        """
+        Register a task that is due immediately and then every *period* seconds.
+
+        Tasks due at the same time run in registration order.
+        """
+        if period is not None and period <= 0:
+            raise ValueError(f"Task {name!r} needs a positive period, got {period}")
+        self._tasks.append(ScheduledTask(name, period, callback, next_due=self._clock()))
+
+    def reset(self) -> None:
+        """Make every remaining task due now (e.g. after a reconnect)."""
+        now = self._clock()
+        for task in self._tasks:
+            task.next_due = now
+
+    @property
+    def tasks(self) -> list[ScheduledTask]:
+        return list(self._tasks)
+
+    def run_pending(self) -> int:
+        """
+        Run every due task and return how many ran.
+
+        Exceptions from a callback propagate; the failing task keeps its due
+        time so it is retried on the next call.
+        """
+        ran = 0
+        for task in list(self._tasks):
+            now = self._clock()
+            if task.next_due > now:
+                continue
+            task.callback()
+            task.runs += 1
+            ran += 1
+            if task.period is None:
+                self._tasks.remove(task)
+                continue
+            task.next_due += task.period
+            if task.next_due <= now:
+                # Fell behind (slow link): skip missed slots instead of bursting
+                task.next_due = now + task.period
+        return ran
+
+    def time_until_next(self) -> float | None:
+        """Seconds until the earliest due task, or ``None`` if nothing is scheduled."""
+        if not self._tasks:
+            return None
+        return max(min(t.next_due for t in self._tasks) - self._clock(), 0.0)
+
+    def sleep_until_next(self) -> None:
+        delay = self.time_until_next()
+        if delay:
+            self._sleep(delay)
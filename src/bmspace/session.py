@@ -0,0 +1,136 @@
+"""
+BMS session layer.
+
+A ``BmsSession`` sits between the poller and the BMS commands of one
+endpoint and outlives its transport's reconnects:
+
+- a command that fails with a protocol error (bad checksum, error RTN),
+  an undecodable response or a response timeout is retried on the open
+  connection, with exponential backoff and jitter, before the error is
+  allowed to escalate to a reconnect;
+- the BMS identity (software version and serial numbers) is read once and
+  reused after every reconnect instead of being fetched again;
+- with an ``AdaptivePacer`` every command waits for the link's current
+  inter-command gap and feeds its latency and outcome back into it; a
+  pipelined batch feeds back one outcome per address.
+
+Errors that mean the link itself is gone (e.g. connection closed by the
+peer) are not retried.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from .bms import get_serial, get_version
+from .pacing import AdaptivePacer
+from .transport import TransportTimeout
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+# Failures worth retrying on the same connection
+_RETRYABLE = (RuntimeError, ValueError, TransportTimeout)
+
+
+@dataclass(frozen=True)
+class BmsIdentity:
+    """Static metadata of one BMS."""
+
+    version: str
+    bms_sn: str
+    pack_sn: str
+
+
+class BmsSession:
+    """Per-endpoint command retries and identity cache."""
+
+    def __init__(
+        self,
+        transport,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0,
+        sleep: Callable[[float], None] = time.sleep,
+        jitter: Callable[[], float] = random.random,
+        pacer: AdaptivePacer | None = None,
+    ) -> None:
+        self._transport = transport
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._sleep = sleep
+        self._jitter = jitter
+        self._pacer = pacer
+        self._identity: BmsIdentity | None = None
+        self.retried = 0
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def pacer(self) -> AdaptivePacer | None:
+        return self._pacer
+
+    def _delay(self, attempt: int) -> float:
+        """Backoff before retry *attempt* (0-based): half fixed, half random."""
+        delay = min(self._backoff * 2 ** attempt, self._max_backoff)
+        return delay / 2 + self._jitter() * delay / 2
+
+    def retrying(self, command: Callable[..., _T]) -> Callable[..., _T]:
+        """Wrap a ``bms`` command so that retryable failures are retried."""
+
+        @functools.wraps(command)
+        def _call(transport, *args: Any, **kwargs: Any) -> _T:
+            attempt = 0
+            while True:
+                pace = self._pacer.pace() if self._pacer else contextlib.nullcontext()
+                try:
+                    with pace:
+                        return command(transport, *args, **kwargs)
+                except _RETRYABLE as exc:
+                    if attempt >= self._retries:
+                        raise
+                    delay = self._delay(attempt)
+                    logger.warning("%s failed (%s) – retry %d/%d in %.2f s",
+                                   command.__name__, exc, attempt + 1, self._retries, delay)
+                    self.retried += 1
+                    self._sleep(delay)
+                    attempt += 1
+
+        return _call
+
+    def paced_batch(self, batch: Callable[..., _T]) -> Callable[..., _T]:
+        """Wrap a pipelined ``bms`` batch command so that it is paced like a command."""
+        pacer = self._pacer
+        if pacer is None:
+            return batch
+
+        @functools.wraps(batch)
+        def _call(transport, *args: Any, **kwargs: Any) -> _T:
+            return pacer.pace_batch(lambda: batch(transport, *args, **kwargs))
+
+        return _call
+
+    def call(self, command: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+        """Run *command* on this session's transport, retrying transient failures."""
+        return self.retrying(command)(self._transport, *args, **kwargs)
+
+    def identity(self, refresh: bool = False) -> BmsIdentity:
+        """Return the BMS identity, reading it only the first time (or on *refresh*)."""
+        if self._identity is None or refresh:
+            version = self.call(get_version)
+            bms_sn, pack_sn = self.call(get_serial)
+            self._identity = BmsIdentity(version, bms_sn, pack_sn)
+        return self._identity
+
+    @property
+    def cached_identity(self) -> BmsIdentity | None:
+        return self._identity
@@ -0,0 +1,505 @@
+"""
+PACE BMS device simulator.
+
+A ``SimulatedBms`` answers PACE protocol requests the way a stack of real
+packs does, so that the transports, the ``bms`` commands and the poller
+can be exercised (and timed) without hardware:
+
+- any number of bus addresses, each with ``packs`` packs of ``cells``
+  cells and ``temps`` temperature sensors;
+- cell voltages, temperatures, current and remaining capacity drift
+  slowly and plausibly with (simulated) time;
+- a configurable response latency with random jitter;
+- the multi-pack quirks seen in the field: an extra byte between pack
+  records (``extra_byte``) and a trailing INFOFLAG after each pack
+  (``infoflag``).
+
+Requests for an address that is not simulated get no answer, like on a
+real RS485 bus.  ``TcpSimulator`` serves a ``SimulatedBms`` on a TCP port
+and ``PtySimulator`` on a Linux pseudo-terminal.
+
+Usage::
+
+    python -m bmspace.simulator --tcp 5000 --addresses 1,2 --packs 4 --infoflag
+"""
+from __future__ import annotations
+
+import abc
+import argparse
+import logging
+import os
+import random
+import select
+import socket
+import struct
+import threading
+import time
+import tty
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from . import constants
+from .protocol import (
+    CAPACITY_SCALE,
+    CURRENT_SCALE,
+    CURRENT_UINT16_MAX,
+    EOI,
+    HEADER_LEN,
+    TEMP_OFFSET_DECIDEGREES,
+    FrameAssembler,
+    build_request,
+    chksum_calc,
+    lchksum_calc,
+)
+
+logger = logging.getLogger(__name__)
+
+# Return codes (RTN) sent in place of CID2
+RTN_OK: bytes = b"00"
+RTN_UNDEFINED: bytes = b"01"
+RTN_CHKSUM: bytes = b"02"
+RTN_LCHKSUM: bytes = b"03"
+RTN_CID2: bytes = b"04"
+
+# Byte inserted by the ``infoflag`` and ``extra_byte`` quirks
+INFOFLAG: int = 0xFF
+EXTRA_BYTE: int = 0x00
+
+# Charge and discharge FET on
+_INSTRUCTION_FETS_ON: int = 0x06
+
+
+# ---------------------------------------------------------------------------
+# Pack model
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SimulatedPack:
+    """State of one simulated pack; values are in the units the BMS reports."""
+
+    cells: list[int]              # mV
+    temps: list[float]            # °C
+    current: float = 0.0          # A, positive = charging
+    remain_cap: float = 50_000.0  # mAh
+    full_cap: int = 100_000       # mAh
+    design_cap: int = 100_000     # mAh
+    cycles: int = 0
+    _offsets: list[float] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def create(cls, rng: random.Random, cells: int, temps: int) -> SimulatedPack:
+        pack = cls(
+            cells=[0] * cells,
+            temps=[round(rng.uniform(20.0, 28.0), 1) for _ in range(temps)],
+            current=round(rng.uniform(-20.0, 20.0), 2),
+            remain_cap=rng.uniform(30_000, 90_000),
+            cycles=rng.randrange(0, 800),
+        )
+        pack._offsets = [rng.gauss(0.0, 4.0) for _ in range(cells)]
+        pack._update_cells()
+        return pack
+
+    @property
+    def voltage(self) -> int:
+        """Pack voltage in mV (sum of the cells)."""
+        return sum(self.cells)
+
+    @property
+    def soc(self) -> float:
+        return self.remain_cap / self.full_cap
+
+    def _update_cells(self) -> None:
+        # Flat LiFePO4-like curve plus an IR drop and per-cell imbalance
+        base = 3150 + 250 * self.soc + 0.5 * self.current
+        self.cells = [max(2500, min(3650, round(base + o))) for o in self._offsets]
+
+    def drift(self, rng: random.Random, dt: float) -> None:
+        """Advance the pack state by *dt* seconds."""
+        if dt <= 0:
+            return
+        scale = dt ** 0.5
+        self.current = max(-50.0, min(50.0, self.current + rng.gauss(0.0, 0.5) * scale))
+        previous = self.remain_cap
+        self.remain_cap = max(0.0, min(self.full_cap, self.remain_cap + self.current * dt / 3.6))
+        if previous < self.full_cap <= self.remain_cap:
+            self.cycles += 1
+        self._offsets = [o + rng.gauss(0.0, 0.05) * scale for o in self._offsets]
+        self.temps = [
+            t + (25.0 + abs(self.current) * 0.1 - t) * min(1.0, dt / 600)
+            + rng.gauss(0.0, 0.02) * scale
+            for t in self.temps
+        ]
+        self._update_cells()
+
+
+# ---------------------------------------------------------------------------
+# Response encoding
+# ---------------------------------------------------------------------------
+
+
+def _analog_record(pack: SimulatedPack) -> bytes:
+    """Binary analog record of one pack (the layout ``bms`` decodes)."""
+    current = round(pack.current * CURRENT_SCALE)
+    if current < 0:
+        current += CURRENT_UINT16_MAX
+    return struct.pack(
+        f">B{len(pack.cells)}HB{len(pack.temps)}HHHHBHHHB",
+        len(pack.cells), *pack.cells,
+        len(pack.temps), *(round(t * 10) + TEMP_OFFSET_DECIDEGREES for t in pack.temps),
+        current,
+        min(pack.voltage, 0xFFFF),
+        round(pack.remain_cap) // CAPACITY_SCALE,
+        0x03,
+        pack.full_cap // CAPACITY_SCALE,
+        pack.cycles,
+        pack.design_cap // CAPACITY_SCALE,
+        0x00,
+    )
+
+
+def _warn_record(pack: SimulatedPack) -> bytes:
+    """Binary warning record of one pack: no alarms, FETs on, top cells balancing."""
+    mean = sum(pack.cells) / len(pack.cells)
+    balancing = sum(1 << i for i, mv in enumerate(pack.cells[:16]) if mv > mean + 5)
+    return (
+        bytes([len(pack.cells)]) + bytes(len(pack.cells))
+        + bytes([len(pack.temps)]) + bytes(len(pack.temps))
+        + bytes(3)                                # charge current, voltage, discharge current
+        + bytes([0, 0, _INSTRUCTION_FETS_ON, 0, 0])   # protect 1/2, instruction, control, fault
+        + struct.pack(">H", balancing)
+        + bytes(2)                                # warn 1/2
+    )
+
+
+def _frame_ok(request: bytes) -> bytes | None:
+    """RTN error code for a request with a bad LCHKSUM or CHKSUM, else ``None``."""
+    if request[9] != ord(lchksum_calc(request[10:13])):
+        return RTN_LCHKSUM
+    if request[-5:-1].decode("ASCII", "replace") != chksum_calc(request[:-5]):
+        return RTN_CHKSUM
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Simulated device
+# ---------------------------------------------------------------------------
+
+
+class SimulatedBms:
+    """Protocol-level model of one or more PACE BMS on a bus."""
+
+    def __init__(
+        self,
+        addresses: Iterable[int] = (1,),
+        packs: int = 1,
+        cells: int = 16,
+        temps: int = 6,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        extra_byte: bool = False,
+        infoflag: bool = False,
+        version: str = "PACE_SIM_V1.0",
+        seed: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not 1 <= packs <= 255 or not 1 <= cells <= 255 or not 0 <= temps <= 255:
+            raise ValueError(f"Invalid pack layout {packs} x {cells} cells / {temps} temps")
+        self._rng = random.Random(seed)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.jitter = jitter
+        self.extra_byte = extra_byte
+        self.infoflag = infoflag
+        self.version = version
+        self.packs: dict[int, list[SimulatedPack]] = {
+            adr: [SimulatedPack.create(self._rng, cells, temps) for _ in range(packs)]
+            for adr in addresses
+        }
+        self._last_update = clock()
+        self.requests = 0
+
+    def response_delay(self) -> float:
+        """Seconds to wait before answering the next request."""
+        return self.latency + self.jitter * self._rng.random()
+
+    def advance(self, dt: float | None = None) -> None:
+        """Let the pack values drift by *dt* seconds (default: time since last call)."""
+        now = self._clock()
+        if dt is None:
+            dt = now - self._last_update
+        self._last_update = now
+        for packs in self.packs.values():
+            for pack in packs:
+                pack.drift(self._rng, dt)
+
+    def handle(self, request: bytes) -> bytes | None:
+        """Return the response frame to *request*, or ``None`` if no device answers."""
+        if len(request) < HEADER_LEN + 5 or request[-1:] != EOI:
+            return None
+        ver, adr_hex, cid1, cid2 = request[1:3], request[3:5], request[5:7], request[7:9]
+        try:
+            adr = int(adr_hex, 16)
+        except ValueError:
+            return None
+        if adr not in self.packs:
+            return None
+
+        with self._lock:
+            self.requests += 1
+            rtn = _frame_ok(request)
+            if rtn is not None:
+                return build_request(cid2=rtn, ver=ver, adr=adr_hex, cid1=cid1)
+            self.advance()
+            rtn, info = self._respond(adr, cid2, request[13:-5])
+        return build_request(cid2=rtn, info=info, ver=ver, adr=adr_hex, cid1=cid1)
+
+    def _respond(self, adr: int, cid2: bytes, info: bytes) -> tuple[bytes, bytes]:
+        packs = self.packs[adr]
+        if cid2 == constants.cid2SoftwareVersion:
+            return RTN_OK, self.version.encode("ASCII").hex().upper().encode("ASCII")
+        if cid2 == constants.cid2SerialNumber:
+            bms_sn = f"SIM{adr:02X}BMS0001".ljust(20)
+            pack_sn = f"SIM{adr:02X}PCK0001".ljust(20)
+            return RTN_OK, (bms_sn + pack_sn).encode("ASCII").hex().upper().encode("ASCII")
+        if cid2 == constants.cid2PackAnalogData:
+            try:
+                selected = self._select(packs, info)
+            except (ValueError, IndexError):
+                return RTN_UNDEFINED, b""
+            return RTN_OK, self._analog_info(selected)
+        if cid2 == constants.cid2WarnInfo:
+            try:
+                selected = self._select(packs, info)
+            except (ValueError, IndexError):
+                return RTN_UNDEFINED, b""
+            return RTN_OK, self._warn_info(selected)
+        if cid2 == constants.cid2PackCapacity:
+            remain = min(round(sum(p.remain_cap for p in packs)) // CAPACITY_SCALE, 0xFFFF)
+            full = min(sum(p.full_cap for p in packs) // CAPACITY_SCALE, 0xFFFF)
+            design = min(sum(p.design_cap for p in packs) // CAPACITY_SCALE, 0xFFFF)
+            return RTN_OK, struct.pack(">HHH", remain, full, design).hex().upper().encode("ASCII")
+        return RTN_CID2, b""
+
+    @staticmethod
+    def _select(packs: list[SimulatedPack], info: bytes) -> list[SimulatedPack]:
+        """Packs addressed by a battery-number INFO field (``FF`` = all)."""
+        number = int(info[:2] or b"FF", 16)
+        if number == 0xFF:
+            return packs
+        if not 1 <= number <= len(packs):
+            raise IndexError(number)
+        return [packs[number - 1]]
+
+    def _analog_info(self, packs: list[SimulatedPack]) -> bytes:
+        raw = bytearray([0x00, len(packs)])
+        for i, pack in enumerate(packs):
+            if self.extra_byte and i:
+                raw.append(EXTRA_BYTE)
+            raw += _analog_record(pack)
+            if self.infoflag:
+                raw.append(INFOFLAG)
+        return raw.hex().upper().encode("ASCII")
+
+    def _warn_info(self, packs: list[SimulatedPack]) -> bytes:
+        raw = bytearray([0x00, len(packs)])
+        for pack in packs:
+            raw += _warn_record(pack)
+            if self.infoflag:
+                raw.append(INFOFLAG)
+        return raw.hex().upper().encode("ASCII")
+
+
+# ---------------------------------------------------------------------------
+# Servers
+# ---------------------------------------------------------------------------
+
+
+class _Server(abc.ABC):
+    """Common lifecycle of the simulator front ends."""
+
+    def __init__(self, bms: SimulatedBms) -> None:
+        self.bms = bms
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def _spawn(self, target: Callable[..., None], *args, name: str) -> None:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _answer(self, assembler: FrameAssembler, data: bytes, write: Callable[[bytes], None]) -> None:
+        """Feed received bytes and write a response for every complete request."""
+        assembler.feed(data)
+        while (request := assembler.next_frame()) is not None:
+            response = self.bms.handle(request)
+            if response is None:
+                continue
+            delay = self.bms.response_delay()
+            if delay > 0:
+                if self._stop.wait(delay):
+                    return
+            write(response)
+
+    def close(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2.0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @abc.abstractmethod
+    def start(self) -> _Server:
+        """Start serving in background threads and return ``self``."""
+
+
+class TcpSimulator(_Server):
+    """Serve a ``SimulatedBms`` to any number of TCP clients."""
+
+    def __init__(self, bms: SimulatedBms, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__(bms)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._sock.getsockname()[:2]
+
+    def start(self) -> TcpSimulator:
+        self._sock.listen()
+        self._sock.settimeout(0.1)
+        self._spawn(self._accept, name="bms-sim-accept")
+        logger.info("Simulated BMS listening on %s:%d", *self.address)
+        return self
+
+    def _accept(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn, peer = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self._spawn(self._serve, conn, name=f"bms-sim-{peer[1]}")
+
+    def _serve(self, conn: socket.socket) -> None:
+        assembler = FrameAssembler()
+        conn.settimeout(0.1)
+        with conn:
+            while not self._stop.is_set():
+                try:
+                    data = conn.recv(4096)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                if not data:
+                    return
+                try:
+                    self._answer(assembler, data, conn.sendall)
+                except OSError:
+                    return
+
+    def close(self) -> None:
+        super().close()
+        self._sock.close()
+
+
+class PtySimulator(_Server):
+    """Serve a ``SimulatedBms`` on a pseudo-terminal; open ``port`` as a serial device."""
+
+    def __init__(self, bms: SimulatedBms) -> None:
+        super().__init__(bms)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+
+    @property
+    def port(self) -> str:
+        return os.ttyname(self._slave)
+
+    def start(self) -> PtySimulator:
+        self._spawn(self._serve, name="bms-sim-pty")
+        logger.info("Simulated BMS on %s", self.port)
+        return self
+
+    def _write(self, data: bytes) -> None:
+        while data:
+            data = data[os.write(self._master, data):]
+
+    def _serve(self) -> None:
+        assembler = FrameAssembler()
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            self._answer(assembler, data, self._write)
+
+    def close(self) -> None:
+        super().close()
+        os.close(self._master)
+        os.close(self._slave)
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulated PACE BMS")
+    parser.add_argument("--tcp", type=int, metavar="PORT", help="listen on a TCP port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--pty", action="store_true", help="serve on a pseudo-terminal")
+    parser.add_argument("--addresses", default="1", help="comma-separated bus addresses")
+    parser.add_argument("--packs", type=int, default=1, help="packs per address")
+    parser.add_argument("--cells", type=int, default=16)
+    parser.add_argument("--temps", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.05, help="response latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency (s)")
+    parser.add_argument("--extra-byte", action="store_true")
+    parser.add_argument("--infoflag", action="store_true")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    if args.tcp is None and not args.pty:
+        parser.error("nothing to serve: pass --tcp PORT and/or --pty")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(name)s %(message)s")
+    bms = SimulatedBms(
+        addresses=[int(a, 0) for a in args.addresses.split(",")],
+        packs=args.packs,
+        cells=args.cells,
+        temps=args.temps,
+        latency=args.latency,
+        jitter=args.jitter,
+        extra_byte=args.extra_byte,
+        infoflag=args.infoflag,
+        seed=args.seed,
+    )
+    servers: list[_Server] = []
+    if args.tcp is not None:
+        servers.append(TcpSimulator(bms, args.host, args.tcp).start())
+    if args.pty:
+        servers.append(PtySimulator(bms).start())
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
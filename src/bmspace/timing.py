@@ -0,0 +1,144 @@
+"""
+Hot-path timing histograms.
+
+A ``StageTimings`` holds one fixed-bucket ``Histogram`` per stage of a BMS
+read and its publication (all in seconds):
+
+    write       request handed to the link
+    ttfb        request written -> first response byte
+    receive     request written -> complete response frame
+    parse       ``parse_response`` (framing and checksums)
+    decode      INFO field decode into a result dataclass
+    publish     one MQTT message handed to the publish queue or client
+    sample_age  analog data read -> its last message published
+
+Observing a value bumps one counter in a preallocated array, so nothing
+is stored per sample and the instrumentation can stay on in production.
+Each poller owns one ``StageTimings`` (``BmsPoller.timings``) shared with
+its transport and publisher; the histograms are exported on the metrics
+endpoint, and ``take_window`` summarises the samples since its previous
+call for the periodic ``diagnostics/`` topics.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Iterator, Sequence
+
+# Upper bucket bounds (s); a last, unbounded bucket catches the rest
+BUCKETS: tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+STAGES = ("write", "ttfb", "receive", "parse", "decode", "publish", "sample_age")
+
+# Percentiles reported by ``summary``
+_PERCENTILES = ((50, 0.50), (90, 0.90), (99, 0.99))
+
+
+class Histogram:
+    """
+    Cumulative counts of observations in fixed buckets.
+
+    Observations are not locked: a histogram is meant to be fed by one
+    thread, and a rare concurrent observation may be lost.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: Sequence[float] = BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = array("Q", bytes(8 * (len(self.bounds) + 1)))
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def copy(self) -> Histogram:
+        other = Histogram.__new__(Histogram)
+        other.bounds = self.bounds
+        other.counts = array("Q", self.counts)
+        other.count = self.count
+        other.total = self.total
+        return other
+
+    def quantile(self, q: float, since: Histogram | None = None) -> float:
+        """
+        Estimate the *q* quantile, interpolating linearly within a bucket.
+
+        Values in the unbounded bucket are reported as the last bound.
+        With *since*, only observations made after that copy are counted.
+        """
+        counts = self._delta(since)
+        rank = q * sum(counts)
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.bounds, counts):
+            if n and seen + n >= rank:
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound
+        return lower
+
+    def summary(self, since: Histogram | None = None) -> dict[str, float]:
+        """Count, mean and percentiles in milliseconds, optionally since a copy."""
+        count = self.count - (since.count if since is not None else 0)
+        total = self.total - (since.total if since is not None else 0.0)
+        result: dict[str, float] = {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+        }
+        for name, q in _PERCENTILES:
+            result[f"p{name}_ms"] = round(self.quantile(q, since) * 1000, 3) if count else 0.0
+        return result
+
+    def _delta(self, since: Histogram | None) -> Sequence[int]:
+        if since is None:
+            return self.counts
+        return [now - then for now, then in zip(self.counts, since.counts)]
+
+
+class StageTimings:
+    """One ``Histogram`` per pipeline stage (see ``STAGES``)."""
+
+    __slots__ = STAGES + ("_window",)
+
+    write: Histogram
+    ttfb: Histogram
+    receive: Histogram
+    parse: Histogram
+    decode: Histogram
+    publish: Histogram
+    sample_age: Histogram
+
+    def __init__(self, bounds: Sequence[float] = BUCKETS) -> None:
+        for stage in STAGES:
+            setattr(self, stage, Histogram(bounds))
+        self._window = self.snapshot()
+
+    def histograms(self) -> Iterator[tuple[str, Histogram]]:
+        for stage in STAGES:
+            yield stage, getattr(self, stage)
+
+    def snapshot(self) -> dict[str, Histogram]:
+        return {stage: histogram.copy() for stage, histogram in self.histograms()}
+
+    def summaries(self) -> dict[str, dict[str, float]]:
+        """Summary of every stage observed so far."""
+        return {
+            stage: histogram.summary()
+            for stage, histogram in self.histograms() if histogram.count
+        }
+
+    def take_window(self) -> dict[str, dict[str, float]]:
+        """Summaries of the stages observed since the previous call (or creation)."""
+        previous, self._window = self._window, self.snapshot()
+        return {
+            stage: histogram.summary(previous[stage])
+            for stage, histogram in self._window.items()
+            if histogram.count > previous[stage].count
+        }
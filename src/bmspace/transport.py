@@ -7,28 +7,59 @@ Two concrete implementations are provided:
 
 Both expose the same ``connect / disconnect / send / receive`` interface,
 so the BMS command layer is transport-agnostic.
+
+``AsyncSerialTransport`` and ``AsyncTcpTransport`` provide the same
+interface as coroutines on top of asyncio streams, for use with the
+``async_`` commands in ``bms``.
+
+``receive`` reads incrementally until a complete SOI…EOI frame has arrived
+or the response deadline expires, so the round-trip time is bounded by the
+device rather than by a fixed delay after each write.
+
+The synchronous transports keep one ``FrameAssembler`` per connection.
+Anything still buffered when a request is sent can only be a late answer
+to an earlier request and is dropped, and ``receive`` skips frames whose
+ADR/CID1 do not match the request just sent, so a straggler from a pack
+that timed out is never mistaken for the current response.
+
+``TcpTransport(pipeline=True)`` additionally offers ``exchange_batch``: a
+batch of requests is written back-to-back and the responses are matched to
+their requests by ADR/CID1 as they stream in, for RS485 gateways that
+queue requests.  N round trips then cost roughly one.
+
+With ``timings`` set to a ``StageTimings``, the synchronous transports
+time each write, the time to the first response byte and the time to the
+complete frame.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
 import socket
 import time
-from typing import Protocol
+from collections import deque
+from typing import Awaitable, Callable, Protocol, Sequence
 
 import serial
 
-from .config import Config
+from .config import BmsEndpoint, Config
+from .protocol import FrameAssembler, frame_key
+from .timing import StageTimings
 
 logger = logging.getLogger(__name__)
 
-# SOI byte value used to detect the start of a valid frame
-_SOI_BYTE = b"\x7e"
+# A serial read may overrun the response deadline by at most this much (s)
+_SERIAL_TIMEOUT_SLACK = 0.1
 
 
 class TransportError(OSError):
     """Raised when a transport-level operation fails."""
 
 
+class TransportTimeout(TransportError):
+    """Raised when no complete frame arrives before the response deadline."""
+
+
 class Transport(Protocol):
     """Structural protocol – both transports satisfy this interface."""
 
@@ -41,13 +72,102 @@ class Transport(Protocol):
     def is_connected(self) -> bool: ...
 
 
-class SerialTransport:
+class AsyncTransport(Protocol):
+    """Structural protocol for the asyncio transports."""
+
+    async def connect(self) -> None: ...
+    async def disconnect(self) -> None: ...
+    async def send(self, data: bytes) -> None: ...
+    async def receive(self) -> bytes: ...
+
+    @property
+    def is_connected(self) -> bool: ...
+
+
+def _read_frame(
+    read: Callable[[int, float], bytes],
+    assembler: FrameAssembler,
+    timeout: float,
+    deadline: float | None = None,
+) -> bytes:
+    """
+    Drive *read* until *assembler* yields a complete frame.
+
+    ``read(size, remaining)`` must return at most *size* bytes, waiting no
+    longer than *remaining* seconds.  Raises ``TransportTimeout`` when the
+    overall *timeout* (or an explicit monotonic *deadline*) expires before a
+    frame is complete.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    while True:
+        frame = assembler.next_frame()
+        if frame is not None:
+            return frame
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TransportTimeout(
+                f"Timed out after {timeout:.2f} s waiting for a response frame "
+                f"({len(assembler)} bytes buffered)"
+            )
+        assembler.feed(read(assembler.bytes_needed(), remaining))
+
+
+def _read_response(
+    read: Callable[[int, float], bytes],
+    assembler: FrameAssembler,
+    timeout: float,
+    expected: bytes | None,
+) -> tuple[bytes, int]:
+    """
+    Read frames until one carries the *expected* ADR/CID1 key.
+
+    Returns the frame and the number of stale frames skipped on the way.
+    """
+    deadline = time.monotonic() + timeout
+    skipped = 0
+    while True:
+        frame = _read_frame(read, assembler, timeout, deadline)
+        if expected is None or frame_key(frame) == expected:
+            return frame, skipped
+        skipped += 1
+        logger.debug("Discarding stale frame %r (expected %r)", frame[:13], expected)
+
+
+class _LinkTiming:
+    """Write / first-byte / frame timing shared by the synchronous transports."""
+
+    timings: StageTimings | None = None
+    _sent_at = 0.0
+    _awaiting_byte = False
+
+    def _wrote(self, start: float) -> None:
+        timings = self.timings
+        if timings is not None:
+            self._sent_at = now = time.perf_counter()
+            self._awaiting_byte = True
+            timings.write.observe(now - start)
+
+    def _first_byte(self) -> None:
+        self._awaiting_byte = False
+        self.timings.ttfb.observe(time.perf_counter() - self._sent_at)
+
+    def _frame_received(self) -> None:
+        timings = self.timings
+        if timings is not None:
+            timings.receive.observe(time.perf_counter() - self._sent_at)
+
+
+class SerialTransport(_LinkTiming):
     """RS232 / USB serial transport."""
 
-    def __init__(self, port: str, timeout: float = 1.0) -> None:
+    def __init__(self, port: str, timeout: float = 2.0) -> None:
         self._port = port
         self._timeout = timeout
         self._conn: serial.Serial | None = None
+        self._assembler = FrameAssembler()
+        self._expected: bytes | None = None
+        self.stale_frames = 0
 
     def connect(self) -> None:
         logger.info("Connecting to serial port %s", self._port)
@@ -62,27 +182,57 @@ class SerialTransport:
     def send(self, data: bytes) -> None:
         if not self._conn:
             raise TransportError("Serial port not connected")
+        self._conn.reset_input_buffer()
+        self._assembler.clear()
+        self._expected = frame_key(data)
+        start = time.perf_counter()
         self._conn.write(data)
-        time.sleep(0.25)
+        self._wrote(start)
 
     def receive(self) -> bytes:
         if not self._conn:
             raise TransportError("Serial port not connected")
-        return self._conn.readline()
+        frame, skipped = _read_response(
+            self._read, self._assembler, self._timeout, self._expected
+        )
+        self.stale_frames += skipped
+        self._frame_received()
+        return frame
+
+    def _read(self, size: int, remaining: float) -> bytes:
+        # pyserial reconfigures the port (tcsetattr) on every timeout change,
+        # so only retune it when it is off by more than the slack
+        if abs(self._conn.timeout - remaining) > _SERIAL_TIMEOUT_SLACK:
+            self._conn.timeout = remaining
+        data = self._conn.read(max(size, self._conn.in_waiting))
+        if data and self._awaiting_byte:
+            self._first_byte()
+        return data
 
     @property
     def is_connected(self) -> bool:
         return self._conn is not None and self._conn.is_open
 
 
-class TcpTransport:
+class TcpTransport(_LinkTiming):
     """TCP/IP socket transport."""
 
-    def __init__(self, host: str, port: int, timeout: float = 2.0) -> None:
+    def __init__(
+        self, host: str, port: int, timeout: float = 2.0, pipeline: bool = False
+    ) -> None:
         self._host = host
         self._port = port
         self._timeout = timeout
+        self._pipeline = pipeline
         self._conn: socket.socket | None = None
+        self._assembler = FrameAssembler()
+        self._expected: bytes | None = None
+        self.stale_frames = 0
+
+    @property
+    def pipelined(self) -> bool:
+        """``True`` if ``exchange_batch`` should be used for multi-address reads."""
+        return self._pipeline
 
     def connect(self) -> None:
         logger.info("Connecting to %s:%d", self._host, self._port)
@@ -90,6 +240,7 @@ class TcpTransport:
         s.settimeout(self._timeout)
         s.connect((self._host, self._port))
         self._conn = s
+        self._assembler.clear()
         logger.info("TCP socket connected")
 
     def disconnect(self) -> None:
@@ -103,28 +254,232 @@ class TcpTransport:
     def send(self, data: bytes) -> None:
         if not self._conn:
             raise TransportError("TCP socket not connected")
-        self._conn.send(data)
-        time.sleep(0.25)
+        self._discard_stale()
+        self._expected = frame_key(data)
+        start = time.perf_counter()
+        self._conn.sendall(data)
+        self._wrote(start)
 
     def receive(self) -> bytes:
         if not self._conn:
             raise TransportError("TCP socket not connected")
-        raw = self._conn.recv(4096)
-        # The BMS may send multiple responses in one TCP segment.
-        # Pick the frame that starts with the SOI byte.
-        frames = raw.split(b"\r")
-        for frame in frames:
-            if frame and frame[0:1] == _SOI_BYTE:
-                return frame + b"\r"
-        return raw  # fall-back: return whatever arrived
+        frame, skipped = _read_response(
+            self._read, self._assembler, self._timeout, self._expected
+        )
+        self.stale_frames += skipped
+        self._frame_received()
+        return frame
+
+    def _discard_stale(self) -> None:
+        """Drop everything received before the next request goes out."""
+        self._conn.setblocking(False)
+        try:
+            while True:
+                chunk = self._conn.recv(4096)
+                if not chunk:
+                    raise TransportError("TCP connection closed by peer")
+                self._assembler.feed(chunk)
+        except BlockingIOError:
+            pass
+        finally:
+            self._conn.settimeout(self._timeout)
+        if len(self._assembler):
+            logger.debug("Dropping %d stale bytes before request", len(self._assembler))
+            self._assembler.clear()
+
+    def exchange_batch(self, requests: Sequence[bytes]) -> list[bytes | None]:
+        """
+        Write all *requests* at once and return their responses in order.
+
+        Responses are paired with requests by ADR/CID1; requests sharing
+        both are answered in the order they were sent.  Frames nobody asked
+        for are discarded.  A request whose response has not arrived
+        ``timeout`` seconds after the last frame received is ``None``.
+        """
+        if not self._conn:
+            raise TransportError("TCP socket not connected")
+        waiting: dict[bytes, deque[int]] = {}
+        for index, request in enumerate(requests):
+            waiting.setdefault(frame_key(request), deque()).append(index)
+        results: list[bytes | None] = [None] * len(requests)
+        outstanding = len(requests)
+
+        self._discard_stale()
+        self._expected = None
+        start = time.perf_counter()
+        self._conn.sendall(b"".join(requests))
+        self._wrote(start)
+        while outstanding:
+            try:
+                frame = _read_frame(self._read, self._assembler, self._timeout)
+            except TransportTimeout as exc:
+                logger.warning("Pipelined batch: %d of %d unanswered (%s)",
+                               outstanding, len(requests), exc)
+                break
+            queue = waiting.get(frame_key(frame))
+            if not queue:
+                self.stale_frames += 1
+                logger.debug("Discarding unexpected frame %r", frame[:13])
+                continue
+            results[queue.popleft()] = frame
+            outstanding -= 1
+            self._frame_received()
+        return results
+
+    def _read(self, size: int, remaining: float) -> bytes:
+        self._conn.settimeout(remaining)
+        try:
+            chunk = self._conn.recv(4096)
+        except socket.timeout:
+            return b""
+        if not chunk:
+            raise TransportError("TCP connection closed by peer")
+        if self._awaiting_byte:
+            self._first_byte()
+        return chunk
 
     @property
     def is_connected(self) -> bool:
         return self._conn is not None
 
 
-def create_transport(config: Config) -> SerialTransport | TcpTransport:
+async def _async_read_frame(
+    read: Callable[[int], Awaitable[bytes]],
+    assembler: FrameAssembler,
+    timeout: float,
+) -> bytes:
+    """Async counterpart of ``_read_frame``; ``read(size)`` may return fewer bytes."""
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                frame = assembler.next_frame()
+                if frame is not None:
+                    return frame
+                chunk = await read(assembler.bytes_needed())
+                if not chunk:
+                    raise TransportError("Connection closed by peer")
+                assembler.feed(chunk)
+    except TimeoutError:
+        raise TransportTimeout(
+            f"Timed out after {timeout:.2f} s waiting for a response frame "
+            f"({len(assembler)} bytes buffered)"
+        ) from None
+
+
+class AsyncSerialTransport:
+    """RS232 / USB serial transport on asyncio pipe streams (POSIX only)."""
+
+    def __init__(self, port: str, timeout: float = 2.0) -> None:
+        self._port = port
+        self._timeout = timeout
+        self._conn: serial.Serial | None = None
+        self._reader: asyncio.StreamReader | None = None
+        self._read_transport: asyncio.ReadTransport | None = None
+        self._write_transport: asyncio.WriteTransport | None = None
+
+    async def connect(self) -> None:
+        logger.info("Connecting to serial port %s (async)", self._port)
+        loop = asyncio.get_running_loop()
+        conn = serial.Serial(self._port, timeout=0)
+        reader = asyncio.StreamReader()
+        self._read_transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), conn
+        )
+        self._write_transport, _ = await loop.connect_write_pipe(asyncio.Protocol, conn)
+        self._conn = conn
+        self._reader = reader
+        logger.info("Serial port connected")
+
+    async def disconnect(self) -> None:
+        # Both pipe transports close the underlying port once they are done
+        for pipe_transport in (self._read_transport, self._write_transport):
+            if pipe_transport:
+                pipe_transport.close()
+        self._conn = None
+        self._reader = None
+        self._read_transport = None
+        self._write_transport = None
+
+    async def send(self, data: bytes) -> None:
+        if not self._write_transport:
+            raise TransportError("Serial port not connected")
+        self._write_transport.write(data)
+
+    async def receive(self) -> bytes:
+        if not self._reader:
+            raise TransportError("Serial port not connected")
+        return await _async_read_frame(self._reader.read, FrameAssembler(), self._timeout)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._conn is not None and self._conn.is_open
+
+
+class AsyncTcpTransport:
+    """TCP/IP transport on asyncio streams."""
+
+    def __init__(self, host: str, port: int, timeout: float = 2.0) -> None:
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def connect(self) -> None:
+        logger.info("Connecting to %s:%d (async)", self._host, self._port)
+        try:
+            async with asyncio.timeout(self._timeout):
+                self._reader, self._writer = await asyncio.open_connection(
+                    self._host, self._port
+                )
+        except TimeoutError:
+            raise TransportError(
+                f"Timed out connecting to {self._host}:{self._port}"
+            ) from None
+        logger.info("TCP socket connected")
+
+    async def disconnect(self) -> None:
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = None
+        self._writer = None
+
+    async def send(self, data: bytes) -> None:
+        if not self._writer:
+            raise TransportError("TCP socket not connected")
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def receive(self) -> bytes:
+        if not self._reader:
+            raise TransportError("TCP socket not connected")
+        return await _async_read_frame(self._reader.read, FrameAssembler(), self._timeout)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+
+def create_transport(config: Config | BmsEndpoint) -> SerialTransport | TcpTransport:
     """Factory: return the correct transport based on ``config.connection_type``."""
     if config.connection_type == "Serial":
-        return SerialTransport(config.bms_serial)
-    return TcpTransport(config.bms_ip, config.bms_port)
+        return SerialTransport(config.bms_serial, timeout=config.response_timeout)
+    return TcpTransport(
+        config.bms_ip,
+        config.bms_port,
+        timeout=config.response_timeout,
+        pipeline=config.pipeline,
+    )
+
+
+def create_async_transport(
+    config: Config | BmsEndpoint,
+) -> AsyncSerialTransport | AsyncTcpTransport:
+    """Async counterpart of ``create_transport``."""
+    if config.connection_type == "Serial":
+        return AsyncSerialTransport(config.bms_serial, timeout=config.response_timeout)
+    return AsyncTcpTransport(config.bms_ip, config.bms_port, timeout=config.response_timeout)
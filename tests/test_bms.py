@@ -6,7 +6,8 @@ pre-built response fixtures.  No real hardware or network is required.
 """
 from __future__ import annotations
 
-from unittest.mock import MagicMock
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
@@ -14,6 +15,11 @@ from bmspace.bms import (
     PackAnalogData,
     PackCapacity,
     PackWarnInfo,
+    async_get_analog_data,
+    async_get_pack_capacity,
+    async_get_serial,
+    async_get_version,
+    async_get_warn_info,
     get_analog_data,
     get_pack_capacity,
     get_serial,
@@ -54,6 +60,21 @@ CAPACITY_RESPONSE = b"~25014600400C03E807D007D0FB01\r"
 WARN_RESPONSE = b"~2501460060280001020000020000000000000006000000000000F613\r"
 
 
+def _frame(info: bytes, adr: bytes = b"01") -> bytes:
+    """Wrap an INFO field in a valid response frame from *adr*."""
+    from bmspace.protocol import chksum_calc, lchksum_calc
+
+    lenid = bytes(format(len(info), "03X"), "ASCII")
+    lchksum = bytes(lchksum_calc(lenid), "ASCII")
+    packet = b"~25" + adr + b"4600" + lchksum + lenid + info
+    return packet + bytes(chksum_calc(packet), "ASCII") + b"\r"
+
+
+# One pack record (2 cells, 2 temps) as used in ANALOG_RESPONSE, without the
+# leading DATAFLAG / pack count
+_PACK_RECORD = b"020CE40CEE020BA40B7203E8C80003E80307D0002A07D000"
+
+
 def _mock_transport(response: bytes) -> MagicMock:
     """Return a mock transport that returns *response* from receive()."""
     transport = MagicMock()
@@ -61,6 +82,13 @@ def _mock_transport(response: bytes) -> MagicMock:
     return transport
 
 
+def _mock_async_transport(response: bytes) -> AsyncMock:
+    """Return a mock async transport whose receive() coroutine yields *response*."""
+    transport = AsyncMock()
+    transport.receive.return_value = response
+    return transport
+
+
 def _mock_transport_sequence(*responses: bytes) -> MagicMock:
     """Return a mock transport that cycles through *responses* in order."""
     transport = MagicMock()
@@ -84,6 +112,16 @@ class TestGetVersion:
         get_version(transport)
         transport.send.assert_called_once()
 
+    def test_default_address_is_01(self):
+        transport = _mock_transport(VERSION_RESPONSE)
+        get_version(transport)
+        assert transport.send.call_args.args[0][3:5] == b"01"
+
+    def test_address_is_encoded_in_request(self):
+        transport = _mock_transport(VERSION_RESPONSE)
+        get_version(transport, adr=12)
+        assert transport.send.call_args.args[0][3:5] == b"0C"
+
     def test_raises_on_error_response(self):
         # Craft a response with RTN=04 (CID2 undefined)
         error_resp = b"~250146004" + b"0" + b"000" + b"FFFF\r"
@@ -239,6 +277,29 @@ class TestGetAnalogData:
         packs = get_analog_data(transport)
         assert all(isinstance(p, PackAnalogData) for p in packs)
 
+    def test_multi_pack_with_infoflag(self):
+        info = b"0003" + (_PACK_RECORD + b"FF") * 3
+        packs = get_analog_data(_mock_transport(_frame(info)))
+        assert [p.pack_number for p in packs] == [1, 2, 3]
+        assert all(p.cells == [3300, 3310] for p in packs)
+
+    def test_multi_pack_with_extra_byte_between_packs(self):
+        info = b"0002" + _PACK_RECORD + b"00" + _PACK_RECORD
+        packs = get_analog_data(_mock_transport(_frame(info)))
+        assert len(packs) == 2
+        assert packs[1].temps == [25.0, 20.0]
+
+    def test_cell_count_mismatch_raises(self):
+        other = b"03" + _PACK_RECORD[2:]
+        info = b"0002" + _PACK_RECORD + b"07" + other
+        with pytest.raises(RuntimeError):
+            get_analog_data(_mock_transport(_frame(info)))
+
+    def test_truncated_info_raises_runtime_error(self):
+        info = b"0001" + _PACK_RECORD[:30]
+        with pytest.raises(RuntimeError):
+            get_analog_data(_mock_transport(_frame(info)))
+
 
 # ---------------------------------------------------------------------------
 # get_pack_capacity
@@ -342,3 +403,40 @@ class TestGetWarnInfo:
         transport = _mock_transport(b"GARBAGE\r")
         with pytest.raises(RuntimeError):
             get_warn_info(transport, packs=1)
+
+
+# ---------------------------------------------------------------------------
+# Async commands
+# ---------------------------------------------------------------------------
+
+
+class TestAsyncCommands:
+    def test_version(self):
+        transport = _mock_async_transport(VERSION_RESPONSE)
+        assert asyncio.run(async_get_version(transport)) == "BMS V1.0"
+        transport.send.assert_awaited_once()
+
+    def test_serial(self):
+        transport = _mock_async_transport(SERIAL_RESPONSE)
+        assert asyncio.run(async_get_serial(transport)) == ("BMS001234567", "PCK9876543")
+
+    def test_analog_data_matches_sync(self):
+        async_packs = asyncio.run(
+            async_get_analog_data(_mock_async_transport(ANALOG_RESPONSE))
+        )
+        assert async_packs == get_analog_data(_mock_transport(ANALOG_RESPONSE))
+
+    def test_pack_capacity(self):
+        transport = _mock_async_transport(CAPACITY_RESPONSE)
+        cap = asyncio.run(async_get_pack_capacity(transport))
+        assert cap.soc == pytest.approx(50.0)
+
+    def test_warn_info(self):
+        transport = _mock_async_transport(WARN_RESPONSE)
+        warn = asyncio.run(async_get_warn_info(transport, packs=1))[0]
+        assert warn.charge_fet == 1
+
+    def test_raises_on_protocol_error(self):
+        transport = _mock_async_transport(b"GARBAGE\r")
+        with pytest.raises(RuntimeError):
+            asyncio.run(async_get_version(transport))
@@ -0,0 +1,143 @@
+"""Tests for src/bmspace/bus.py"""
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from bmspace.bms import get_analog_data
+from bmspace.bus import BusScheduler
+from bmspace.session import BmsSession
+from bmspace.transport import TransportTimeout
+
+from .test_bms import ANALOG_RESPONSE
+
+
+def _recording_command(fail: set[int] | None = None):
+    """Return a fake BMS command that records the addresses it was called with."""
+    calls: list[int] = []
+
+    def _command(transport, *args, adr: int):
+        calls.append(adr)
+        if fail and adr in fail:
+            raise RuntimeError(f"no answer from {adr}")
+        return (adr, args)
+
+    return _command, calls
+
+
+def _flaky_once(command):
+    """Wrap *command* so that its first call times out."""
+    calls: list[int] = []
+
+    def _command(transport, *args, adr: int):
+        calls.append(adr)
+        if len(calls) == 1:
+            raise TransportTimeout(f"no answer from {adr}")
+        return command(transport, *args, adr=adr)
+
+    return _command
+
+
+class TestBusScheduler:
+    def test_requires_addresses(self):
+        with pytest.raises(ValueError):
+            BusScheduler(MagicMock(), [])
+
+    def test_call_passes_address_and_args(self):
+        bus = BusScheduler(MagicMock(), [1, 2])
+        command, calls = _recording_command()
+        assert bus.call(command, 2, "x") == (2, ("x",))
+        assert calls == [2]
+
+    def test_poll_returns_results_ordered_by_address(self):
+        bus = BusScheduler(MagicMock(), [1, 2, 3])
+        command, _ = _recording_command()
+        assert [adr for adr, _ in bus.poll(command)] == [1, 2, 3]
+
+    def test_poll_rotates_start_address(self):
+        bus = BusScheduler(MagicMock(), [1, 2, 3])
+        command, calls = _recording_command()
+        bus.poll(command)
+        bus.poll(command)
+        assert calls == [1, 2, 3, 2, 3, 1]
+
+    def test_failed_address_is_skipped(self):
+        bus = BusScheduler(MagicMock(), [1, 2, 3])
+        command, _ = _recording_command(fail={2})
+        assert [adr for adr, _ in bus.poll(command)] == [1, 3]
+
+    def test_undecodable_address_is_skipped(self):
+        bus = BusScheduler(MagicMock(), [1, 2])
+        calls: list[int] = []
+
+        def command(transport, adr: int):
+            calls.append(adr)
+            if adr == 1:
+                raise ValueError("garbled INFO field")
+            return adr
+
+        assert bus.poll(command) == [(2, 2)]
+        assert calls == [1, 2]
+
+    def test_all_addresses_failing_raises(self):
+        bus = BusScheduler(MagicMock(), [1, 2])
+        command, _ = _recording_command(fail={1, 2})
+        with pytest.raises(RuntimeError):
+            bus.poll(command)
+
+    def test_requests_are_sent_to_each_adr(self):
+        transport = MagicMock()
+        transport.receive.return_value = ANALOG_RESPONSE
+        bus = BusScheduler(transport, [1, 2])
+        bus.poll(get_analog_data)
+        sent_adrs = [c.args[0][3:5] for c in transport.send.call_args_list]
+        assert sent_adrs == [b"01", b"02"]
+
+
+class TestPipelinedPoll:
+    def _batch(self, fail: set[int] | None = None):
+        calls: list[list[int]] = []
+
+        def _command(transport, adrs, *args):
+            calls.append(list(adrs))
+            return [
+                (adr, RuntimeError("bad frame") if fail and adr in fail else (adr, args))
+                for adr in adrs
+            ]
+
+        return _command, calls
+
+    def test_batch_used_on_pipelined_transport(self):
+        transport = MagicMock(pipelined=True)
+        bus = BusScheduler(transport, [1, 2, 3])
+        command, sequential = _recording_command()
+        batch, calls = self._batch(fail={2})
+        results = bus.poll(command, "x", batch=batch)
+        assert sequential == [2]
+        assert calls == [[1, 2, 3]]
+        assert [adr for adr, _ in results] == [1, 2, 3]
+
+    def test_batch_ignored_without_pipelining(self):
+        bus = BusScheduler(MagicMock(), [1, 2])
+        command, sequential = _recording_command()
+        batch, calls = self._batch()
+        bus.poll(command, batch=batch)
+        assert calls == []
+        assert sequential == [1, 2]
+
+    def test_batch_failure_is_retried_by_session(self):
+        bus = BusScheduler(MagicMock(pipelined=True), [1, 2])
+        session = BmsSession(MagicMock(), sleep=lambda s: None)
+        command, sequential = _recording_command()
+        flaky = session.retrying(_flaky_once(command))
+        batch, _ = self._batch(fail={2})
+        assert [adr for adr, _ in bus.poll(flaky, batch=batch)] == [1, 2]
+        assert sequential == [2]
+        assert session.retried == 1
+
+    def test_all_failing_in_batch_raises(self):
+        bus = BusScheduler(MagicMock(pipelined=True), [1, 2])
+        batch, _ = self._batch(fail={1, 2})
+        with pytest.raises(RuntimeError):
+            bus.poll(_recording_command(fail={1, 2})[0], batch=batch)
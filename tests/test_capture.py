@@ -0,0 +1,287 @@
+"""
+Tests for src/bmspace/capture.py
+
+Captures are recorded from the bundled simulator, so the replayed frames
+are real protocol traffic.
+"""
+from __future__ import annotations
+
+import gzip
+from unittest.mock import MagicMock
+
+import pytest
+
+from bmspace.bms import get_analog_data, get_version
+from bmspace.capture import (
+    ERROR,
+    RX,
+    TIMEOUT,
+    TX,
+    RecordingTransport,
+    ReplayFinished,
+    ReplayTransport,
+    read_capture,
+)
+from bmspace.config import Config, resolve_endpoints
+from bmspace.poller import BmsPoller
+from bmspace.protocol import build_request
+from bmspace.simulator import SimulatedBms, TcpSimulator
+from bmspace.transport import TcpTransport, TransportError, TransportTimeout
+
+from .test_simulator import _Loopback
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class _Flaky(_Loopback):
+    """Loopback whose receive fails with the queued exceptions first."""
+
+    def __init__(self, bms: SimulatedBms, *failures: Exception) -> None:
+        super().__init__(bms)
+        self._failures = list(failures)
+
+    def receive(self) -> bytes:
+        if self._failures:
+            raise self._failures.pop(0)
+        return super().receive()
+
+
+def _record(path: str, transport, clock: _FakeClock) -> RecordingTransport:
+    return RecordingTransport(transport, path, clock=clock)
+
+
+# ---------------------------------------------------------------------------
+# Capture file
+# ---------------------------------------------------------------------------
+
+
+class TestCaptureFile:
+    @pytest.mark.parametrize("name", ["traffic.bmscap", "traffic.bmscap.gz"])
+    def test_round_trip(self, tmp_path, name):
+        path = str(tmp_path / name)
+        clock = _FakeClock()
+        recording = _record(path, _Loopback(SimulatedBms()), clock)
+        get_version(recording)
+        clock.now = 2.5
+        get_analog_data(recording)
+        recording.close()
+
+        _, flags, records = read_capture(path)
+        records = list(records)
+        assert flags == 0
+        assert [r.kind for r in records] == [TX, RX, TX, RX]
+        assert [r.offset for r in records] == [0.0, 0.0, 2.5, 2.5]
+        assert records[1].data.startswith(b"~25014600")
+        if name.endswith(".gz"):
+            with gzip.open(path) as fh:
+                assert fh.read(4) == b"BMSC"
+
+    def test_truncated_tail_is_ignored(self, tmp_path):
+        path = str(tmp_path / "cut.bmscap")
+        recording = _record(path, _Loopback(SimulatedBms()), _FakeClock())
+        get_version(recording)
+        recording.close()
+        with open(path, "r+b") as fh:
+            fh.truncate(len(fh.read()) - 3)
+        assert [r.kind for r in read_capture(path)[2]] == [TX]
+
+    def test_unclosed_gzip_capture(self, tmp_path):
+        path = str(tmp_path / "unclosed.bmscap.gz")
+        recording = _record(path, _Loopback(SimulatedBms()), _FakeClock())
+        for _ in range(5):
+            get_version(recording)
+        recording._fh.flush()   # on disk, but the gzip stream never ends
+        assert len(list(read_capture(path)[2])) == 10
+
+        replay = ReplayTransport(path, speed=0)
+        replay.connect()
+        for _ in range(5):
+            assert get_version(replay) == "PACE_SIM_V1.0"
+        with pytest.raises(ReplayFinished):
+            get_version(replay)
+
+    def test_not_a_capture(self, tmp_path):
+        path = tmp_path / "other.bin"
+        path.write_bytes(b"not a capture file at all")
+        with pytest.raises(ValueError):
+            read_capture(str(path))
+
+
+# ---------------------------------------------------------------------------
+# RecordingTransport
+# ---------------------------------------------------------------------------
+
+
+class TestRecordingTransport:
+    def test_failures_are_recorded_and_reraised(self, tmp_path):
+        path = str(tmp_path / "flaky.bmscap")
+        inner = _Flaky(SimulatedBms(), TransportTimeout("late"), TransportError("closed by peer"))
+        recording = _record(path, inner, _FakeClock())
+        for exc in (TransportTimeout, TransportError):
+            with pytest.raises(exc):
+                get_version(recording)
+        recording.close()
+        records = list(read_capture(path)[2])
+        assert [r.kind for r in records] == [TX, TIMEOUT, TX, ERROR]
+        assert records[3].data == b"closed by peer"
+
+    def test_delegates_transport_extras(self, tmp_path):
+        inner = _Loopback(SimulatedBms())
+        inner.stale_frames = 4
+        recording = RecordingTransport(inner, str(tmp_path / "x.bmscap"))
+        assert recording.stale_frames == 4
+        assert recording.pipelined is False
+        recording.close()
+
+
+# ---------------------------------------------------------------------------
+# ReplayTransport
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def capture(tmp_path) -> str:
+    """Version at t=0, a timeout at t=1, analog data at t=3."""
+    path = str(tmp_path / "site.bmscap")
+    clock = _FakeClock()
+    flaky = _Flaky(SimulatedBms(packs=2))
+    recording = _record(path, flaky, clock)
+    get_version(recording)
+    clock.now = 1.0
+    flaky._failures.append(TransportTimeout("late"))
+    with pytest.raises(TransportTimeout):
+        get_analog_data(recording)
+    clock.now = 3.0
+    get_analog_data(recording)
+    recording.close()
+    return path
+
+
+class TestReplayTransport:
+    def _replay(self, path: str, speed: float = 1.0) -> tuple[ReplayTransport, _FakeClock]:
+        clock = _FakeClock()
+        replay = ReplayTransport(path, speed=speed, clock=clock, sleep=clock.sleep)
+        replay.connect()
+        return replay, clock
+
+    def test_serves_responses_at_recorded_time(self, capture):
+        replay, clock = self._replay(capture)
+        assert get_version(replay) == "PACE_SIM_V1.0"
+        with pytest.raises(TransportTimeout):
+            get_analog_data(replay)
+        assert clock.now == 1.0
+        assert len(get_analog_data(replay)) == 2
+        assert clock.now == 3.0
+        assert replay.mismatches == 0
+        with pytest.raises(ReplayFinished):
+            get_version(replay)
+
+    def test_accelerated(self, capture):
+        replay, clock = self._replay(capture, speed=100.0)
+        get_version(replay)
+        with pytest.raises(TransportTimeout):
+            get_analog_data(replay)
+        get_analog_data(replay)
+        assert clock.now == pytest.approx(0.03)
+        assert replay.clock() == pytest.approx(3.0)
+
+    def test_unthrottled_uses_virtual_time(self, capture):
+        replay, clock = self._replay(capture, speed=0)
+        get_version(replay)
+        with pytest.raises(TransportTimeout):
+            get_analog_data(replay)
+        get_analog_data(replay)
+        assert clock.now == 0.0
+        assert replay.clock() == 3.0
+        replay.sleep(10.0)
+        assert replay.clock() == 13.0
+
+    def test_request_mismatch_is_counted(self, capture):
+        replay, _ = self._replay(capture, speed=0)
+        replay.send(build_request(cid2=b"42", info=b"FF"))   # recorded: version
+        assert replay.mismatches == 1
+        assert replay.receive().startswith(b"~25014600")
+
+    def test_needs_connect(self, capture):
+        with pytest.raises(TransportError):
+            get_version(ReplayTransport(capture))
+
+    def test_pipelined_batch(self, tmp_path):
+        path = str(tmp_path / "batch.bmscap")
+        with TcpSimulator(SimulatedBms(addresses=(1, 2))) as server:
+            transport = TcpTransport(*server.address, timeout=0.3, pipeline=True)
+            recording = RecordingTransport(transport, path)
+            recording.connect()
+            requests = [build_request(cid2=b"C1", adr=adr) for adr in (b"01", b"03", b"02")]
+            recorded = recording.exchange_batch(requests)
+            recording.disconnect()
+            recording.close()
+        assert recorded[1] is None
+
+        replay, _ = self._replay(path, speed=0)
+        assert replay.pipelined is True
+        assert replay.exchange_batch(requests) == recorded
+
+
+# ---------------------------------------------------------------------------
+# Full poller replay
+# ---------------------------------------------------------------------------
+
+
+class _Stop(Exception):
+    pass
+
+
+def _config(**kwargs) -> Config:
+    return Config(
+        "h", 1, "u", "p", True, "homeassistant", "bmspace", "IP", "127.0.0.1", 5000,
+        "/dev/null", 1, 0,
+        analog_interval=0.05, warn_interval=0.1, capacity_interval=0.1, **kwargs,
+    )
+
+
+def _publisher() -> MagicMock:
+    publisher = MagicMock()
+    publisher.is_connected = True
+    return publisher
+
+
+class TestPollerReplay:
+    def test_replays_recorded_session(self, tmp_path):
+        path = str(tmp_path / "poller.bmscap")
+        with TcpSimulator(SimulatedBms(packs=2, seed=3)) as server:
+            config = _config(capture_path=path)
+            config.bms_port = server.address[1]
+            recorded = _publisher()
+            published: list = []
+
+            def _publish(pack):
+                published.append(pack)
+                if len(published) >= 6:
+                    raise _Stop
+
+            recorded.publish_analog_data.side_effect = _publish
+            poller = BmsPoller(resolve_endpoints(config)[0], config, recorded)
+            with pytest.raises(_Stop):
+                poller.run()
+            poller._transport.disconnect()
+            poller.close()
+
+        replayed = _publisher()
+        config = _config(replay_path=path, replay_speed=0)
+        poller = BmsPoller(resolve_endpoints(config)[0], config, replayed)
+        poller.run()   # returns when the capture is exhausted
+
+        packs = [c.args[0] for c in replayed.publish_analog_data.call_args_list]
+        assert packs[:6] == published
+        assert poller._transport.mismatches == 0
+        replayed.publish_bms_info.assert_called_with("PACE_SIM_V1.0", "SIM01BMS0001", "SIM01PCK0001")
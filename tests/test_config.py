@@ -6,7 +6,9 @@ import tempfile
 import pytest
 import yaml
 
-from bmspace.config import Config, load_config
+from bmspace.config import BmsEndpoint, Config, load_config, resolve_endpoints
+from bmspace.publish_cache import Deadband
+from bmspace.recorder import Retention
 
 
 MINIMAL_OPTIONS = {
@@ -54,6 +56,8 @@ class TestLoadConfigFromJson:
         assert cfg.bms_serial == "/dev/ttyUSB0"
         assert cfg.scan_interval == 5
         assert cfg.debug_output == 0
+        assert cfg.response_timeout == 2.0
+        assert cfg.history_size == 0
 
     def test_returns_config_dataclass(self, tmp_path):
         p = tmp_path / "options.json"
@@ -126,3 +130,163 @@ class TestLoadConfigDefaults:
         assert cfg.bms_port == 5000
         assert cfg.bms_serial == "/dev/ttyUSB0"
         assert cfg.debug_output == 0
+        assert cfg.response_timeout == 2.0
+
+
+class TestBmsEndpoints:
+    def test_no_endpoints_resolves_to_single_legacy_endpoint(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.bms_endpoints == []
+        (endpoint,) = resolve_endpoints(cfg)
+        assert endpoint.connection_type == "IP"
+        assert endpoint.bms_ip == "192.168.1.20"
+        assert endpoint.base_topic == "bmspace"
+
+    def test_endpoints_are_parsed(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, bms_endpoints=[
+            {"name": "bank1", "bms_ip": "10.0.0.1", "bms_port": "5001"},
+            {"name": "bank2", "connection_type": "Serial",
+             "bms_serial": "/dev/ttyUSB1", "base_topic": "site/bank2"},
+        ])
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        bank1, bank2 = resolve_endpoints(cfg)
+        assert isinstance(bank1, BmsEndpoint)
+        assert bank1.connection_type == "IP"
+        assert bank1.bms_port == 5001
+        assert bank1.base_topic == "bmspace/bank1"
+        assert bank2.connection_type == "Serial"
+        assert bank2.bms_serial == "/dev/ttyUSB1"
+        assert bank2.base_topic == "site/bank2"
+
+    def test_endpoint_inherits_response_timeout(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, response_timeout=0.5,
+                    bms_endpoints=[{"name": "bank1", "bms_ip": "10.0.0.1"}])
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.bms_endpoints[0].response_timeout == 0.5
+
+    def test_endpoint_inherits_packs_to_read(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, packs_to_read=4, bms_endpoints=[
+            {"name": "bank1"}, {"name": "bank2", "packs_to_read": 0},
+        ])
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert [e.packs_to_read for e in cfg.bms_endpoints] == [4, 0]
+
+
+class TestPollingIntervals:
+    def test_intervals_default_to_scan_interval(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.analog_interval == 5
+        assert cfg.warn_interval == 5
+        assert cfg.capacity_interval == 5
+
+    def test_intervals_can_be_set_per_command(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, analog_interval=1, warn_interval="5",
+                    capacity_interval=60)
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.analog_interval == 1.0
+        assert cfg.warn_interval == 5.0
+        assert cfg.capacity_interval == 60.0
+
+
+class TestPublishOnChange:
+    def test_disabled_by_default(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.publish_on_change is False
+        assert cfg.deadbands == {}
+
+    def test_deadbands_are_parsed(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, publish_on_change=True, publish_max_age=60,
+                    deadbands={"cell": 2, "temp": {"absolute": 0.1},
+                               "soc": {"relative": 0.01}})
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.publish_on_change is True
+        assert cfg.publish_max_age == 60.0
+        assert cfg.deadbands["cell"] == Deadband(absolute=2.0)
+        assert cfg.deadbands["temp"] == Deadband(absolute=0.1)
+        assert cfg.deadbands["soc"] == Deadband(relative=0.01)
+
+
+class TestRecorder:
+    def test_disabled_by_default(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.recorder_path == ""
+        assert cfg.recorder_retention == Retention()
+
+    def test_retention_in_days(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, recorder_path="/data/bms.db",
+                    recorder_retention_days={"raw": 1, "hour": 730})
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.recorder_path == "/data/bms.db"
+        assert cfg.recorder_retention == Retention(
+            raw=86400.0, minute=Retention().minute, hour=730 * 86400.0
+        )
+
+
+class TestCapture:
+    def test_disabled_by_default(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        (endpoint,) = resolve_endpoints(cfg)
+        assert endpoint.capture_path == endpoint.replay_path == ""
+        assert cfg.replay_speed == 1.0
+
+    def test_paths_are_per_endpoint(self, tmp_path):
+        p = tmp_path / "options.json"
+        opts = dict(MINIMAL_OPTIONS, replay_speed=100, capture_path="/data/all.bmscap",
+                    bms_endpoints=[
+                        {"name": "bank1", "replay_path": "/data/bank1.bmscap.gz"},
+                        {"name": "bank2"},
+                    ])
+        _write_json(str(p), opts)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        bank1, bank2 = resolve_endpoints(cfg)
+        assert cfg.replay_speed == 100.0
+        assert bank1.replay_path == "/data/bank1.bmscap.gz"
+        assert bank2.replay_path == bank2.capture_path == ""
+
+
+class TestMetrics:
+    def test_disabled_by_default(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.metrics_port == 0
+        assert cfg.mqtt_enabled is True
+
+    def test_prometheus_only(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), dict(MINIMAL_OPTIONS, metrics_port="9464", mqtt_enabled=False))
+        cfg = load_config(options_path=str(p), yaml_path="/nonexistent")
+        assert cfg.metrics_port == 9464
+        assert cfg.metrics_host == "0.0.0.0"
+        assert cfg.mqtt_enabled is False
+
+
+class TestDiagnostics:
+    def test_interval(self, tmp_path):
+        p = tmp_path / "options.json"
+        _write_json(str(p), MINIMAL_OPTIONS)
+        assert load_config(options_path=str(p), yaml_path="/nonexistent").diagnostics_interval == 0.0
+        _write_json(str(p), dict(MINIMAL_OPTIONS, diagnostics_interval="60"))
+        assert load_config(options_path=str(p), yaml_path="/nonexistent").diagnostics_interval == 60.0
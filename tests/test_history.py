@@ -0,0 +1,135 @@
+"""Tests for src/bmspace/history.py"""
+from __future__ import annotations
+
+import pytest
+
+from bmspace.bms import PackAnalogData
+from bmspace.history import SCALAR_METRICS, History, PackSeries, WindowStats, pack_metrics
+
+
+def _pack(pack_number: int = 1, v_pack: float = 52.0, cells=(3300, 3310), temps=(25.0,)):
+    return PackAnalogData(
+        pack_number=pack_number, cells=list(cells), temps=list(temps), v_pack=v_pack
+    )
+
+
+# ---------------------------------------------------------------------------
+# PackSeries
+# ---------------------------------------------------------------------------
+
+
+class TestPackSeries:
+    def test_requires_positive_capacity(self):
+        with pytest.raises(ValueError):
+            PackSeries(0, ["a"])
+
+    def test_append_and_read_back(self):
+        series = PackSeries(4, ["a", "b"])
+        series.append(1.0, [10, 20])
+        series.append(2.0, [11, 21])
+        assert len(series) == 2
+        assert series.values("a") == [10, 11]
+        assert series.timestamps() == [1.0, 2.0]
+        assert series.latest("b") == (2.0, 21)
+
+    def test_wraps_and_keeps_newest(self):
+        series = PackSeries(3, ["a"])
+        for t in range(1, 6):
+            series.append(float(t), [t * 10])
+        assert len(series) == 3
+        assert series.values("a") == [30, 40, 50]
+        assert series.timestamps() == [3.0, 4.0, 5.0]
+
+    def test_row_width_checked(self):
+        with pytest.raises(ValueError):
+            PackSeries(2, ["a", "b"]).append(0.0, [1])
+
+    def test_stats_over_window_across_wrap(self):
+        series = PackSeries(4, ["a"])
+        for t, v in enumerate([5, 1, 7, 3, 9, 2], start=1):
+            series.append(float(t), [v])
+        # Buffer holds t=3..6 → 7, 3, 9, 2
+        assert series.stats("a", 4.0) == WindowStats(count=3, min=2, max=9, mean=14 / 3)
+        assert series.stats("a", 0.0).count == 4
+        assert series.stats("a", 7.0) is None
+
+    def test_timestamps_stay_sorted_when_clock_steps_back(self):
+        series = PackSeries(4, ["a"])
+        series.append(10.0, [1])
+        series.append(5.0, [2])
+        assert series.timestamps() == [10.0, 10.0]
+
+    def test_empty(self):
+        series = PackSeries(2, ["a"])
+        assert series.latest("a") is None
+        assert series.stats("a", 0.0) is None
+        assert series.values("a") == []
+
+
+# ---------------------------------------------------------------------------
+# History
+# ---------------------------------------------------------------------------
+
+
+class TestHistory:
+    def test_metric_names(self):
+        names = pack_metrics(2, 1)
+        assert names[: len(SCALAR_METRICS)] == SCALAR_METRICS
+        assert names[len(SCALAR_METRICS):] == ("cell_1", "cell_2", "temp_1")
+
+    def test_records_every_pack(self):
+        history = History(10, clock=lambda: 100.0)
+        history.record([_pack(1, 52.0), _pack(2, 53.0)])
+        assert history.packs == [1, 2]
+        assert history.latest(2, "v_pack") == (100.0, 53.0)
+        assert history.latest(1, "cell_2") == (100.0, 3310)
+        assert history.latest(1, "temp_1") == (100.0, 25.0)
+
+    def test_window(self):
+        now = [0.0]
+        history = History(100, clock=lambda: now[0])
+        for t, v in enumerate([50.0, 51.0, 52.0, 53.0]):
+            now[0] = float(t * 10)
+            history.record([_pack(v_pack=v)])
+        stats = history.window(1, "v_pack", 15)   # t = 15..30
+        assert (stats.count, stats.min, stats.max, stats.mean) == (2, 52.0, 53.0, 52.5)
+
+    def test_unknown_pack_and_metric(self):
+        history = History(10, clock=lambda: 0.0)
+        assert history.window(1, "v_pack", 60) is None
+        history.record([_pack()])
+        with pytest.raises(KeyError):
+            history.window(1, "cell_9", 60)
+
+    def test_layout_change_starts_new_series(self):
+        history = History(10, clock=lambda: 0.0)
+        history.record([_pack(cells=(3300, 3310))])
+        history.record([_pack(cells=(3300, 3310, 3320))])
+        series = history.series(1)
+        assert len(series) == 1
+        assert "cell_3" in series.metrics
+
+    def test_cells_and_temps_are_stored_compactly(self):
+        history = History(10, clock=lambda: 0.0)
+        history.record([_pack(cells=(3300, 3310), temps=(25.0,))])
+        history.record([_pack(cells=(3302, 3311), temps=(-12.3,))])
+        series = history.series(1)
+        codes = {name: column.typecode for name, (column, _) in series._by_name.items()}
+        assert (codes["cell_1"], codes["temp_1"], codes["v_pack"]) == ("H", "h", "d")
+        assert series.values("temp_1") == [25.0, -12.3]
+        assert series.values("cell_1") == [3300, 3302]
+        stats = history.window(1, "temp_1", 60)
+        assert (stats.min, stats.max) == (-12.3, 25.0)
+
+    def test_out_of_range_readings_saturate(self):
+        history = History(10, clock=lambda: 0.0)
+        history.record([_pack(temps=(25.0,))])
+        history.record([_pack(temps=(6280.5,))])
+        history.record([_pack(temps=(float("nan"),))])
+        series = history.series(1)
+        assert series.values("temp_1") == [25.0, 3276.7, -3276.8]
+        assert series.values("cell_2") == [3310, 3310, 3310]
+
+    def test_requires_positive_capacity(self):
+        with pytest.raises(ValueError):
+            History(0)
@@ -0,0 +1,161 @@
+"""
+Tests for src/bmspace/metrics.py
+"""
+from __future__ import annotations
+
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+
+from bmspace.bms import PackAnalogData, PackCapacity, PackWarnInfo
+from bmspace.config import Config, resolve_endpoints
+from bmspace.metrics import MetricsServer, MetricsStore, publisher_samples
+from bmspace.poller import BmsPoller
+from bmspace.publish_queue import PublishQueue, QueuedMessage
+
+
+def _pack(number: int = 1) -> PackAnalogData:
+    return PackAnalogData(
+        pack_number=number, cells=[3300, 3310], temps=[25.0, 20.5], i_pack=-10.5,
+        v_pack=6.61, i_remain_cap=50000, i_full_cap=100000, i_design_cap=100000,
+        soc=50.0, soh=100.0, cycles=42, cells_max_diff=10,
+    )
+
+
+def _warn(number: int = 1, warnings: str = "") -> PackWarnInfo:
+    return PackWarnInfo(
+        pack_number=number, warnings=warnings, balancing1="00000011", balancing2="10000000",
+        prot_short_circuit=0, prot_discharge_current=0, prot_charge_current=0, fully=1,
+        current_limit=0, charge_fet=1, discharge_fet=1, pack_indicate=0, reverse=0,
+        ac_in=0, heart=0,
+    )
+
+
+def _lines(store: MetricsStore) -> list[str]:
+    return store.render().decode("utf-8").splitlines()
+
+
+# ---------------------------------------------------------------------------
+# MetricsStore
+# ---------------------------------------------------------------------------
+
+
+class TestMetricsStore:
+    def test_empty(self):
+        assert MetricsStore().render() == b"\n"
+
+    def test_analog_fields_in_base_units(self):
+        store = MetricsStore(clock=lambda: 1700000000.0)
+        store.update_analog("bank1", [_pack()])
+        lines = _lines(store)
+        assert 'bms_cell_voltage_volts{endpoint="bank1",pack="1",cell="2"} 3.31' in lines
+        assert 'bms_temperature_celsius{endpoint="bank1",pack="1",sensor="2"} 20.5' in lines
+        assert 'bms_pack_current_amperes{endpoint="bank1",pack="1"} -10.5' in lines
+        assert 'bms_pack_remaining_capacity_ampere_hours{endpoint="bank1",pack="1"} 50.0' in lines
+        assert 'bms_pack_cell_voltage_spread_volts{endpoint="bank1",pack="1"} 0.01' in lines
+        assert 'bms_last_poll_timestamp_seconds{endpoint="bank1"} 1700000000.0' in lines
+
+    def test_capacity_and_warn(self):
+        store = MetricsStore()
+        store.update_capacity("bank1", PackCapacity(10000, 20000, 20000, 50.0, 100.0))
+        store.update_warn("bank1", [_warn(warnings="cell 1 above upper limit, temp 2 below lower limit")])
+        lines = _lines(store)
+        assert 'bms_capacity_full_ampere_hours{endpoint="bank1"} 20.0' in lines
+        assert 'bms_pack_warnings{endpoint="bank1",pack="1"} 2.0' in lines
+        assert 'bms_pack_balancing{endpoint="bank1",pack="1",bank="1"} 3.0' in lines
+        assert 'bms_pack_state{endpoint="bank1",pack="1",flag="charge_fet"} 1.0' in lines
+        assert 'bms_pack_state{endpoint="bank1",pack="1",flag="heart"} 0.0' in lines
+
+    def test_families_are_grouped_across_endpoints(self):
+        store = MetricsStore()
+        store.update_analog("bank1", [_pack()])
+        store.update_analog("bank2", [_pack(), _pack(2)])
+        lines = _lines(store)
+        assert lines.count("# TYPE bms_pack_voltage_volts gauge") == 1
+        start = lines.index("# TYPE bms_pack_voltage_volts gauge")
+        assert [line.split("{")[0] for line in lines[start + 1:start + 4]] == [
+            "bms_pack_voltage_volts"] * 3
+
+    def test_update_replaces_previous_poll(self):
+        store = MetricsStore()
+        store.update_analog("bank1", [_pack(), _pack(2)])
+        store.update_analog("bank1", [_pack()])
+        assert not any('pack="2"' in line for line in _lines(store))
+
+    def test_label_values_are_escaped(self):
+        store = MetricsStore()
+        store.update_identity("bank1", 'V1 "beta"\\x', "SN1", "PK1")
+        assert 'bms_info{endpoint="bank1",version="V1 \\"beta\\"\\\\x",bms_sn="SN1",pack_sn="PK1"} 1.0' \
+            in _lines(store)
+
+    def test_collectors_run_at_scrape_time(self):
+        store = MetricsStore()
+        retried = [0]
+        store.add_collector(lambda: [("bmspace_session_retries_total", {"endpoint": "a"}, retried[0])])
+        assert 'bmspace_session_retries_total{endpoint="a"} 0.0' in _lines(store)
+        retried[0] = 3
+        assert "# TYPE bmspace_session_retries_total counter" in _lines(store)
+        assert 'bmspace_session_retries_total{endpoint="a"} 3.0' in _lines(store)
+
+    def test_failing_collector_is_skipped(self):
+        store = MetricsStore()
+        store.add_collector(lambda: 1 / 0)
+        store.update_capacity("bank1", PackCapacity(1, 2, 2, 50.0, 100.0))
+        assert any(line.startswith("bms_capacity_soc_percent") for line in _lines(store))
+
+    def test_publisher_samples(self):
+        queue = PublishQueue(1)
+        queue.put(QueuedMessage("t", "1"))
+        queue.put(QueuedMessage("t", "2"))
+        publisher = MagicMock(publish_queue=queue, outbox=None)
+        samples = {name: value for name, _, value in publisher_samples(publisher)}
+        assert samples["bmspace_publish_queue_depth"] == 1
+        assert samples["bmspace_publish_queue_dropped_total"] == 1
+        assert "bmspace_outbox_messages" not in samples
+
+
+# ---------------------------------------------------------------------------
+# Poller integration
+# ---------------------------------------------------------------------------
+
+
+class TestPollerMetrics:
+    def test_link_counters(self):
+        config = Config("h", 1, "u", "p", True, "homeassistant", "bmspace", "IP",
+                        "127.0.0.1", 5000, "/dev/null", 1, 0)
+        store = MetricsStore()
+        BmsPoller(resolve_endpoints(config)[0], config, MagicMock(), metrics=store)
+        lines = _lines(store)
+        assert 'bmspace_transport_stale_frames_total{endpoint="bms"} 0.0' in lines
+        assert 'bmspace_session_retries_total{endpoint="bms"} 0.0' in lines
+        assert 'bmspace_pacer_gap_seconds{endpoint="bms"} 0.0' in lines
+
+
+# ---------------------------------------------------------------------------
+# MetricsServer
+# ---------------------------------------------------------------------------
+
+
+class TestMetricsServer:
+    @pytest.fixture
+    def server(self):
+        store = MetricsStore()
+        store.update_analog("bank1", [_pack()])
+        server = MetricsServer(store, "127.0.0.1", 0).start()
+        yield server
+        server.close()
+
+    def test_scrape(self, server):
+        host, port = server.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=2) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode("utf-8")
+        assert 'bms_pack_voltage_volts{endpoint="bank1",pack="1"} 6.61' in body
+
+    def test_unknown_path(self, server):
+        host, port = server.address
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(f"http://{host}:{port}/", timeout=2)
+        assert exc_info.value.code == 404
@@ -0,0 +1,400 @@
+"""
+Tests for src/bmspace/mqtt_client.py
+
+The paho client is replaced with a mock, so no broker is required.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import replace
+from unittest.mock import MagicMock, patch
+
+from bmspace.bms import PackAnalogData, PackWarnInfo
+from bmspace.config import Config
+from bmspace.mqtt_client import MqttPublisher, NullPublisher
+from bmspace.publish_cache import Deadband
+
+CONFIG = Config(
+    mqtt_host="localhost",
+    mqtt_port=1883,
+    mqtt_user="user",
+    mqtt_password="secret",
+    mqtt_ha_discovery=True,
+    mqtt_ha_discovery_topic="homeassistant",
+    mqtt_base_topic="bmspace",
+    connection_type="IP",
+    bms_ip="127.0.0.1",
+    bms_port=5000,
+    bms_serial="/dev/ttyUSB0",
+    scan_interval=5,
+    debug_output=0,
+)
+
+PACK = PackAnalogData(
+    pack_number=1, cells=[3300, 3310], temps=[25.0, 20.0], i_pack=10.0,
+    v_pack=51.2, i_remain_cap=10000, i_full_cap=20000, i_design_cap=20000,
+    soc=50.0, soh=100.0, cycles=42, cells_max_diff=10,
+)
+
+WARN = PackWarnInfo(
+    pack_number=1, warnings="", balancing1="00000000", balancing2="00000000",
+    prot_short_circuit=0, prot_discharge_current=0, prot_charge_current=0,
+    fully=0, current_limit=0, charge_fet=1, discharge_fet=1, pack_indicate=0,
+    reverse=0, ac_in=0, heart=0,
+)
+
+
+def _publisher(config: Config = CONFIG) -> MqttPublisher:
+    publisher = MqttPublisher(config)
+    publisher._client = MagicMock()
+    return publisher
+
+
+def _published(publisher: MqttPublisher) -> dict[str, str]:
+    return {c.args[0]: c.args[1] for c in publisher._client.publish.call_args_list}
+
+
+class TestPublishAnalogData:
+    def test_topics_and_values(self):
+        publisher = _publisher()
+        publisher.publish_analog_data(PACK)
+        sent = _published(publisher)
+        assert sent["bmspace/pack_1/v_cells/cell_2"] == "3310"
+        assert sent["bmspace/pack_1/temps/temp_1"] == "25.0"
+        assert sent["bmspace/pack_1/soc"] == "50.0"
+
+    def test_every_cycle_is_published_by_default(self):
+        publisher = _publisher()
+        publisher.publish_analog_data(PACK)
+        first = publisher._client.publish.call_count
+        publisher.publish_analog_data(PACK)
+        assert publisher._client.publish.call_count == 2 * first
+
+
+class TestPublishOnChange:
+    def test_unchanged_values_are_suppressed(self):
+        publisher = _publisher(replace(CONFIG, publish_on_change=True))
+        publisher.publish_analog_data(PACK)
+        publisher._client.publish.reset_mock()
+        publisher.publish_analog_data(PACK)
+        publisher._client.publish.assert_not_called()
+
+    def test_deadband_suppresses_small_cell_changes(self):
+        config = replace(CONFIG, publish_on_change=True,
+                         deadbands={"cell": Deadband(absolute=2)})
+        publisher = _publisher(config)
+        publisher.publish_analog_data(PACK)
+        publisher._client.publish.reset_mock()
+        publisher.publish_analog_data(replace(PACK, cells=[3301, 3320]))
+        sent = _published(publisher)
+        assert "bmspace/pack_1/v_cells/cell_1" not in sent
+        assert sent["bmspace/pack_1/v_cells/cell_2"] == "3320"
+
+    def test_reconnect_republishes_everything(self):
+        publisher = _publisher(replace(CONFIG, publish_on_change=True))
+        publisher.publish_analog_data(PACK)
+        publisher._on_connect(None, None, None, 0, None)
+        publisher._client.publish.reset_mock()
+        publisher.publish_analog_data(PACK)
+        assert publisher._client.publish.call_count > 0
+
+
+class TestForBaseTopic:
+    def test_same_topic_returns_self(self):
+        publisher = _publisher()
+        assert publisher.for_base_topic("bmspace") is publisher
+
+    def test_view_shares_client_and_connection_state(self):
+        publisher = _publisher()
+        view = publisher.for_base_topic("site/bank2")
+        view.publish_availability(online=True)
+        assert "site/bank2/availability" in _published(publisher)
+        publisher._on_connect(None, None, None, 0, None)
+        assert view.is_connected
+
+
+class TestJsonMode:
+    def test_one_document_per_pack(self):
+        publisher = _publisher(replace(CONFIG, publish_mode="json"))
+        publisher.publish_analog_data(PACK)
+        sent = _published(publisher)
+        assert list(sent) == ["bmspace/pack_1/state"]
+        state = json.loads(sent["bmspace/pack_1/state"])
+        assert state["cells"] == [3300, 3310]
+        assert state["soc"] == 50.0
+
+    def test_warn_fields_are_merged_into_pack_document(self):
+        publisher = _publisher(replace(CONFIG, publish_mode="json"))
+        publisher.publish_analog_data(PACK)
+        publisher.publish_warn_info(WARN)
+        state = json.loads(_published(publisher)["bmspace/pack_1/state"])
+        assert state["v_pack"] == 51.2
+        assert state["charge_fet"] == 1
+
+    def test_discovery_uses_value_templates(self):
+        publisher = _publisher(replace(CONFIG, publish_mode="json"))
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        configs = {t: json.loads(p) for t, p in _published(publisher).items()}
+        cell2 = configs["homeassistant/sensor/BMS-SN1/Pack_1_Cell_2_Voltage/config"]
+        assert cell2["state_topic"] == "bmspace/pack_1/state"
+        assert cell2["value_template"] == "{{ value_json.cells[1] }}"
+        fet = configs["homeassistant/binary_sensor/BMS-SN1/Pack_1_Charge_FET/config"]
+        assert fet["value_template"] == "{{ value_json.charge_fet }}"
+        total = configs["homeassistant/sensor/BMS-SN1/Pack_State_of_Charge/config"]
+        assert total["state_topic"] == "bmspace/pack_soc"
+        assert "value_template" not in total
+
+    def test_topics_mode_discovery_has_no_templates(self):
+        publisher = _publisher()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        configs = {t: json.loads(p) for t, p in _published(publisher).items()}
+        cell2 = configs["homeassistant/sensor/BMS-SN1/Pack_1_Cell_2_Voltage/config"]
+        assert cell2["state_topic"] == "bmspace/pack_1/v_cells/cell_2"
+        assert "value_template" not in cell2
+
+
+class TestPrecompiledTables:
+    def test_pack_topics_are_reused_while_layout_is_stable(self):
+        publisher = _publisher()
+        publisher.publish_analog_data(PACK)
+        topics = publisher._topics_for(1)
+        publisher.publish_analog_data(PACK)
+        publisher.publish_warn_info(WARN)
+        assert publisher._topics_for(1) is topics
+
+    def test_pack_topics_are_rebuilt_when_cell_count_changes(self):
+        publisher = _publisher()
+        publisher.publish_analog_data(PACK)
+        publisher.publish_analog_data(replace(PACK, cells=[3300, 3310, 3320]))
+        assert "bmspace/pack_1/v_cells/cell_3" in _published(publisher)
+
+    def test_discovery_payloads_are_built_once_per_layout(self):
+        publisher = _publisher()
+        with patch.object(publisher, "_build_discovery",
+                          wraps=publisher._build_discovery) as build:
+            publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+            publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+            assert build.call_count == 1
+            publisher.publish_ha_discovery("SN1", "V1", packs=2, cells=2, temps=2)
+            assert build.call_count == 2
+
+
+    def test_view_has_its_own_topic_tables(self):
+        publisher = _publisher()
+        view = publisher.for_base_topic("site/bank2")
+        view.publish_analog_data(PACK)
+        assert "site/bank2/pack_1/soc" in _published(publisher)
+        assert "bmspace/pack_1/soc" not in _published(publisher)
+
+
+class TestDiscoveryDiffing:
+    def test_disabled_discovery_is_silent(self, caplog):
+        publisher = _publisher(replace(CONFIG, mqtt_ha_discovery=False))
+        with caplog.at_level("INFO", logger="bmspace.mqtt_client"):
+            for _ in range(3):
+                publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        assert not caplog.records
+        publisher._client.publish.assert_not_called()
+
+    def test_unchanged_layout_publishes_nothing(self):
+        publisher = _publisher()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        publisher._client.publish.reset_mock()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        publisher._client.publish.assert_not_called()
+
+    def test_only_new_entities_are_published(self):
+        publisher = _publisher()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        publisher._client.publish.reset_mock()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=3, temps=2)
+        assert list(_published(publisher)) == [
+            "homeassistant/sensor/BMS-SN1/Pack_1_Cell_3_Voltage/config"
+        ]
+
+    def test_removed_pack_entities_are_deleted(self):
+        publisher = _publisher()
+        publisher.publish_ha_discovery("SN1", "V1", packs=2, cells=2, temps=2)
+        publisher._client.publish.reset_mock()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        sent = _published(publisher)
+        assert sent
+        assert all(topic.split("/")[3].startswith("Pack_2_") for topic in sent)
+        assert set(sent.values()) == {""}
+
+    def test_changed_payload_is_republished(self):
+        publisher = _publisher()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        count = publisher._client.publish.call_count
+        publisher._client.publish.reset_mock()
+        publisher.publish_ha_discovery("SN1", "V2", packs=1, cells=2, temps=2)
+        assert publisher._client.publish.call_count == count
+
+    def test_ha_birth_message_resends_everything(self):
+        publisher = _publisher()
+        view = publisher.for_base_topic("site/bank2")
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        view.publish_ha_discovery("SN2", "V1", packs=1, cells=2, temps=2)
+        count = publisher._client.publish.call_count
+        publisher._client.publish.reset_mock()
+        message = MagicMock(topic="homeassistant/status", payload=b"online")
+        publisher._on_message(None, None, message)
+        assert publisher._client.publish.call_count == count
+
+    def test_ha_offline_message_is_ignored(self):
+        publisher = _publisher()
+        publisher.publish_ha_discovery("SN1", "V1", packs=1, cells=2, temps=2)
+        publisher._client.publish.reset_mock()
+        message = MagicMock(topic="homeassistant/status", payload=b"offline")
+        publisher._on_message(None, None, message)
+        publisher._client.publish.assert_not_called()
+
+    def test_subscribes_to_ha_status_on_connect(self):
+        publisher = _publisher()
+        publisher._on_connect(None, None, None, 0, None)
+        publisher._client.subscribe.assert_called_once_with("homeassistant/status")
+
+
+# ---------------------------------------------------------------------------
+# Store and forward
+# ---------------------------------------------------------------------------
+
+
+class TestOutbox:
+    def _publisher(self, tmp_path, **kwargs) -> MqttPublisher:
+        return _publisher(replace(CONFIG, outbox_dir=str(tmp_path), **kwargs))
+
+    def test_disabled_by_default(self):
+        assert not _publisher().buffers_offline
+
+    def test_live_messages_bypass_outbox(self, tmp_path):
+        publisher = self._publisher(tmp_path)
+        publisher._connected = True
+        publisher.publish_analog_data(PACK)
+        assert len(publisher._outbox) == 0
+        assert "bmspace/pack_1/soc" in _published(publisher)
+
+    def test_offline_messages_are_buffered(self, tmp_path):
+        publisher = self._publisher(tmp_path)
+        publisher._connected = False
+        publisher.for_base_topic("bmspace/b").publish_analog_data(PACK)
+        publisher._client.publish.assert_not_called()
+        topics = [e.topic for e in publisher._outbox.peek(100)]
+        assert "bmspace/b/pack_1/soc" in topics
+
+    def test_only_sample_data_is_buffered(self, tmp_path):
+        publisher = self._publisher(tmp_path)
+        publisher._connected = False
+        publisher.publish_availability(False)
+        publisher.publish_ha_discovery("SN1", "V1", 1, 2, 2)
+        assert len(publisher._outbox) == 0
+        calls = publisher._client.publish.call_args_list
+        assert calls and all(c.kwargs == {"qos": 1, "retain": True} for c in calls)
+        assert all(c.args[0].startswith("homeassistant/") for c in calls)
+
+    def test_replay_keeps_timestamps_on_replay_topics(self, tmp_path):
+        publisher = self._publisher(tmp_path, outbox_replay_rate=1000.0)
+        publisher._connected = False
+        with patch("bmspace.mqtt_client.time.time", return_value=1234.5):
+            publisher.publish_warn_info(WARN)
+        publisher._connected = True
+        publisher._replay_outbox()
+        sent = _published(publisher)
+        assert json.loads(sent["bmspace/replay/pack_1/balancing1"]) == {
+            "ts": 1234.5, "value": "00000000",
+        }
+        assert "bmspace/pack_1/balancing1" not in sent
+        assert len(publisher._outbox) == 0
+
+    def test_replay_is_rate_limited(self, tmp_path):
+        publisher = self._publisher(tmp_path, outbox_replay_rate=5.0)
+        publisher._connected = False
+        publisher.publish_analog_data(PACK)   # 13 messages
+        publisher._connected = True
+        with patch("bmspace.mqtt_client.time.sleep") as sleep:
+            publisher._replay_outbox()
+        assert publisher._client.publish.call_count == 13
+        assert sleep.call_count == 3
+        assert sum(c.args[0] for c in sleep.call_args_list) > 2.0
+
+    def test_replay_starts_on_connect(self, tmp_path):
+        publisher = self._publisher(tmp_path)
+        publisher._connected = False
+        publisher.publish_warn_info(WARN)
+        with patch.object(MqttPublisher, "_replay_outbox") as replay:
+            publisher._on_connect(None, None, None, 0, None)
+            publisher._replay_thread.join()
+        replay.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# Publish worker
+# ---------------------------------------------------------------------------
+
+
+class TestPublishQueue:
+    def test_disabled_by_default(self):
+        assert _publisher().publish_queue is None
+
+    def test_messages_are_queued_not_published(self):
+        publisher = _publisher(replace(CONFIG, publish_queue_size=100))
+        publisher.publish_analog_data(PACK)
+        publisher._client.publish.assert_not_called()
+        assert publisher.publish_queue.depth == 13
+
+    def test_worker_delivers_in_order(self):
+        publisher = _publisher(replace(CONFIG, publish_queue_size=100))
+        publisher.publish_availability(True)
+        publisher.publish_analog_data(PACK)
+        publisher.publish_queue.close()
+        publisher._run_worker()
+        topics = [c.args[0] for c in publisher._client.publish.call_args_list]
+        assert topics[0] == "bmspace/availability"
+        assert len(topics) == 14
+
+    def test_coalescing_keeps_latest_value(self):
+        publisher = _publisher(
+            replace(CONFIG, publish_queue_size=100, publish_queue_policy="coalesce")
+        )
+        publisher.publish_analog_data(PACK)
+        publisher.publish_analog_data(replace(PACK, soc=51.0))
+        assert publisher.publish_queue.coalesced == 13
+        publisher.publish_queue.close()
+        publisher._run_worker()
+        assert _published(publisher)["bmspace/pack_1/soc"] == "51.0"
+
+    def test_discovery_bypasses_a_full_queue(self):
+        publisher = _publisher(replace(CONFIG, publish_queue_size=5))
+        publisher.publish_analog_data(PACK)   # fills the queue
+        publisher.publish_ha_discovery("SN1", "V1", 1, 2, 2)
+        dropped = publisher.publish_queue.dropped
+        sent = _published(publisher)
+        assert set(publisher._published_discovery) <= set(sent)
+        assert all(c.kwargs["retain"] for c in publisher._client.publish.call_args_list)
+
+        publisher.publish_ha_discovery("SN1", "V1", 1, 1, 2)   # one cell fewer
+        deleted = [t for t, p in _published(publisher).items() if p == ""]
+        assert deleted == ["homeassistant/sensor/BMS-SN1/Pack_1_Cell_2_Voltage/config"]
+        assert publisher.publish_queue.dropped == dropped
+
+    def test_disconnect_flushes_queue(self):
+        publisher = _publisher(replace(CONFIG, publish_queue_size=100))
+        publisher.connect()
+        publisher.publish_analog_data(PACK)
+        publisher.disconnect()
+        sent = _published(publisher)
+        assert sent["bmspace/pack_1/soc"] == "50.0"
+        assert sent["bmspace/availability"] == "offline"
+
+
+class TestNullPublisher:
+    def test_has_the_poller_facing_interface(self):
+        null = NullPublisher()
+        for name in dir(MqttPublisher):
+            if name.startswith("publish_") or name in ("connect", "disconnect", "reconnect",
+                                                      "for_base_topic", "is_connected",
+                                                      "buffers_offline", "outbox"):
+                assert hasattr(null, name), name
+        assert null.for_base_topic("other") is null
+        assert null.is_connected
+        null.publish_analog_data(PackAnalogData(pack_number=1))
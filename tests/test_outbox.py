@@ -0,0 +1,93 @@
+"""Tests for src/bmspace/outbox.py"""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from bmspace.outbox import Outbox, OutboxEntry
+
+
+def _fill(outbox: Outbox, count: int, start: int = 0) -> None:
+    for i in range(start, start + count):
+        outbox.append(float(i), f"bmspace/pack_1/v_cells/cell_{i % 16}", str(3300 + i))
+
+
+class TestOutbox:
+    def test_fifo_round_trip(self, tmp_path):
+        outbox = Outbox(str(tmp_path))
+        outbox.append(1.5, "bmspace/soc", "50.0")
+        outbox.append(2.5, "bmspace/availability", "online")
+        assert len(outbox) == 2
+        assert outbox.peek() == [
+            OutboxEntry(1.5, "bmspace/soc", "50.0"),
+            OutboxEntry(2.5, "bmspace/availability", "online"),
+        ]
+
+    def test_ack_removes_oldest(self, tmp_path):
+        outbox = Outbox(str(tmp_path))
+        _fill(outbox, 5)
+        outbox.ack(outbox.peek(3)[-1])
+        assert len(outbox) == 2
+        assert [e.timestamp for e in outbox.peek()] == [3.0, 4.0]
+
+    def test_spans_segments(self, tmp_path):
+        outbox = Outbox(str(tmp_path), segment_size=256, max_segments=100)
+        _fill(outbox, 50)
+        assert len(os.listdir(tmp_path)) > 1
+        entries = outbox.peek(50)
+        assert [e.timestamp for e in entries] == [float(i) for i in range(50)]
+        outbox.ack(entries[-1])
+        assert len(outbox) == 0
+        assert len(os.listdir(tmp_path)) == 1   # drained segments are deleted
+
+    def test_bounded_drops_oldest_segment(self, tmp_path):
+        outbox = Outbox(str(tmp_path), segment_size=256, max_segments=2)
+        _fill(outbox, 50)
+        assert outbox.dropped > 0
+        assert len(outbox) == 50 - outbox.dropped
+        assert len(os.listdir(tmp_path)) == 2
+        entries = outbox.peek(100)
+        assert entries[-1].timestamp == 49.0
+        assert [e.timestamp for e in entries] == sorted(e.timestamp for e in entries)
+
+    def test_ack_after_eviction_keeps_unreplayed_entries(self, tmp_path):
+        outbox = Outbox(str(tmp_path), segment_size=256, max_segments=2)
+        _fill(outbox, 4)
+        peeked = outbox.peek(2)
+        _fill(outbox, 20, start=4)   # evicts the segment *peeked* came from
+        assert outbox.dropped > 0
+        head = outbox.peek(1)[0]
+        pending = len(outbox)
+        outbox.ack(peeked[-1])
+        assert len(outbox) == pending
+        assert outbox.peek(1) == [head]
+
+    def test_ack_is_idempotent(self, tmp_path):
+        outbox = Outbox(str(tmp_path))
+        _fill(outbox, 5)
+        entries = outbox.peek(2)
+        outbox.ack(entries[-1])
+        outbox.ack(entries[-1])
+        assert [e.timestamp for e in outbox.peek()] == [2.0, 3.0, 4.0]
+
+    def test_survives_reopen(self, tmp_path):
+        outbox = Outbox(str(tmp_path), segment_size=256)
+        _fill(outbox, 10)
+        outbox.ack(outbox.peek(4)[-1])
+        outbox.close()
+        reopened = Outbox(str(tmp_path), segment_size=256)
+        assert len(reopened) == 6
+        assert reopened.peek(1)[0].timestamp == 4.0
+        _fill(reopened, 1, start=10)
+        assert reopened.peek(100)[-1].timestamp == 10.0
+
+    def test_oversized_message_rejected(self, tmp_path):
+        outbox = Outbox(str(tmp_path), segment_size=128)
+        with pytest.raises(ValueError):
+            outbox.append(0.0, "t", "x" * 200)
+
+    def test_unicode(self, tmp_path):
+        outbox = Outbox(str(tmp_path))
+        outbox.append(0.0, "bmspace/pack_1/warnings", "temp 1 °C high")
+        assert outbox.peek()[0].payload == "temp 1 °C high"
@@ -0,0 +1,100 @@
+"""Tests for src/bmspace/pacing.py"""
+from __future__ import annotations
+
+import pytest
+
+from bmspace.pacing import AdaptivePacer
+from bmspace.transport import TransportError, TransportTimeout
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.slept: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _pacer(clock: FakeClock, **kwargs) -> AdaptivePacer:
+    return AdaptivePacer(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+class TestAdaptivePacer:
+    def test_rejects_bad_bounds(self):
+        with pytest.raises(ValueError):
+            AdaptivePacer(min_gap=1.0, max_gap=0.5)
+
+    def test_clean_responses_shrink_gap_additively(self):
+        pacer = _pacer(FakeClock(), min_gap=0.0)
+        pacer.gap = 0.05
+        for _ in range(3):
+            pacer.record(0.1, ok=True)
+        assert pacer.gap == pytest.approx(0.02)
+        for _ in range(10):
+            pacer.record(0.1, ok=True)
+        assert pacer.gap == 0.0
+
+    def test_errors_grow_gap_multiplicatively(self):
+        pacer = _pacer(FakeClock(), error_floor=0.05, max_gap=0.3)
+        pacer.record(0.02, ok=False)
+        assert pacer.gap == 0.05
+        pacer.record(0.02, ok=False)
+        assert pacer.gap == 0.1
+        pacer.record(0.02, ok=False)
+        pacer.record(0.02, ok=False)
+        assert pacer.gap == 0.3
+        assert pacer.errors == 4
+
+    def test_error_gap_scales_with_latency(self):
+        pacer = _pacer(FakeClock(), error_floor=0.01)
+        pacer.record(0.8, ok=False)
+        assert pacer.gap == pytest.approx(0.4)
+
+    def test_wait_enforces_gap_since_last_command(self):
+        clock = FakeClock()
+        pacer = _pacer(clock)
+        pacer.gap = 0.0
+        pacer.record(0.1, ok=False)   # gap -> 0.05
+        clock.now += 0.02
+        pacer.wait()
+        assert clock.slept == [pytest.approx(0.03)]
+        pacer.wait()
+        assert len(clock.slept) == 1
+
+    def test_pace_records_latency_and_outcome(self):
+        clock = FakeClock()
+        pacer = _pacer(clock, alpha=0.5)
+        with pacer.pace():
+            clock.now += 0.2
+        with pytest.raises(TransportTimeout):
+            with pacer.pace():
+                clock.now += 0.4
+                raise TransportTimeout("slow")
+        assert pacer.latency == pytest.approx(0.3)
+        assert pacer.error_rate == pytest.approx(0.5)
+        assert pacer.commands == 2
+
+    def test_pace_batch_records_each_outcome(self):
+        clock = FakeClock()
+        pacer = _pacer(clock)
+
+        def run():
+            clock.now += 0.3
+            return [(1, "ok"), (2, TransportTimeout("lost")), (3, "ok")]
+
+        assert len(pacer.pace_batch(run)) == 3
+        assert pacer.commands == 3
+        assert pacer.errors == 1
+        assert pacer.latency == pytest.approx(0.1)
+
+    def test_link_errors_are_not_counted(self):
+        pacer = _pacer(FakeClock())
+        with pytest.raises(TransportError):
+            with pacer.pace():
+                raise TransportError("closed")
+        assert pacer.commands == 0
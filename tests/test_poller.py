@@ -0,0 +1,78 @@
+"""
+Tests for src/bmspace/poller.py
+"""
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from bmspace.bms import PackAnalogData
+from bmspace.config import Config, resolve_endpoints
+from bmspace.poller import BmsPoller
+
+
+class _Stop(Exception):
+    pass
+
+
+def _config(**kwargs) -> Config:
+    return Config("h", 1, "u", "p", True, "homeassistant", "bmspace", "IP",
+                  "127.0.0.1", 5000, "/dev/null", 1, 0, command_retries=0, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Reconnect
+# ---------------------------------------------------------------------------
+
+
+class TestReconnect:
+    @pytest.mark.parametrize("error", [
+        OSError("bare link error"),
+        ConnectionResetError("reset by peer"),
+        ValueError("garbled INFO field"),
+    ])
+    def test_read_error_forces_reconnect(self, error):
+        transport = MagicMock()
+        transport.connect.side_effect = [None, _Stop]
+        transport.send.side_effect = error
+        publisher = MagicMock(is_connected=True)
+        config = _config()
+        with patch("bmspace.poller.open_transport", return_value=transport):
+            poller = BmsPoller(resolve_endpoints(config)[0], config, publisher)
+        poller._sleep = MagicMock()
+
+        with pytest.raises(_Stop):
+            poller.run()
+
+        assert transport.connect.call_count == 2
+        transport.disconnect.assert_called_once()
+        publisher.publish_availability.assert_called_with(online=False)
+
+
+# ---------------------------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------------------------
+
+
+class TestDiscoveryPackCount:
+    def _poller(self, **kwargs) -> tuple[BmsPoller, MagicMock]:
+        config = _config(**kwargs)
+        publisher = MagicMock(is_connected=True)
+        with patch("bmspace.poller.open_transport", return_value=MagicMock()):
+            poller = BmsPoller(resolve_endpoints(config)[0], config, publisher)
+        return poller, publisher
+
+    def _poll(self, poller: BmsPoller, *numbers: int) -> int:
+        poller._read_analog = lambda: [PackAnalogData(pack_number=n, cells=[3300]) for n in numbers]
+        poller._poll_analog()
+        return poller._publisher.publish_ha_discovery.call_args.args[2]
+
+    def test_bus_mode_uses_configured_addresses(self):
+        poller, _ = self._poller(packs_to_read=3)
+        assert self._poll(poller, 1, 2, 3) == 3
+        assert self._poll(poller, 1, 2) == 3   # ADR 3 missed one poll
+
+    def test_master_mode_follows_the_response(self):
+        poller, _ = self._poller()
+        assert self._poll(poller, 1, 2) == 2
@@ -8,9 +8,13 @@ import pytest
 from bmspace.protocol import (
     SOI,
     EOI,
+    HEADER_LEN,
+    FrameAssembler,
     build_request,
     chksum_calc,
     cid2_return_code,
+    frame_key,
+    frame_length,
     lchksum_calc,
     parse_response,
 )
@@ -66,6 +70,20 @@ class TestLchksumCalc:
             assert len(result) == 1
             assert result in "0123456789ABCDEF"
 
+    def test_matches_bitwise_definition_for_every_lenid(self):
+        for value in range(0x1000):
+            lenid = bytes(format(value, "03X"), "ASCII")
+            total = sum(int(chr(b), 16) for b in lenid) % 16
+            expected = (int(format(total, "04b").translate(str.maketrans("01", "10")), 2) + 1) % 16
+            assert lchksum_calc(lenid) == format(expected, "X")
+
+    def test_lowercase_hex_is_accepted(self):
+        assert lchksum_calc(b"0dc") == lchksum_calc(b"0DC")
+
+    def test_invalid_hex_digit_raises(self):
+        with pytest.raises(ValueError):
+            lchksum_calc(b"0G0")
+
     def test_roundtrip_check(self):
         """The calculated LCHKSUM must match what parse_response expects."""
         for lenid_int in [0, 1, 8, 12, 16, 220, 255]:
@@ -103,6 +121,14 @@ class TestChksumCalc:
         expected = format(int(flipped, 2) + 1, "X")
         assert chksum_calc(data) == expected
 
+    def test_zero_sum_wraps_to_10000(self):
+        # Only the SOI byte: sum=0 → flip=FFFF → +1 = 0x10000
+        assert chksum_calc(b"~") == "10000"
+
+    def test_sum_is_taken_modulo_65536(self):
+        data = b"~" + b"\x01" * 65537   # sum = 65537 → 1
+        assert chksum_calc(data) == "FFFF"
+
     def test_valid_response_packet_passes_parse(self):
         """A packet built with chksum_calc must be accepted by parse_response."""
         info = b"TESTDATA"
@@ -289,3 +315,99 @@ class TestParseResponse:
         assert int(info[6:10], 16) == 3300
         # INFO[10:14] = cell2 = 3310 = 0CEE
         assert int(info[10:14], 16) == 3310
+
+
+# ---------------------------------------------------------------------------
+# frame_length
+# ---------------------------------------------------------------------------
+
+
+class TestFrameLength:
+    def test_length_matches_built_response(self):
+        response = _build_valid_response(b"DEADBEEF")
+        assert frame_length(response[:HEADER_LEN]) == len(response)
+
+    def test_empty_info(self):
+        response = _build_valid_response(b"")
+        assert frame_length(response[:HEADER_LEN]) == len(response)
+
+    def test_short_header_raises(self):
+        with pytest.raises(ValueError):
+            frame_length(b"~2501")
+
+    def test_bad_lchksum_raises(self):
+        response = _build_valid_response(b"DATA")
+        corrupted = response[:9] + b"X" + response[10:]
+        with pytest.raises(ValueError):
+            frame_length(corrupted[:HEADER_LEN])
+
+    def test_non_hex_lenid_raises(self):
+        response = _build_valid_response(b"DATA")
+        corrupted = response[:10] + b"ZZZ" + response[13:]
+        with pytest.raises(ValueError):
+            frame_length(corrupted[:HEADER_LEN])
+
+
+# ---------------------------------------------------------------------------
+# FrameAssembler
+# ---------------------------------------------------------------------------
+
+
+class TestFrameAssembler:
+    def test_whole_frame_in_one_chunk(self):
+        response = _build_valid_response(b"DATA")
+        assembler = FrameAssembler()
+        assembler.feed(response)
+        assert assembler.next_frame() == response
+        assert assembler.next_frame() is None
+
+    def test_frame_fed_byte_by_byte(self):
+        response = _build_valid_response(b"DEADBEEF")
+        assembler = FrameAssembler()
+        for i in range(len(response) - 1):
+            assembler.feed(response[i : i + 1])
+            assert assembler.next_frame() is None
+        assembler.feed(response[-1:])
+        assert assembler.next_frame() == response
+
+    def test_bytes_needed_tracks_header_then_body(self):
+        response = _build_valid_response(b"DEADBEEF")
+        assembler = FrameAssembler()
+        assert assembler.bytes_needed() == 1
+        assembler.feed(response[:5])
+        assert assembler.bytes_needed() == HEADER_LEN - 5
+        assembler.feed(response[5:HEADER_LEN])
+        assert assembler.bytes_needed() == len(response) - HEADER_LEN
+
+    def test_leading_noise_is_discarded(self):
+        response = _build_valid_response(b"DATA")
+        assembler = FrameAssembler()
+        assembler.feed(b"\x00garbage\r" + response)
+        assert assembler.next_frame() == response
+
+    def test_corrupt_header_resynchronises(self):
+        good = _build_valid_response(b"DATA")
+        bad = good[:9] + b"X" + good[10:]
+        assembler = FrameAssembler()
+        assembler.feed(bad + good)
+        assert assembler.next_frame() == good
+
+    def test_two_frames_in_one_chunk(self):
+        first = _build_valid_response(b"AAAA")
+        second = _build_valid_response(b"BBBBBB")
+        assembler = FrameAssembler()
+        assembler.feed(first + second)
+        assert assembler.next_frame() == first
+        assert assembler.next_frame() == second
+
+
+class TestFrameKey:
+    def test_request_and_response_share_key(self):
+        request = build_request(cid2=b"42", info=b"FF", adr=b"03")
+        response = b"~25034600" + _build_valid_response()[9:]
+        assert frame_key(request) == frame_key(response) == b"0346"
+
+    def test_different_addresses_differ(self):
+        assert frame_key(build_request(cid2=b"42", adr=b"01")) != frame_key(
+            build_request(cid2=b"42", adr=b"02")
+        )
@@ -0,0 +1,91 @@
+"""Tests for src/bmspace/publish_cache.py"""
+from __future__ import annotations
+
+import pytest
+
+from bmspace.publish_cache import Deadband, PublishCache, metric_name
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestMetricName:
+    @pytest.mark.parametrize(
+        "subtopic,expected",
+        [
+            ("pack_1/v_cells/cell_12", "cell"),
+            ("pack_2/temps/temp_3", "temp"),
+            ("pack_1/i_pack", "i_pack"),
+            ("pack_soc", "pack_soc"),
+        ],
+    )
+    def test_metric_name(self, subtopic, expected):
+        assert metric_name(subtopic) == expected
+
+
+class TestDeadband:
+    def test_absolute(self):
+        band = Deadband(absolute=2)
+        assert not band.exceeded(3300, 3302)
+        assert band.exceeded(3300, 3303)
+
+    def test_relative(self):
+        band = Deadband(relative=0.01)
+        assert not band.exceeded(100.0, 100.9)
+        assert band.exceeded(100.0, 101.5)
+
+    def test_zero_band_reports_any_change(self):
+        assert Deadband().exceeded(1, 2)
+        assert not Deadband().exceeded(1, 1)
+
+
+class TestPublishCache:
+    def test_first_value_is_published(self):
+        cache = PublishCache()
+        assert cache.should_publish("t", 1)
+
+    def test_repeat_is_suppressed(self):
+        cache = PublishCache()
+        cache.should_publish("t", "online")
+        assert not cache.should_publish("t", "online")
+        assert cache.suppressed == 1
+
+    def test_change_is_published(self):
+        cache = PublishCache()
+        cache.should_publish("t", "00000000")
+        assert cache.should_publish("t", "00000001")
+
+    def test_deadband_applies_per_metric(self):
+        cache = PublishCache({"cell": Deadband(absolute=2)})
+        cache.should_publish("c", 3300, "cell")
+        cache.should_publish("v", 51.2, "v_pack")
+        assert not cache.should_publish("c", 3301, "cell")
+        assert cache.should_publish("v", 51.21, "v_pack")
+
+    def test_small_drift_is_measured_from_last_published_value(self):
+        cache = PublishCache({"cell": Deadband(absolute=2)})
+        cache.should_publish("c", 3300, "cell")
+        assert not cache.should_publish("c", 3301, "cell")
+        assert not cache.should_publish("c", 3302, "cell")
+        assert cache.should_publish("c", 3303, "cell")
+
+    def test_max_age_forces_refresh(self):
+        clock = FakeClock()
+        cache = PublishCache(max_age=60, clock=clock)
+        cache.should_publish("t", 1)
+        clock.now = 59
+        assert not cache.should_publish("t", 1)
+        clock.now = 60
+        assert cache.should_publish("t", 1)
+
+    def test_clear_forgets_everything(self):
+        cache = PublishCache()
+        cache.should_publish("t", 1)
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.should_publish("t", 1)
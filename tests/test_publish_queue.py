@@ -0,0 +1,110 @@
+"""Tests for src/bmspace/publish_queue.py"""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from bmspace.publish_queue import PublishQueue, QueuedMessage
+
+
+def _msg(topic: str, payload: str = "1") -> QueuedMessage:
+    return QueuedMessage(topic, payload)
+
+
+def _drain(queue: PublishQueue) -> list[QueuedMessage]:
+    result = []
+    while (message := queue.get(timeout=0)) is not None:
+        result.append(message)
+    return result
+
+
+class TestPublishQueue:
+    def test_rejects_bad_arguments(self):
+        with pytest.raises(ValueError):
+            PublishQueue(0)
+        with pytest.raises(ValueError):
+            PublishQueue(10, "drop_newest")
+
+    def test_fifo(self):
+        queue = PublishQueue(10)
+        for t in "abc":
+            queue.put(_msg(t))
+        assert queue.depth == 3
+        assert [m.topic for m in _drain(queue)] == ["a", "b", "c"]
+
+    def test_drop_oldest(self):
+        queue = PublishQueue(2, "drop_oldest")
+        for t in "abcd":
+            queue.put(_msg(t))
+        assert [m.topic for m in _drain(queue)] == ["c", "d"]
+        assert queue.dropped == 2
+        assert queue.high_watermark == 2
+
+    def test_coalesce_keeps_position_and_latest_value(self):
+        queue = PublishQueue(10, "coalesce")
+        queue.put(_msg("a", "1"))
+        queue.put(_msg("b", "1"))
+        queue.put(_msg("a", "2"))
+        assert [(m.topic, m.payload) for m in _drain(queue)] == [("a", "2"), ("b", "1")]
+        assert queue.coalesced == 1
+        assert queue.dropped == 0
+
+    def test_coalesce_drops_oldest_topic_when_full(self):
+        queue = PublishQueue(2, "coalesce")
+        for t in "abc":
+            queue.put(_msg(t))
+        assert [m.topic for m in _drain(queue)] == ["b", "c"]
+        assert queue.dropped == 1
+
+    def test_block_waits_for_room(self):
+        queue = PublishQueue(1, "block")
+        queue.put(_msg("a"))
+        done = threading.Event()
+
+        def producer():
+            queue.put(_msg("b"))
+            done.set()
+
+        thread = threading.Thread(target=producer)
+        thread.start()
+        assert not done.wait(0.05)
+        assert queue.get().topic == "a"
+        assert done.wait(1)
+        thread.join()
+        assert queue.get().topic == "b"
+        assert queue.dropped == 0
+
+    def test_get_times_out(self):
+        queue = PublishQueue(1)
+        started = time.monotonic()
+        assert queue.get(timeout=0.05) is None
+        assert time.monotonic() - started >= 0.04
+
+    def test_close_drains_then_stops(self):
+        queue = PublishQueue(5)
+        queue.put(_msg("a"))
+        queue.close()
+        with pytest.raises(RuntimeError):
+            queue.put(_msg("b"))
+        assert queue.get().topic == "a"
+        assert queue.get() is None
+
+    def test_close_releases_blocked_producer(self):
+        queue = PublishQueue(1, "block")
+        queue.put(_msg("a"))
+        errors = []
+
+        def producer():
+            try:
+                queue.put(_msg("b"))
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=producer)
+        thread.start()
+        time.sleep(0.02)
+        queue.close()
+        thread.join(1)
+        assert errors
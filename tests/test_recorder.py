@@ -0,0 +1,131 @@
+"""Tests for src/bmspace/recorder.py"""
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from bmspace.bms import PackAnalogData
+from bmspace.recorder import Retention, SqliteRecorder
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _pack(pack_number: int = 1, v_pack: float = 52.0, cells=(3300, 3310)) -> PackAnalogData:
+    return PackAnalogData(pack_number=pack_number, cells=list(cells), temps=[25.0], v_pack=v_pack)
+
+
+def _recorder(tmp_path, clock, **kwargs) -> SqliteRecorder:
+    kwargs.setdefault("flush_interval", 1000.0)
+    return SqliteRecorder(str(tmp_path / "bms.db"), clock=clock, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+
+class TestRecording:
+    def test_uses_wal(self, tmp_path):
+        recorder = _recorder(tmp_path, FakeClock())
+        mode = recorder._db.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_samples_are_buffered_until_flush(self, tmp_path):
+        clock = FakeClock(100.0)
+        recorder = _recorder(tmp_path, clock)
+        recorder.record("bms", [_pack()])
+        assert recorder.query("bms", 1, "v_pack") == []
+        recorder.flush()
+        assert recorder.query("bms", 1, "v_pack") == [(100.0, 52.0)]
+
+    def test_flushes_after_interval(self, tmp_path):
+        clock = FakeClock(0.0)
+        recorder = _recorder(tmp_path, clock, flush_interval=10.0)
+        recorder.record("bms", [_pack()])
+        clock.now = 10.0
+        recorder.record("bms", [_pack(v_pack=53.0)])
+        assert [v for _, v in recorder.query("bms", 1, "v_pack")] == [52.0, 53.0]
+
+    def test_per_cell_metrics_and_sources(self, tmp_path):
+        clock = FakeClock(5.0)
+        recorder = _recorder(tmp_path, clock)
+        recorder.record("a", [_pack(1), _pack(2, cells=(3400, 3401, 3402))])
+        recorder.record("b", [_pack(1, v_pack=48.0)])
+        recorder.flush()
+        assert recorder.query("a", 2, "cell_3") == [(5.0, 3402.0)]
+        assert recorder.query("a", 1, "cell_3") == []
+        assert recorder.query("b", 1, "v_pack") == [(5.0, 48.0)]
+
+    def test_close_flushes_and_data_survives_reopen(self, tmp_path):
+        clock = FakeClock(7.0)
+        recorder = _recorder(tmp_path, clock)
+        recorder.record("bms", [_pack()])
+        recorder.close()
+        reopened = _recorder(tmp_path, clock)
+        assert reopened.query("bms", 1, "cell_1") == [(7.0, 3300.0)]
+
+    def test_rejects_unknown_tier(self, tmp_path):
+        with pytest.raises(ValueError):
+            _recorder(tmp_path, FakeClock()).query("bms", 1, "v_pack", tier="day")
+
+
+# ---------------------------------------------------------------------------
+# Downsampling and retention
+# ---------------------------------------------------------------------------
+
+
+class TestDownsampling:
+    def test_complete_minutes_are_rolled_up(self, tmp_path):
+        clock = FakeClock(0.0)
+        recorder = _recorder(tmp_path, clock)
+        for t, v in [(0, 50.0), (30, 52.0), (59, 54.0), (61, 40.0)]:
+            recorder.record("bms", [_pack(v_pack=v)], timestamp=float(t))
+        clock.now = 90.0
+        recorder.flush()
+        assert recorder.query("bms", 1, "v_pack", tier="minute") == [(0.0, 52.0)]
+        assert recorder.query("bms", 1, "v_pack", tier="minute", stat="min") == [(0.0, 50.0)]
+        assert recorder.query("bms", 1, "v_pack", tier="minute", stat="max") == [(0.0, 54.0)]
+
+        clock.now = 130.0
+        recorder.flush()
+        assert [ts for ts, _ in recorder.query("bms", 1, "v_pack", tier="minute")] == [0.0, 60.0]
+
+    def test_hours_are_rolled_up_from_minutes(self, tmp_path):
+        clock = FakeClock(0.0)
+        recorder = _recorder(tmp_path, clock)
+        recorder.record("bms", [_pack(v_pack=50.0)], timestamp=10.0)
+        recorder.record("bms", [_pack(v_pack=50.0)], timestamp=20.0)
+        recorder.record("bms", [_pack(v_pack=56.0)], timestamp=1810.0)
+        clock.now = 3700.0
+        recorder.flush()
+        # Count-weighted: (50 + 50 + 56) / 3
+        assert recorder.query("bms", 1, "v_pack", tier="hour") == [(0.0, 52.0)]
+
+    def test_retention_trims_each_tier(self, tmp_path):
+        clock = FakeClock(0.0)
+        recorder = _recorder(tmp_path, clock, retention=Retention(raw=100.0, minute=1000.0))
+        recorder.record("bms", [_pack()], timestamp=0.0)
+        clock.now = 500.0
+        recorder.flush()
+        assert recorder.query("bms", 1, "v_pack") == []
+        assert len(recorder.query("bms", 1, "v_pack", tier="minute")) == 1
+        clock.now = 2000.0
+        recorder.flush()
+        assert recorder.query("bms", 1, "v_pack", tier="minute") == []
+
+    def test_failed_flush_rolls_back(self, tmp_path):
+        clock = FakeClock(0.0)
+        recorder = _recorder(tmp_path, clock)
+        recorder.record("bms", [_pack()])
+        recorder._db.execute("DROP TABLE minute")
+        recorder.flush()   # logged, not raised
+        assert recorder.query("bms", 1, "v_pack") == []
+        with pytest.raises(sqlite3.OperationalError):
+            recorder._db.execute("SELECT * FROM minute")
@@ -0,0 +1,85 @@
+"""Tests for src/bmspace/scheduler.py"""
+from __future__ import annotations
+
+import pytest
+
+from bmspace.scheduler import RateScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _scheduler() -> tuple[RateScheduler, FakeClock, list[str]]:
+    clock = FakeClock()
+    return RateScheduler(clock=clock, sleep=clock.sleep), clock, []
+
+
+class TestRateScheduler:
+    def test_all_tasks_due_immediately_in_registration_order(self):
+        scheduler, _, log = _scheduler()
+        scheduler.add("a", 1, lambda: log.append("a"))
+        scheduler.add("b", 5, lambda: log.append("b"))
+        assert scheduler.run_pending() == 2
+        assert log == ["a", "b"]
+
+    def test_independent_rates(self):
+        scheduler, clock, log = _scheduler()
+        scheduler.add("fast", 1, lambda: log.append("fast"))
+        scheduler.add("slow", 5, lambda: log.append("slow"))
+        for _ in range(10):
+            scheduler.run_pending()
+            scheduler.sleep_until_next()
+        assert log.count("fast") == 10
+        assert log.count("slow") == 2
+        assert clock.now == pytest.approx(10)
+
+    def test_sleeps_only_until_next_due(self):
+        scheduler, clock, _ = _scheduler()
+        scheduler.add("a", 3, lambda: None)
+        scheduler.add("b", 2, lambda: None)
+        scheduler.run_pending()
+        assert scheduler.time_until_next() == pytest.approx(2)
+
+    def test_one_shot_task_runs_once(self):
+        scheduler, clock, log = _scheduler()
+        scheduler.add("once", None, lambda: log.append("once"))
+        scheduler.add("tick", 1, lambda: log.append("tick"))
+        for _ in range(3):
+            scheduler.run_pending()
+            scheduler.sleep_until_next()
+        assert log.count("once") == 1
+        assert [t.name for t in scheduler.tasks] == ["tick"]
+
+    def test_failing_task_stays_due(self):
+        scheduler, _, _ = _scheduler()
+
+        def _boom():
+            raise RuntimeError("read failed")
+
+        scheduler.add("boom", 10, _boom)
+        with pytest.raises(RuntimeError):
+            scheduler.run_pending()
+        assert scheduler.time_until_next() == 0
+
+    def test_missed_slots_are_skipped(self):
+        scheduler, clock, log = _scheduler()
+        scheduler.add("a", 1, lambda: log.append("a"))
+        scheduler.run_pending()
+        clock.now = 10.5
+        scheduler.run_pending()
+        scheduler.run_pending()
+        assert log == ["a", "a"]
+        assert scheduler.time_until_next() == pytest.approx(1)
+
+    def test_rejects_non_positive_period(self):
+        scheduler, _, _ = _scheduler()
+        with pytest.raises(ValueError):
+            scheduler.add("bad", 0, lambda: None)
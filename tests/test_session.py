@@ -0,0 +1,145 @@
+"""Tests for src/bmspace/session.py"""
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from bmspace.bms import get_pack_capacity
+from bmspace.pacing import AdaptivePacer
+from bmspace.session import BmsIdentity, BmsSession
+from bmspace.transport import TransportError, TransportTimeout
+
+from .test_bms import CAPACITY_RESPONSE, SERIAL_RESPONSE, VERSION_RESPONSE
+
+
+def _flaky(failures: list[Exception], result="ok"):
+    """A fake BMS command failing with each of *failures* before succeeding."""
+    calls = []
+
+    def command(transport, *args, **kwargs):
+        calls.append((args, kwargs))
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return result
+
+    return command, calls
+
+
+def _session(retries: int = 2, **kwargs) -> tuple[BmsSession, list[float]]:
+    delays: list[float] = []
+    session = BmsSession(MagicMock(), retries=retries, sleep=delays.append,
+                         jitter=lambda: 0.5, **kwargs)
+    return session, delays
+
+
+class TestRetries:
+    def test_success_needs_no_retry(self):
+        session, delays = _session()
+        command, calls = _flaky([])
+        assert session.call(command, 1, adr=2) == "ok"
+        assert calls == [((1,), {"adr": 2})]
+        assert delays == []
+
+    def test_transient_errors_are_retried(self):
+        session, delays = _session()
+        command, calls = _flaky([RuntimeError("Checksum mismatch"), TransportTimeout("slow")])
+        assert session.call(command) == "ok"
+        assert len(calls) == 3
+        assert session.retried == 2
+
+    def test_decode_errors_are_retried(self):
+        session, _ = _session()
+        command, calls = _flaky([ValueError("invalid literal for int() with base 16")])
+        assert session.call(command) == "ok"
+        assert len(calls) == 2
+        assert session.retried == 1
+
+    def test_backoff_grows_with_jitter(self):
+        session, delays = _session(retries=4, backoff=0.1, max_backoff=0.3)
+        command, _ = _flaky([RuntimeError("x")] * 4)
+        session.call(command)
+        # half fixed + jitter (0.5) * half
+        assert delays == pytest.approx([0.075, 0.15, 0.225, 0.225])
+
+    def test_gives_up_after_retries(self):
+        session, delays = _session(retries=1)
+        command, calls = _flaky([RuntimeError("a"), RuntimeError("b")])
+        with pytest.raises(RuntimeError, match="b"):
+            session.call(command)
+        assert len(calls) == 2
+
+    def test_closed_link_is_not_retried(self):
+        session, delays = _session()
+        command, calls = _flaky([TransportError("closed by peer")])
+        with pytest.raises(TransportError):
+            session.call(command)
+        assert len(calls) == 1
+
+    def test_retrying_wrapper_keeps_signature(self):
+        session, _ = _session()
+        transport = MagicMock()
+        transport.receive.side_effect = [b"garbage", CAPACITY_RESPONSE]
+        wrapped = session.retrying(get_pack_capacity)
+        assert wrapped.__name__ == "get_pack_capacity"
+        assert wrapped(transport, adr=2).full_cap == 20000
+
+
+class TestIdentity:
+    def test_identity_is_read_once(self):
+        transport = MagicMock()
+        transport.receive.side_effect = [VERSION_RESPONSE, SERIAL_RESPONSE]
+        session = BmsSession(transport)
+        first = session.identity()
+        assert isinstance(first, BmsIdentity)
+        assert session.identity() is first
+        assert transport.send.call_count == 2
+
+    def test_refresh_reads_again(self):
+        transport = MagicMock()
+        transport.receive.side_effect = [VERSION_RESPONSE, SERIAL_RESPONSE] * 2
+        session = BmsSession(transport)
+        session.identity()
+        session.identity(refresh=True)
+        assert transport.send.call_count == 4
+
+    def test_no_identity_until_read(self):
+        assert BmsSession(MagicMock()).cached_identity is None
+
+
+class TestPacing:
+    def test_every_attempt_is_paced(self):
+        pacer = AdaptivePacer(sleep=lambda s: None)
+        session = BmsSession(MagicMock(), sleep=lambda s: None, pacer=pacer)
+        command, _ = _flaky([RuntimeError("Checksum mismatch")])
+        session.call(command)
+        assert pacer.commands == 2
+        assert pacer.errors == 1
+
+    def test_decode_error_backs_off(self):
+        pacer = AdaptivePacer(sleep=lambda s: None)
+        session = BmsSession(MagicMock(), sleep=lambda s: None, pacer=pacer)
+        session.call(_flaky([ValueError("garbled INFO field")])[0])
+        assert pacer.errors == 1
+        assert pacer.gap > 0
+
+    def test_without_pacer(self):
+        session, _ = _session()
+        assert session.pacer is None
+        assert session.call(_flaky([])[0]) == "ok"
+
+    def test_batch_is_paced_per_address(self):
+        pacer = AdaptivePacer(sleep=lambda s: None)
+        session = BmsSession(MagicMock(), pacer=pacer)
+
+        def batch(transport, adrs):
+            return [(adr, RuntimeError("Checksum mismatch") if adr == 2 else adr) for adr in adrs]
+
+        assert session.paced_batch(batch)(session.transport, [1, 2])[0] == (1, 1)
+        assert pacer.commands == 2
+        assert pacer.errors == 1
+
+    def test_batch_without_pacer(self):
+        session, _ = _session()
+        batch = MagicMock()
+        assert session.paced_batch(batch) is batch
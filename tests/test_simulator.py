@@ -0,0 +1,176 @@
+"""
+Tests for src/bmspace/simulator.py
+
+The simulated device is checked through the real ``bms`` decoders, first
+directly and then over its TCP and pseudo-terminal front ends.
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from bmspace import constants
+from bmspace.bms import (
+    get_analog_data,
+    get_analog_data_batch,
+    get_pack_capacity,
+    get_serial,
+    get_version,
+    get_warn_info,
+)
+from bmspace.protocol import build_request, parse_response
+from bmspace.simulator import PtySimulator, SimulatedBms, TcpSimulator
+from bmspace.transport import SerialTransport, TcpTransport, TransportError
+
+
+class _Loopback:
+    """Transport that hands each request straight to a ``SimulatedBms``."""
+
+    def __init__(self, bms: SimulatedBms) -> None:
+        self._bms = bms
+        self._response: bytes | None = None
+
+    def send(self, data: bytes) -> None:
+        self._response = self._bms.handle(data)
+
+    def receive(self) -> bytes:
+        assert self._response is not None, "no device answered"
+        return self._response
+
+
+# ---------------------------------------------------------------------------
+# SimulatedBms
+# ---------------------------------------------------------------------------
+
+
+class TestSimulatedBms:
+    def test_identity(self):
+        transport = _Loopback(SimulatedBms(addresses=(1, 2), version="SIM V2.0"))
+        assert get_version(transport) == "SIM V2.0"
+        assert get_serial(transport, adr=2) == ("SIM02BMS0001", "SIM02PCK0001")
+
+    @pytest.mark.parametrize("extra_byte", [False, True])
+    @pytest.mark.parametrize("infoflag", [False, True])
+    def test_analog_quirks_decode(self, extra_byte, infoflag):
+        bms = SimulatedBms(packs=4, cells=15, temps=4, extra_byte=extra_byte,
+                           infoflag=infoflag, seed=7, clock=lambda: 0.0)
+        packs = get_analog_data(_Loopback(bms))
+        assert [p.pack_number for p in packs] == [1, 2, 3, 4]
+        for decoded, model in zip(packs, bms.packs[1]):
+            assert decoded.cells == model.cells
+            assert decoded.temps == [round(t, 1) for t in model.temps]
+            assert decoded.v_pack == model.voltage / 1000
+            assert decoded.i_pack == pytest.approx(model.current, abs=0.01)
+            assert decoded.cycles == model.cycles
+
+    @pytest.mark.parametrize("infoflag", [False, True])
+    def test_warn_info_decodes(self, infoflag):
+        bms = SimulatedBms(packs=3, infoflag=infoflag, seed=1)
+        warn = get_warn_info(_Loopback(bms), packs=3)
+        assert len(warn) == 3
+        assert all(w.warnings == "" and w.charge_fet == 1 and w.discharge_fet == 1 for w in warn)
+
+    def test_capacity_sums_packs(self):
+        bms = SimulatedBms(packs=2, seed=3, clock=lambda: 0.0)
+        capacity = get_pack_capacity(_Loopback(bms))
+        assert capacity.full_cap == 200_000
+        assert capacity.design_cap == 200_000
+
+    def test_single_pack_selected(self):
+        bms = SimulatedBms(packs=3, seed=2, clock=lambda: 0.0)
+        packs = get_analog_data(_Loopback(bms), bat_number=2)
+        assert len(packs) == 1
+        assert packs[0].cells == bms.packs[1][1].cells
+
+    def test_unknown_pack_number_is_rtn_error(self):
+        bms = SimulatedBms(packs=2)
+        with pytest.raises(RuntimeError, match="RTN Error 01"):
+            get_analog_data(_Loopback(bms), bat_number=5)
+
+    def test_unknown_address_is_silent(self):
+        bms = SimulatedBms(addresses=(1,))
+        assert bms.handle(build_request(cid2=constants.cid2SoftwareVersion, adr=b"05")) is None
+
+    def test_unknown_cid2(self):
+        response = SimulatedBms().handle(build_request(cid2=b"99"))
+        assert parse_response(response) == (False, "RTN Error 04: CID2 undefined")
+
+    def test_bad_checksum(self):
+        request = bytearray(build_request(cid2=constants.cid2SoftwareVersion))
+        request[-2] = ord("0") if request[-2] != ord("0") else ord("1")
+        response = SimulatedBms().handle(bytes(request))
+        assert parse_response(response) == (False, "RTN Error 02: CHKSUM error")
+
+    def test_values_drift_within_limits(self):
+        bms = SimulatedBms(cells=16, seed=5, clock=lambda: 0.0)
+        pack = bms.packs[1][0]
+        before = list(pack.cells)
+        for _ in range(100):
+            bms.advance(60.0)
+        assert pack.cells != before
+        assert all(2500 <= mv <= 3650 for mv in pack.cells)
+        assert all(0 < t < 60 for t in pack.temps)
+        assert 0 <= pack.remain_cap <= pack.full_cap
+        assert -50 <= pack.current <= 50
+
+
+# ---------------------------------------------------------------------------
+# Servers
+# ---------------------------------------------------------------------------
+
+
+class TestTcpSimulator:
+    def test_commands_over_tcp(self):
+        with TcpSimulator(SimulatedBms(packs=2, infoflag=True)) as server:
+            transport = TcpTransport(*server.address, timeout=1.0)
+            transport.connect()
+            try:
+                assert get_version(transport) == "PACE_SIM_V1.0"
+                assert len(get_analog_data(transport)) == 2
+            finally:
+                transport.disconnect()
+
+    def test_latency(self):
+        with TcpSimulator(SimulatedBms(latency=0.1)) as server:
+            transport = TcpTransport(*server.address, timeout=1.0)
+            transport.connect()
+            try:
+                started = time.monotonic()
+                get_version(transport)
+                assert time.monotonic() - started >= 0.1
+            finally:
+                transport.disconnect()
+
+    def test_silent_address_times_out(self):
+        with TcpSimulator(SimulatedBms(addresses=(1,))) as server:
+            transport = TcpTransport(*server.address, timeout=0.2)
+            transport.connect()
+            try:
+                with pytest.raises(TransportError):
+                    get_version(transport, adr=2)
+            finally:
+                transport.disconnect()
+
+    def test_pipelined_batch(self):
+        with TcpSimulator(SimulatedBms(addresses=(1, 2, 3), packs=2)) as server:
+            transport = TcpTransport(*server.address, timeout=1.0, pipeline=True)
+            transport.connect()
+            try:
+                outcomes = get_analog_data_batch(transport, [1, 2, 3])
+            finally:
+                transport.disconnect()
+        assert [adr for adr, _ in outcomes] == [1, 2, 3]
+        assert all(len(packs) == 2 for _, packs in outcomes)
+
+
+class TestPtySimulator:
+    def test_commands_over_pty(self):
+        with PtySimulator(SimulatedBms(packs=3, extra_byte=True)) as server:
+            transport = SerialTransport(server.port, timeout=1.0)
+            transport.connect()
+            try:
+                assert get_serial(transport) == ("SIM01BMS0001", "SIM01PCK0001")
+                assert len(get_analog_data(transport)) == 3
+            finally:
+                transport.disconnect()
@@ -0,0 +1,200 @@
+"""
+Tests for src/bmspace/timing.py and the hot-path instrumentation
+
+Link timings are taken over a real socket to the bundled simulator.
+"""
+from __future__ import annotations
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from bmspace.bms import get_analog_data, get_analog_data_batch, get_version
+from bmspace.config import Config, resolve_endpoints
+from bmspace.metrics import MetricsStore
+from bmspace.mqtt_client import MqttPublisher
+from bmspace.poller import BmsPoller
+from bmspace.simulator import SimulatedBms, TcpSimulator
+from bmspace.timing import STAGES, Histogram, StageTimings
+from bmspace.transport import TcpTransport, TransportTimeout
+
+from .test_simulator import _Loopback
+
+
+def _config(**kwargs) -> Config:
+    return Config("h", 1, "u", "p", True, "homeassistant", "bmspace", "IP",
+                  "127.0.0.1", 5000, "/dev/null", 1, 0, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Histogram
+# ---------------------------------------------------------------------------
+
+
+class TestHistogram:
+    def test_buckets_are_upper_inclusive(self):
+        histogram = Histogram((0.001, 0.01))
+        for value in (0.0005, 0.001, 0.002, 0.5):
+            histogram.observe(value)
+        assert list(histogram.counts) == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.total == pytest.approx(0.5035)
+
+    def test_quantiles_interpolate_within_a_bucket(self):
+        histogram = Histogram((0.01, 0.02, 0.04))
+        for _ in range(50):
+            histogram.observe(0.005)
+        for _ in range(50):
+            histogram.observe(0.03)
+        assert histogram.quantile(0.5) == pytest.approx(0.01)
+        assert histogram.quantile(0.75) == pytest.approx(0.03)
+        histogram.observe(99.0)
+        assert histogram.quantile(1.0) == 0.04   # overflow bucket: last bound
+
+    def test_summary_since_a_copy(self):
+        histogram = Histogram((0.001, 0.01))
+        histogram.observe(0.0005)
+        before = histogram.copy()
+        histogram.observe(0.005)
+        histogram.observe(0.005)
+        summary = histogram.summary(before)
+        assert summary["count"] == 2
+        assert summary["mean_ms"] == 5.0
+        assert 1.0 < summary["p50_ms"] <= 10.0
+        assert before.count == 1
+
+    def test_empty_summary(self):
+        assert Histogram().summary() == {
+            "count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0,
+        }
+
+
+# ---------------------------------------------------------------------------
+# StageTimings
+# ---------------------------------------------------------------------------
+
+
+class TestStageTimings:
+    def test_take_window_reports_each_sample_once(self):
+        timings = StageTimings()
+        timings.parse.observe(0.0002)
+        timings.decode.observe(0.0003)
+        assert set(timings.take_window()) == {"parse", "decode"}
+        timings.parse.observe(0.0004)
+        window = timings.take_window()
+        assert list(window) == ["parse"]
+        assert window["parse"]["count"] == 1
+        assert timings.take_window() == {}
+        assert timings.summaries()["parse"]["count"] == 2
+
+    def test_histograms_in_stage_order(self):
+        assert [stage for stage, _ in StageTimings().histograms()] == list(STAGES)
+
+
+# ---------------------------------------------------------------------------
+# Instrumented command layer and transports
+# ---------------------------------------------------------------------------
+
+
+class TestInstrumentation:
+    def test_parse_and_decode(self):
+        transport = _Loopback(SimulatedBms(packs=2))
+        transport.timings = StageTimings()
+        get_analog_data(transport)
+        get_version(transport)
+        assert transport.timings.parse.count == 2
+        assert transport.timings.decode.count == 2
+        assert transport.timings.write.count == 0
+
+    def test_tcp_link_stages(self):
+        with TcpSimulator(SimulatedBms(addresses=(1, 2), latency=0.01)) as server:
+            transport = TcpTransport(*server.address, timeout=0.5, pipeline=True)
+            transport.timings = timings = StageTimings()
+            transport.connect()
+            try:
+                get_analog_data(transport)
+                assert timings.write.count == timings.ttfb.count == timings.receive.count == 1
+                assert timings.receive.total >= timings.ttfb.total >= 0.01
+
+                get_analog_data_batch(transport, [1, 2])
+                assert timings.write.count == 2
+                assert timings.ttfb.count == 2
+                assert timings.receive.count == 3
+                assert timings.decode.count == 3
+
+                with pytest.raises(TransportTimeout):
+                    get_version(transport, adr=9)
+                assert timings.receive.count == 3
+            finally:
+                transport.disconnect()
+
+    def test_untimed_transport(self):
+        with TcpSimulator(SimulatedBms()) as server:
+            transport = TcpTransport(*server.address, timeout=0.5)
+            transport.connect()
+            try:
+                assert get_version(transport) == "PACE_SIM_V1.0"
+            finally:
+                transport.disconnect()
+        assert transport.timings is None
+
+    def test_publish_enqueue(self):
+        publisher = MqttPublisher(_config())
+        publisher._client = MagicMock()
+        publisher.timings = StageTimings()
+        publisher.publish_availability(online=True)
+        assert publisher.timings.publish.count == 1
+        view = publisher.for_base_topic("other")
+        assert view.timings is None
+        view.publish_availability(online=True)
+        assert publisher.timings.publish.count == 1
+
+
+# ---------------------------------------------------------------------------
+# Diagnostics and metrics
+# ---------------------------------------------------------------------------
+
+
+class TestDiagnostics:
+    def test_publish_diagnostics(self):
+        publisher = MqttPublisher(_config())
+        publisher._client = MagicMock()
+        publisher.publish_diagnostics({"parse": {"count": 3, "mean_ms": 0.02}})
+        topic, payload = publisher._client.publish.call_args.args
+        assert topic == "bmspace/diagnostics/parse"
+        assert json.loads(payload) == {"count": 3, "mean_ms": 0.02}
+
+    def test_poller_schedules_diagnostics(self):
+        config = _config(diagnostics_interval=60.0)
+        publisher = MagicMock()
+        poller = BmsPoller(resolve_endpoints(config)[0], config, publisher)
+        assert publisher.timings is poller.timings
+        assert "diagnostics" in [task.name for task in poller._build_schedule().tasks]
+
+        poller._publish_diagnostics()
+        publisher.publish_diagnostics.assert_not_called()
+        poller.timings.parse.observe(0.001)
+        poller._publish_diagnostics()
+        summaries = publisher.publish_diagnostics.call_args.args[0]
+        assert list(summaries) == ["parse"]
+
+    def test_diagnostics_off_by_default(self):
+        config = _config()
+        poller = BmsPoller(resolve_endpoints(config)[0], config, MagicMock())
+        assert "diagnostics" not in [task.name for task in poller._build_schedule().tasks]
+
+    def test_metrics_histogram(self):
+        config = _config()
+        store = MetricsStore()
+        poller = BmsPoller(resolve_endpoints(config)[0], config, MagicMock(), metrics=store)
+        poller.timings.parse.observe(0.0003)
+        poller.timings.parse.observe(20.0)
+        lines = store.render().decode("utf-8").splitlines()
+        family = "bmspace_stage_duration_seconds"
+        assert lines.count(f"# TYPE {family} histogram") == 1
+        assert f'{family}_bucket{{endpoint="bms",stage="parse",le="0.00025"}} 0.0' in lines
+        assert f'{family}_bucket{{endpoint="bms",stage="parse",le="0.0005"}} 1.0' in lines
+        assert f'{family}_bucket{{endpoint="bms",stage="parse",le="+Inf"}} 2.0' in lines
+        assert f'{family}_count{{endpoint="bms",stage="parse"}} 2.0' in lines
+        assert not any('stage="decode"' in line for line in lines)
@@ -0,0 +1,329 @@
+"""
+Tests for src/bmspace/transport.py
+
+The TCP transports are exercised against a local listening socket and the
+async serial transport against a pseudo-terminal; no BMS hardware is
+required.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import serial
+
+from bmspace.transport import (
+    AsyncSerialTransport,
+    AsyncTcpTransport,
+    SerialTransport,
+    TcpTransport,
+    TransportError,
+)
+
+from bmspace.bms import get_analog_data_batch
+from bmspace.protocol import build_request
+
+from .test_bms import _PACK_RECORD, ANALOG_RESPONSE, VERSION_RESPONSE, _frame
+
+
+def _serve(chunks: list[bytes], delay: float = 0.0) -> tuple[int, threading.Thread]:
+    """Accept one client, wait for a request, then send *chunks* one by one."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    port = server.getsockname()[1]
+
+    def _run() -> None:
+        conn, _ = server.accept()
+        with conn:
+            conn.recv(4096)
+            for chunk in chunks:
+                conn.sendall(chunk)
+                time.sleep(delay)
+            time.sleep(0.2)
+        server.close()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return port, thread
+
+
+def _exchange(port: int, timeout: float = 1.0) -> bytes:
+    transport = TcpTransport("127.0.0.1", port, timeout=timeout)
+    transport.connect()
+    try:
+        transport.send(b"~250146C10000FD9A\r")
+        return transport.receive()
+    finally:
+        transport.disconnect()
+
+
+def _analog_request(adr: int) -> bytes:
+    return build_request(cid2=b"42", info=b"FF", adr=format(adr, "02X").encode())
+
+
+def _analog_frame(adr: int) -> bytes:
+    return _frame(b"0001" + _PACK_RECORD, adr=format(adr, "02X").encode())
+
+
+class TestTcpReceive:
+    def test_single_segment(self):
+        port, _ = _serve([VERSION_RESPONSE])
+        assert _exchange(port) == VERSION_RESPONSE
+
+    def test_frame_split_across_segments(self):
+        split = len(ANALOG_RESPONSE) // 2
+        port, _ = _serve([ANALOG_RESPONSE[:7], ANALOG_RESPONSE[7:split],
+                          ANALOG_RESPONSE[split:]], delay=0.02)
+        assert _exchange(port) == ANALOG_RESPONSE
+
+    def test_leading_noise_is_skipped(self):
+        port, _ = _serve([b"\x00\xff\r" + VERSION_RESPONSE])
+        assert _exchange(port) == VERSION_RESPONSE
+
+    def test_returns_without_fixed_delay(self):
+        port, _ = _serve([VERSION_RESPONSE])
+        start = time.monotonic()
+        _exchange(port)
+        assert time.monotonic() - start < 0.2
+
+    def test_incomplete_frame_times_out(self):
+        port, _ = _serve([VERSION_RESPONSE[:-3]])
+        with pytest.raises(TransportError):
+            _exchange(port, timeout=0.1)
+
+
+class TestStaleFrames:
+    def test_frame_for_other_address_is_skipped(self):
+        port, _ = _serve([_analog_frame(2) + VERSION_RESPONSE])
+        transport = TcpTransport("127.0.0.1", port, timeout=1.0)
+        transport.connect()
+        try:
+            transport.send(b"~250146C10000FD9A\r")
+            assert transport.receive() == VERSION_RESPONSE
+        finally:
+            transport.disconnect()
+        assert transport.stale_frames == 1
+
+    def test_late_answer_is_dropped_before_next_request(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+
+        def _run() -> None:
+            conn, _ = server.accept()
+            with conn:
+                conn.sendall(_analog_frame(1))   # answer to an earlier request
+                conn.recv(4096)
+                conn.sendall(VERSION_RESPONSE)
+                time.sleep(0.2)
+            server.close()
+
+        threading.Thread(target=_run, daemon=True).start()
+        transport = TcpTransport("127.0.0.1", server.getsockname()[1], timeout=1.0)
+        transport.connect()
+        try:
+            time.sleep(0.05)
+            transport.send(b"~250146C10000FD9A\r")
+            assert transport.receive() == VERSION_RESPONSE
+        finally:
+            transport.disconnect()
+
+    def test_only_stale_frames_times_out(self):
+        port, _ = _serve([_analog_frame(2)])
+        with pytest.raises(TransportError):
+            _exchange(port, timeout=0.2)
+
+    def test_serial_skips_stale_frames(self):
+        master, slave = os.openpty()
+        transport = SerialTransport(os.ttyname(slave), timeout=1.0)
+        transport.connect()
+        try:
+            transport.send(b"~250146C10000FD9A\r")
+            os.read(master, 4096)
+            os.write(master, _analog_frame(3)[:30])
+            os.write(master, _analog_frame(3)[30:] + VERSION_RESPONSE)
+            assert transport.receive() == VERSION_RESPONSE
+            assert transport.stale_frames == 1
+        finally:
+            transport.disconnect()
+            os.close(master)
+            os.close(slave)
+
+    def test_serial_timeout_is_not_reset_per_chunk(self):
+        master, slave = os.openpty()
+        transport = SerialTransport(os.ttyname(slave), timeout=1.0)
+        transport.connect()
+
+        def _answer() -> None:
+            os.read(master, 4096)
+            for i in range(0, len(ANALOG_RESPONSE), 16):
+                os.write(master, ANALOG_RESPONSE[i:i + 16])
+                time.sleep(0.005)
+
+        try:
+            with patch.object(serial.Serial, "_reconfigure_port",
+                              autospec=True, side_effect=serial.Serial._reconfigure_port) as reconfigure:
+                writer = threading.Thread(target=_answer)
+                writer.start()
+                transport.send(b"~250146420E02FD2C\r")
+                assert transport.receive() == ANALOG_RESPONSE
+                writer.join()
+            assert reconfigure.call_count <= 1
+        finally:
+            transport.disconnect()
+            os.close(master)
+            os.close(slave)
+
+
+# ---------------------------------------------------------------------------
+# Pipelined exchange
+# ---------------------------------------------------------------------------
+
+
+def _serve_pipelined(answer: list[bytes], delay: float = 0.0) -> int:
+    """Accept one client, read all requests, then answer with *answer* frames."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    port = server.getsockname()[1]
+
+    def _run() -> None:
+        conn, _ = server.accept()
+        with conn:
+            time.sleep(0.05)
+            conn.recv(65536)
+            for frame in answer:
+                for i in range(0, len(frame), 20):   # split across segments
+                    conn.sendall(frame[i:i + 20])
+                    time.sleep(delay)
+            time.sleep(0.3)
+        server.close()
+
+    threading.Thread(target=_run, daemon=True).start()
+    return port
+
+
+class TestPipelinedBatch:
+    def _transport(self, port: int, timeout: float = 1.0) -> TcpTransport:
+        transport = TcpTransport("127.0.0.1", port, timeout=timeout, pipeline=True)
+        transport.connect()
+        return transport
+
+    def test_not_pipelined_by_default(self):
+        assert not TcpTransport("127.0.0.1", 1).pipelined
+
+    def test_responses_matched_by_address(self):
+        port = _serve_pipelined([_analog_frame(a) for a in (3, 1, 2)])
+        transport = self._transport(port)
+        try:
+            frames = transport.exchange_batch([_analog_request(a) for a in (1, 2, 3)])
+        finally:
+            transport.disconnect()
+        assert [f[3:5] for f in frames] == [b"01", b"02", b"03"]
+
+    def test_unexpected_frames_are_discarded(self):
+        port = _serve_pipelined([_analog_frame(9), _analog_frame(1)])
+        transport = self._transport(port)
+        try:
+            assert transport.exchange_batch([_analog_request(1)]) == [_analog_frame(1)]
+        finally:
+            transport.disconnect()
+
+    def test_missing_response_is_none(self):
+        port = _serve_pipelined([_analog_frame(2)])
+        transport = self._transport(port, timeout=0.2)
+        try:
+            frames = transport.exchange_batch([_analog_request(1), _analog_request(2)])
+        finally:
+            transport.disconnect()
+        assert frames == [None, _analog_frame(2)]
+
+    def test_batch_command_decodes_each_address(self):
+        port = _serve_pipelined([_analog_frame(2), _analog_frame(1)])
+        transport = self._transport(port, timeout=0.2)
+        try:
+            results = get_analog_data_batch(transport, [1, 2, 3])
+        finally:
+            transport.disconnect()
+        assert [adr for adr, _ in results] == [1, 2, 3]
+        assert results[0][1][0].cells == [3300, 3310]
+        assert isinstance(results[2][1], TransportError)
+
+
+# ---------------------------------------------------------------------------
+# Async transports
+# ---------------------------------------------------------------------------
+
+
+class TestAsyncTcpTransport:
+    def test_round_trip(self):
+        async def _run() -> bytes:
+            async def _handle(reader, writer):
+                await reader.read(4096)
+                writer.write(ANALOG_RESPONSE[:9])
+                await writer.drain()
+                await asyncio.sleep(0.02)
+                writer.write(ANALOG_RESPONSE[9:])
+                await writer.drain()
+
+            server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                transport = AsyncTcpTransport("127.0.0.1", port, timeout=1.0)
+                await transport.connect()
+                await transport.send(b"~250146C10000FD9A\r")
+                frame = await transport.receive()
+                await transport.disconnect()
+            return frame
+
+        assert asyncio.run(_run()) == ANALOG_RESPONSE
+
+    def test_incomplete_frame_times_out(self):
+        async def _run() -> None:
+            async def _handle(reader, writer):
+                await reader.read(4096)
+                writer.write(VERSION_RESPONSE[:-3])
+                await writer.drain()
+                await asyncio.sleep(0.5)
+
+            server = await asyncio.start_server(_handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                transport = AsyncTcpTransport("127.0.0.1", port, timeout=0.1)
+                await transport.connect()
+                await transport.send(b"~250146C10000FD9A\r")
+                try:
+                    await transport.receive()
+                finally:
+                    await transport.disconnect()
+
+        with pytest.raises(TransportError):
+            asyncio.run(_run())
+
+
+class TestAsyncSerialTransport:
+    def test_round_trip_over_pty(self):
+        master, slave = os.openpty()
+
+        async def _run() -> bytes:
+            transport = AsyncSerialTransport(os.ttyname(slave), timeout=1.0)
+            await transport.connect()
+            await transport.send(b"~250146C10000FD9A\r")
+            await asyncio.sleep(0.02)
+            os.read(master, 4096)
+            os.write(master, VERSION_RESPONSE)
+            frame = await transport.receive()
+            await transport.disconnect()
+            return frame
+
+        try:
+            assert asyncio.run(_run()) == VERSION_RESPONSE
+        finally:
+            os.close(master)
+            os.close(slave)